@@ -1,7 +1,17 @@
 from django.http import JsonResponse
 from rest_framework.decorators import api_view, schema
 
-from ami.agent.decorators import agent_login_required, role_notifications_required
+from ami.agent.decorators import (
+    agent_login_required,
+    role_admin_required,
+    role_notifications_required,
+)
+from ami.notification.health import registration_health
+from ami.notification.hosts import hosts_stats
+from ami.notification.inbox import inbox_lag
+from ami.notification.lanes import lanes_lag
+from ami.notification.models import PushDeadLetter
+from ami.user.cache import user_cache
 from ami.user.models import User
 
 
@@ -17,3 +27,22 @@ def users(request) -> JsonResponse:
         ).order_by("fc_hash")[:10]
     result = [{"value": user.fc_hash} for user in queryset]
     return JsonResponse({"data": result})
+
+
+@agent_login_required
+@role_admin_required
+@api_view(["GET"])
+@schema(None)
+def metrics(request) -> JsonResponse:
+    return JsonResponse(
+        {
+            "partner_event_inbox": inbox_lag(),
+            "push_dead_letters": PushDeadLetter.objects.count(),
+            # local to the worker serving this request
+            "push_hosts": hosts_stats(),
+            "push_lanes": lanes_lag(),
+            "registrations": registration_health(),
+            # local to the worker serving this request
+            "user_cache": user_cache.stats(),
+        }
+    )
@@ -2,19 +2,22 @@ import copy
 import json
 
 from django import forms
-from django.conf import settings
+from django.db import transaction
 from django.urls import reverse
 from django.utils.timezone import now
+from rest_framework import serializers
 from rest_framework.renderers import JSONRenderer
 
 from ami.agent.models import Agent
 from ami.agent_admin.utils import audit
 from ami.amidsfr.forms import AMIDsfrBaseForm
 from ami.amidsfr.widgets import AutocompleteInput, ToggleInput
+from ami.notification.models import Broadcast
+from ami.notification.services import RecipientError, create_event, validate_event
+from ami.notification.tasks import broadcast_notification
 from ami.partner.models import partners
 from ami.service.models import Service
-from ami.user.models import User
-from ami.utils.httpx import BasicAuth, httpxLaxClient
+from ami.user.cache import resolve_user
 
 
 class AgentForm(forms.ModelForm, AMIDsfrBaseForm):
@@ -132,37 +135,109 @@ class NotificationForm(AMIDsfrBaseForm):
         # send notification as AMI partner
         partner = partners["dinum-ami"]
 
-        auth = BasicAuth(username=partner.id, password=partner.secret)
-        with httpxLaxClient() as httpx_client:
-            response = httpx_client.put(
-                f"{settings.PUBLIC_APP_URL}/api/v2/event",
-                auth=auth,
-                json=payload,
-            )
-
-        if response.status_code == 404:
-            try:
-                self.add_error(None, response.json()["error"])
-            except (KeyError, json.JSONDecodeError):
-                self.add_error(None, "Not found error")
-            return
-
-        if response.is_client_error:
+        try:
+            result = create_event(partner.id, validate_event(payload))
+        except serializers.ValidationError as error:
             # notification request error
-            for key, values in response.json().items():
+            for key, values in serializers.as_serializer_error(error).items():
                 for value in values:
                     if key in self.fields:
-                        self.add_error(key, value)
+                        self.add_error(key, str(value))
                     else:
-                        self.add_error(None, value)
+                        self.add_error(None, str(value))
+            return
+        except RecipientError as error:
+            self.add_error(None, str(error))
             return
 
-        if response.is_success:
-            # notification request accepted
-            message_content = []
-            for key, value in response.json().items():
-                message_content.append(f"{key}: {value}")
-            return "<br />".join(message_content)
+        # notification request accepted
+        return "<br />".join(
+            [
+                f"notification_id: {result.notification_id}",
+                f"notification_send_status: {result.notification_send_status}",
+            ]
+        )
+
+
+class BroadcastForm(forms.ModelForm, AMIDsfrBaseForm):
+    fc_hashes_file = forms.FileField(
+        label="Fichier d'identifiants FC-Hash",
+        help_text="Un identifiant FC-Hash par ligne",
+        required=False,
+    )
+
+    class Meta:
+        model = Broadcast
+        fields = [
+            "segment",
+            "consent_partner_id",
+            "fc_hashes_file",
+            "content_title",
+            "content_body",
+            "content_icon",
+            "content_link",
+            "valid_until",
+            "try_push",
+        ]
+        labels = {
+            "segment": "Destinataires",
+            "consent_partner_id": "Partenaire du consentement",
+        }
+        widgets = {
+            "consent_partner_id": forms.Select(
+                choices=[("", "--------")]
+                + [(partner.id, partner.name) for partner in partners.values()]
+            ),
+            "content_body": forms.Textarea(attrs={"rows": 4}),
+            "valid_until": forms.DateTimeInput(
+                attrs={"type": "datetime-local"}, format="%Y-%m-%dT%H:%M:00.000%Z"
+            ),
+            "try_push": ToggleInput,
+        }
+
+    def __init__(self, *args, **kwargs):
+        self.author = kwargs.pop("author")
+        super().__init__(*args, **kwargs)
+
+    def clean(self):
+        super().clean()
+        cleaned_data = self.cleaned_data
+        segment = cleaned_data.get("segment")
+        if segment == Broadcast.Segment.CONSENT and not cleaned_data.get("consent_partner_id"):
+            self.add_error("consent_partner_id", "Ce champ est obligatoire.")
+        if segment == Broadcast.Segment.FC_HASHES:
+            fc_hashes_file = cleaned_data.get("fc_hashes_file")
+            try:
+                lines = fc_hashes_file.read().decode().splitlines() if fc_hashes_file else []
+            except UnicodeDecodeError:
+                lines = []
+            fc_hashes = sorted({line.strip() for line in lines if line.strip()})
+            if not fc_hashes:
+                self.add_error(
+                    "fc_hashes_file", "Le fichier ne contient aucun identifiant FC-Hash."
+                )
+            self.instance.fc_hashes = fc_hashes
+        return cleaned_data
+
+    def save(self, commit=True):
+        # sent as AMI partner
+        self.instance.partner_id = "dinum-ami"
+        if self.instance.segment != Broadcast.Segment.CONSENT:
+            self.instance.consent_partner_id = None
+        super().save(commit=commit)
+        audit(
+            "notifications:broadcast-created",
+            self.author,
+            {
+                "broadcast_id": str(self.instance.id),
+                "segment": self.instance.segment,
+                "content_title": self.instance.content_title,
+            },
+        )
+        transaction.on_commit(
+            lambda: broadcast_notification.enqueue(str(self.instance.id))  # type: ignore[union-attr]
+        )
+        return self.instance
 
 
 class UserSearchForm(AMIDsfrBaseForm):
@@ -178,9 +253,8 @@ class UserSearchForm(AMIDsfrBaseForm):
 
     def clean_fc_hash(self):
         value = self.cleaned_data["fc_hash"]
-        try:
-            self.user = User.objects.get(fc_hash=value)
-        except User.DoesNotExist:
+        self.user = resolve_user(value)
+        if self.user is None:
             raise forms.ValidationError("Utilisateur non trouvé")
         return value
 
@@ -6,6 +6,8 @@ app_name = "agent_admin"
 urlpatterns = [
     path("access/", access_views.access, name="access"),
     path("notification/", notification_views.send_notification, name="send-notification"),
+    path("broadcast/", notification_views.list_broadcasts, name="list-broadcasts"),
+    path("broadcast/add/", notification_views.add_broadcast, name="add-broadcast"),
     path("user/", user_views.search_user, name="search-user"),
     path("user/<uuid:user_id>/", user_views.detail_user, name="detail-user"),
     path("user/<uuid:user_id>/delete/", user_views.delete_user, name="delete-user"),
@@ -0,0 +1,87 @@
+import pytest
+from django.test import TestCase
+from django.utils.timezone import now
+from webtest import Upload
+
+from ami.agent.models import Agent
+from ami.agent_admin.models import AuditEntry
+from ami.agent_admin.tests.utils import assert_query_fails_without_agent_notifications_auth
+from ami.notification.models import Broadcast, Notification
+from ami.user.models import User
+
+
+@pytest.mark.django_db
+def test_list_broadcasts(app, notifications_agent: Agent) -> None:
+    Broadcast.objects.create(
+        segment=Broadcast.Segment.REGISTERED,
+        partner_id="dinum-ami",
+        content_title="Titre",
+        content_body="Message",
+        status=Broadcast.Status.RUNNING,
+        total_count=10,
+        recipients_count=4,
+        created_count=4,
+        pushed_count=2,
+    )
+    app.set_user(notifications_agent.user)
+    response = app.get("/agent-admin/manage/broadcast/")
+    assert "Diffusions de notifications" in response.pyquery("main").text()
+    row = response.pyquery("tbody tr").text()
+    assert "Titre" in row
+    assert "Utilisateurs ayant un appareil enregistré" in row
+    assert "En cours\n4 / 10\n4\n2" in row
+
+
+@pytest.mark.django_db
+def test_list_broadcasts_without_agent_notifications_auth(app) -> None:
+    assert_query_fails_without_agent_notifications_auth(app, "/agent-admin/manage/broadcast/")
+
+
+@pytest.mark.django_db
+def test_add_broadcast_validation_errors(app, notifications_agent: Agent) -> None:
+    app.set_user(notifications_agent.user)
+    response = app.get("/agent-admin/manage/broadcast/add/")
+    assert "Diffuser une notification" in response.pyquery("main").text()
+    response.forms["add-broadcast"]["segment"] = Broadcast.Segment.CONSENT
+    response = response.forms["add-broadcast"].submit()
+    assert response.context["form"].errors == {
+        "consent_partner_id": ["Ce champ est obligatoire."],
+        "content_title": ["Ce champ est obligatoire."],
+        "content_body": ["Ce champ est obligatoire."],
+    }
+
+    response.forms["add-broadcast"]["segment"] = Broadcast.Segment.FC_HASHES
+    response = response.forms["add-broadcast"].submit()
+    assert response.context["form"].errors["fc_hashes_file"] == [
+        "Le fichier ne contient aucun identifiant FC-Hash."
+    ]
+
+
+@pytest.mark.django_db
+def test_add_broadcast_fc_hashes(app, notifications_agent: Agent) -> None:
+    users = [
+        User.objects.create(fc_hash=f"user-{index}", last_logged_in=now()) for index in range(2)
+    ]
+    app.set_user(notifications_agent.user)
+    response = app.get("/agent-admin/manage/broadcast/add/")
+    form = response.forms["add-broadcast"]
+    form["segment"] = Broadcast.Segment.FC_HASHES
+    form["fc_hashes_file"] = Upload("fc_hashes.txt", b"user-0\nuser-1\n\nuser-0\n", "text/plain")
+    form["content_title"] = "Titre"
+    form["content_body"] = "Message"
+
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        response = form.submit().follow()
+
+    assert "La diffusion de la notification a bien été lancée." in response.text
+    broadcast = Broadcast.objects.get()
+    assert broadcast.fc_hashes == ["user-0", "user-1"]
+    assert broadcast.partner_id == "dinum-ami"
+    assert broadcast.status == Broadcast.Status.DONE
+    assert broadcast.created_count == 2
+    assert broadcast.pushed_count == 2
+    assert {notification.user for notification in Notification.objects.all()} == set(users)
+    audit_entry = AuditEntry.objects.get()
+    assert audit_entry.action_type == "notifications"
+    assert audit_entry.action_code == "broadcast-created"
+    assert audit_entry.extra_data["broadcast_id"] == str(broadcast.id)
@@ -1,10 +1,16 @@
+from functools import partial
+from types import MethodType
+
 import pytest
-from django.conf import settings
+from django.test import TestCase
 from django.utils.timezone import now
-from pytest_httpx import HTTPXMock
 
 from ami.agent.models import Agent
 from ami.agent_admin.tests.utils import assert_query_fails_without_agent_notifications_auth
+from ami.notification.lanes import Lane, in_lane
+from ami.notification.models import Notification
+from ami.notification.tasks import push_notification
+from ami.user.models import User
 
 
 @pytest.mark.django_db
@@ -49,53 +55,31 @@ def test_send_notification_submit_validation_errors(app, notifications_agent: Ag
 
 
 @pytest.mark.django_db
-def test_send_notification_submit_with_400(
-    app,
-    notifications_agent: Agent,
-    httpx_mock: HTTPXMock,
-) -> None:
+def test_send_notification_submit_with_invalid_event(app, notifications_agent: Agent) -> None:
     app.set_user(notifications_agent.user)
     response = app.get("/agent-admin/manage/notification/")
 
     response.forms["send-notification"]["recipient_fc_hash"] = "a-recipient"
     response.forms["send-notification"]["content_title"] = "a-title"
     response.forms["send-notification"]["content_body"] = "a-body"
-    response.forms["send-notification"]["item_generic_status"] = ""
-    response.forms["send-notification"]["item_canal"] = ""
-    response.forms["send-notification"]["event_date"] = "2026-04-21T16:24:00.000"
-
-    httpx_mock.add_response(
-        url=f"{settings.PUBLIC_APP_URL}/api/v2/event",
-        json={
-            "recipient_fc_hash": ["error 1", "error 2"],
-            "item_type": ["error 3"],
-            "unknown_field": ["error 4"],
-        },
-        match_json={
-            "recipient_fc_hash": "a-recipient",
-            "content_title": "a-title",
-            "content_body": "a-body",
-            "event_date": "2026-04-21T16:24:00Z",
-            "try_push": False,
-        },
-        status_code=400,
-    )
+    response.forms["send-notification"]["item_type"] = "OTV"
 
     response = response.forms["send-notification"].submit()
+    error = "Ce champ est obligatoire pour une notification associée à un objet."
     assert response.context["form"].errors == {
-        "__all__": ["error 4"],
-        "recipient_fc_hash": ["error 1", "error 2"],
-        "item_type": ["error 3"],
+        "item_id": [error],
+        "item_status_label": [error],
+        "item_generic_status": [error],
     }
     assert response.pyquery(".fr-notice.success").text() == ""
+    assert Notification.objects.count() == 0
 
 
 @pytest.mark.django_db
-def test_send_notification_submit_with_404(
-    app,
-    notifications_agent: Agent,
-    httpx_mock: HTTPXMock,
+def test_send_notification_submit_with_unknown_recipient(
+    app, notifications_agent: Agent, user: User, monkeypatch: pytest.MonkeyPatch
 ) -> None:
+    monkeypatch.setenv("IGNORE_NOTIFICATION_REQUESTS_FOR_UNREGISTERED_USER", "true")
     app.set_user(notifications_agent.user)
     response = app.get("/agent-admin/manage/notification/")
 
@@ -103,76 +87,50 @@ def test_send_notification_submit_with_404(
     response.forms["send-notification"]["content_title"] = "a-title"
     response.forms["send-notification"]["content_body"] = "a-body"
 
-    httpx_mock.add_response(
-        url=f"{settings.PUBLIC_APP_URL}/api/v2/event",
-        status_code=404,
-    )
-
-    response = response.forms["send-notification"].submit()
-    assert response.context["form"].errors == {"__all__": ["Not found error"]}
-    assert response.pyquery(".fr-notice.success").text() == ""
-
-
-@pytest.mark.django_db
-def test_send_notification_submit_with_404_and_message(
-    app,
-    notifications_agent: Agent,
-    httpx_mock: HTTPXMock,
-) -> None:
-    app.set_user(notifications_agent.user)
-    response = app.get("/agent-admin/manage/notification/")
-
-    response.forms["send-notification"]["recipient_fc_hash"] = "a-recipient"
-    response.forms["send-notification"]["content_title"] = "a-title"
-    response.forms["send-notification"]["content_body"] = "a-body"
-
-    httpx_mock.add_response(
-        url=f"{settings.PUBLIC_APP_URL}/api/v2/event",
-        json={"error": "User not found"},
-        status_code=404,
-    )
-
     response = response.forms["send-notification"].submit()
     assert response.context["form"].errors == {"__all__": ["User not found"]}
+    assert response.pyquery(".fr-notice.success").text() == ""
 
-    httpx_mock.add_response(
-        url=f"{settings.PUBLIC_APP_URL}/api/v2/event",
-        json={"unknown_field": "User not found"},
-        status_code=404,
-    )
-
+    User.objects.filter(id=user.id).update(last_logged_in=None)
+    response.forms["send-notification"]["recipient_fc_hash"] = user.fc_hash
     response = response.forms["send-notification"].submit()
-    assert response.context["form"].errors == {"__all__": ["Not found error"]}
-    assert response.pyquery(".fr-notice.success").text() == ""
+    assert response.context["form"].errors == {"__all__": ["User never seen"]}
+    assert Notification.objects.count() == 0
 
 
 @pytest.mark.django_db
-def test_send_notification_submit_success(
-    app,
-    notifications_agent: Agent,
-    httpx_mock: HTTPXMock,
-) -> None:
+def test_send_notification_submit_success(app, notifications_agent: Agent, user: User) -> None:
     app.set_user(notifications_agent.user)
     response = app.get("/agent-admin/manage/notification/")
 
-    response.forms["send-notification"]["recipient_fc_hash"] = "a-recipient"
+    response.forms["send-notification"]["recipient_fc_hash"] = user.fc_hash
     response.forms["send-notification"]["content_title"] = "a-title"
     response.forms["send-notification"]["content_body"] = "a-body"
+    response.forms["send-notification"]["try_push"] = True
 
-    httpx_mock.add_response(
-        url=f"{settings.PUBLIC_APP_URL}/api/v2/event",
-        json={
-            "notification_id": "5c108865-3ca3-403b-bd53-942bcc025f2c",
-            "notification_send_status": True,
-        },
-        status_code=200,
-    )
-
-    response = response.forms["send-notification"].submit()
+    with TestCase.captureOnCommitCallbacks() as callbacks:
+        response = response.forms["send-notification"].submit()
+    notification = Notification.objects.get()
     assert (
         response.pyquery(".fr-notice.success").text() == "Notification envoyée avec succès\n"
-        "notification_id: 5c108865-3ca3-403b-bd53-942bcc025f2c\nnotification_send_status: True"
+        f"notification_id: {notification.id}\nnotification_send_status: True"
     )
+    assert notification.user_id == user.id
+    assert notification.partner_id == "dinum-ami"
+    assert notification.content_title == "a-title"
+    assert notification.content_body == "a-body"
+    # The push is enqueued in process
+    [push] = callbacks
+    assert isinstance(push, partial) and isinstance(push.func, MethodType)
+    assert push.func.__self__ == in_lane(push_notification, Lane.INTERACTIVE)
+    assert push.args == (str(notification.id), True)
+
+    # The same notification again is a duplicate, not pushed again
+    with TestCase.captureOnCommitCallbacks() as callbacks:
+        response = response.forms["send-notification"].submit()
+    assert "notification_send_status: True" in response.pyquery(".fr-notice.success").text()
+    assert Notification.objects.count() == 1
+    assert callbacks == []
 
 
 @pytest.mark.django_db
@@ -8,6 +8,7 @@ from ami.agent.models import Agent
 from ami.agent_admin.models import AuditEntry
 from ami.agent_admin.tests.utils import assert_query_fails_without_agent_admin_auth
 from ami.notification.models import Notification, ScheduledNotification
+from ami.user.cache import resolve_user, user_cache
 from ami.user.models import Registration, User
 
 
@@ -106,8 +107,10 @@ def test_delete_user(
         internal_url="internal-url",
         scheduled_at=now(),
     )
+    assert resolve_user(user.fc_hash) is not None
     response = app.post(f"/agent-admin/manage/user/{user.id}/delete/")
     assert "/agent-admin/manage/user/" in response.headers["location"]
+    assert user_cache.get(user.fc_hash) is None
 
     assert User.objects.filter(id=user.id).exists() is False
     assert Registration.objects.filter(user_id=user.id).exists() is False
@@ -1,7 +1,10 @@
 import pytest
 
 from ami.agent.models import Agent
-from ami.agent_admin.tests.utils import assert_query_fails_without_agent_notifications_auth
+from ami.agent_admin.tests.utils import (
+    assert_query_fails_without_agent_admin_auth,
+    assert_query_fails_without_agent_notifications_auth,
+)
 from ami.user.models import User
 
 
@@ -38,3 +41,33 @@ def test_list_users(app, notifications_agent: Agent) -> None:
 @pytest.mark.django_db
 def test_list_users_without_agent_notifications_auth(app) -> None:
     assert_query_fails_without_agent_notifications_auth(app, "/agent-admin/api/users/")
+
+
+@pytest.mark.django_db
+def test_metrics(app, admin_agent: Agent) -> None:
+    app.set_user(admin_agent.user)
+
+    response = app.get("/agent-admin/api/metrics/")
+    assert response.json == {
+        "partner_event_inbox": {"pending": 0, "oldest_pending_age_seconds": 0.0},
+        "push_dead_letters": 0,
+        "push_hosts": {},
+        "push_lanes": {
+            "interactive": {"ready": 0, "oldest_ready_age_seconds": 0.0},
+            "scheduled": {"ready": 0, "oldest_ready_age_seconds": 0.0},
+            "bulk": {"ready": 0, "oldest_ready_age_seconds": 0.0},
+        },
+        "registrations": {
+            "total": 0,
+            "healthy": 0,
+            "failing": 0,
+            "backing_off": 0,
+            "quarantined": 0,
+        },
+        "user_cache": {"size": 0, "max_size": 10_000, "hits": 0, "misses": 0},
+    }
+
+
+@pytest.mark.django_db
+def test_metrics_without_agent_admin_auth(app) -> None:
+    assert_query_fails_without_agent_admin_auth(app, "/agent-admin/api/metrics/")
@@ -10,5 +10,6 @@ urlpatterns = [
     path("login/", base_views.login, name="login"),
     path("access-denied/", base_views.access_denied, name="access-denied"),
     path("api/users/", api_views.users, name="api-users"),
+    path("api/metrics/", api_views.metrics, name="api-metrics"),
     path("manage/", include(manage_urls, namespace="manage")),
 ]
@@ -1,13 +1,16 @@
 import json
 
 from django.contrib import messages
-from django.shortcuts import render
+from django.db import transaction
+from django.shortcuts import redirect, render
+from django.urls import reverse
 
 from ami.agent.decorators import (
     agent_login_required,
     role_notifications_required,
 )
-from ami.agent_admin.forms import NotificationForm
+from ami.agent_admin.forms import BroadcastForm, NotificationForm
+from ami.notification.models import Broadcast
 
 
 @agent_login_required
@@ -44,3 +47,55 @@ def send_notification(request):
         },
     }
     return render(request, "agent_admin/manage/send_notification.html", context)
+
+
+@agent_login_required
+@role_notifications_required
+def list_broadcasts(request):
+    context = {
+        "object_list": Broadcast.objects.order_by("-created_at")[:50],
+        "btn_group": {
+            "items": [
+                {
+                    "label": "Diffuser une notification",
+                    "type": "button",
+                    "onclick": f"window.location.href = '{reverse('agent-admin:manage:add-broadcast')}';",
+                },
+            ],
+            "extra_classes": "fr-btns-group--inline fr-btns-group--form-actions",
+        },
+    }
+    return render(request, "agent_admin/manage/list_broadcasts.html", context)
+
+
+@agent_login_required
+@role_notifications_required
+def add_broadcast(request):
+    if request.method == "POST":
+        form = BroadcastForm(data=request.POST, files=request.FILES, author=request.user.agent)
+        if form.is_valid():
+            with transaction.atomic():
+                form.save()
+            messages.success(request, "La diffusion de la notification a bien été lancée.")
+            return redirect(reverse("agent-admin:manage:list-broadcasts"))
+    else:
+        form = BroadcastForm(author=request.user.agent)
+    context = {
+        "form": form,
+        "btn_group": {
+            "items": [
+                {
+                    "label": "Annuler",
+                    "type": "button",
+                    "extra_classes": "fr-btn--secondary",
+                    "onclick": f"window.location.href = '{reverse('agent-admin:manage:list-broadcasts')}';",
+                },
+                {
+                    "label": "Diffuser",
+                    "type": "submit",
+                },
+            ],
+            "extra_classes": "fr-btns-group--inline fr-btns-group--form-actions",
+        },
+    }
+    return render(request, "agent_admin/manage/add_broadcast.html", context)
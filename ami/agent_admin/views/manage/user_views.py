@@ -12,6 +12,7 @@ from ami.agent.decorators import (
 from ami.agent_admin.forms import UserSearchForm
 from ami.agent_admin.utils import audit
 from ami.notification.models import Notification, ScheduledNotification
+from ami.user.cache import user_cache
 from ami.user.models import Registration, User
 
 
@@ -73,6 +74,7 @@ def delete_user(request, user_id):
         Notification.objects.filter(user=user).delete()
         ScheduledNotification.objects.filter(user=user).delete()
         user.delete()
+    user_cache.invalidate(user.fc_hash)
 
     messages.success(request, "Les données ont bien été supprimées.")
     return redirect(reverse("agent-admin:manage:search-user"))
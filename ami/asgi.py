@@ -19,12 +19,27 @@ from django.core.asgi import get_asgi_application  # noqa: E402
 
 from ami.authentication.middleware import AMIJWTAuthCookieASGIMiddleware  # noqa: E402
 from ami.notification.channel_routing import websocket_urlpatterns  # noqa: E402
+from ami.notification.push import close_push_resources  # noqa: E402
+from ami.utils import async_db  # noqa: E402
 
 django_application = get_asgi_application()
 
+
+async def lifespan(scope, receive, send) -> None:
+    """ASGI lifespan application: the asyncpg pool, then the shared push resources on shutdown."""
+
+    async def send_after_shutdown(message) -> None:
+        if message["type"] == "lifespan.shutdown.complete":
+            await close_push_resources()
+        await send(message)
+
+    await async_db.lifespan(scope, receive, send_after_shutdown)
+
+
 application = ProtocolTypeRouter(
     {
         "http": django_application,
         "websocket": AMIJWTAuthCookieASGIMiddleware(URLRouter(websocket_urlpatterns)),
+        "lifespan": lifespan,
     }
 )
@@ -1,11 +1,12 @@
 from http.cookies import SimpleCookie
 
-from channels.db import database_sync_to_async
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.conf import settings
 
 from ami.authentication.auth import decode_jwt_token
 from ami.authentication.models import RevokedAuthToken
 from ami.user.models import User
+from ami.utils.async_db import is_token_revoked
 
 
 class AMIJWTAuthCookieASGIMiddleware:
@@ -34,27 +35,64 @@ class AMIJWTAuthCookieASGIMiddleware:
                 if not payload:
                     return None
                 jti = payload.get("jti")
-                if (
-                    jti
-                    and await database_sync_to_async(
-                        RevokedAuthToken.objects.filter(jti=jti).exists
-                    )()
-                ):
+                if jti and await is_token_revoked(jti):
                     return None
                 return payload.get("sub")
         return None
 
 
 class AMIJWTAuthCookieMiddleware:
-    """WSGI middleware that authenticates http requests via JWT cookie.
+    """Django middleware that authenticates http requests via JWT cookie, sync or async.
 
     Populates request.ami_user and request.ami_payload.
     """
 
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        payload = self._prepare(request)
+        if payload:
+            jti = payload.get("jti")
+            is_revoked = False
+            if jti and RevokedAuthToken.objects.filter(jti=jti).exists():
+                is_revoked = True
+            if not is_revoked:
+                try:
+                    request.ami_user = User.objects.get(id=payload["sub"])
+                    request.ami_payload = payload
+                except User.DoesNotExist:
+                    pass
+
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        payload = self._prepare(request)
+        if payload:
+            jti = payload.get("jti")
+            is_revoked = False
+            if jti and await is_token_revoked(jti):
+                is_revoked = True
+            if not is_revoked:
+                try:
+                    request.ami_user = await User.objects.aget(id=payload["sub"])
+                    request.ami_payload = payload
+                except User.DoesNotExist:
+                    pass
+
+        return await self.get_response(request)
+
+    @staticmethod
+    def _prepare(request) -> dict | None:
+        """Reset the request authentication, and return the decoded JWT payload if any."""
         token = request.COOKIES.get(settings.AUTH_COOKIE_JWT_NAME)
         if not token:
             token = request.headers.get("Authorization", "")
@@ -65,17 +103,5 @@ class AMIJWTAuthCookieMiddleware:
         request.ami_user = None
 
         if token:
-            payload = decode_jwt_token(token)
-            if payload:
-                jti = payload.get("jti")
-                is_revoked = False
-                if jti and RevokedAuthToken.objects.filter(jti=jti).exists():
-                    is_revoked = True
-                if not is_revoked:
-                    try:
-                        request.ami_user = User.objects.get(id=payload["sub"])
-                        request.ami_payload = payload
-                    except User.DoesNotExist:
-                        pass
-
-        return self.get_response(request)
+            return decode_jwt_token(token)
+        return None
@@ -10,6 +10,7 @@ from ami.authentication.auth import decode_jwt_token
 from ami.authentication.models import Nonce
 from ami.notification.models import ScheduledNotification
 from ami.tests.utils import url_contains_param
+from ami.user.cache import resolve_user, user_cache
 from ami.user.models import User
 from ami.user.utils import build_fc_hash
 
@@ -185,6 +186,7 @@ def test_login_callback_user_already_seen(
         birthcountry=userinfo["birthcountry"],
     )
     user = User.objects.create(fc_hash=fc_hash, last_logged_in=now())
+    assert resolve_user(fc_hash) is not None
 
     response = app.get(f"/login-callback?code=fake-code&state={nonce.id}")
 
@@ -218,6 +220,8 @@ def test_login_callback_user_already_seen(
 
     assert user.fc_hash == "4abd71ec1f581dce2ea2221cbeac7c973c6aea7bcb835acdfe7d6494f1528060"
     assert user.last_logged_in is not None
+    # the cached last login date is outdated
+    assert user_cache.get(fc_hash) is None
 
     assert ScheduledNotification.objects.count() == 0
 
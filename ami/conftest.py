@@ -1,9 +1,12 @@
+import asyncio
 import base64
 import datetime
-from typing import Any, AsyncGenerator, Dict
+from typing import Any, AsyncGenerator, Dict, Generator
+from unittest.mock import Mock
 
 import jwt
 import pytest
+from asgiref.sync import sync_to_async
 from channels.testing.websocket import WebsocketCommunicator
 from cryptography import x509
 from cryptography.hazmat.primitives import hashes, serialization
@@ -12,19 +15,64 @@ from cryptography.hazmat.primitives.serialization import pkcs12
 from cryptography.x509.oid import NameOID
 from django.contrib.auth.models import User as DjangoUser
 from django.core.cache import cache
+from django.db import connections
+from django.tasks import TaskResult  # type: ignore[import-untyped]
+from django.tasks.backends.dummy import DummyBackend  # type: ignore[import-untyped]
+from django.tasks.backends.immediate import ImmediateBackend  # type: ignore[import-untyped]
+from django.tasks.signals import task_enqueued  # type: ignore[import-untyped]
 from django.utils.timezone import now
+from firebase_admin import exceptions, messaging
 from webpush.vapid import VAPID
 
 from ami.agent.models import Agent
 from ami.asgi import application
+from ami.notification.hosts import reset_hosts
 from ami.notification.models import Notification
+from ami.user.cache import user_cache
 from ami.user.models import Registration, User
 from ami.user.utils import build_fc_hash
 
 
+class DeferringImmediateBackend(ImmediateBackend, DummyBackend):
+    """Run the tasks when enqueued, except the deferred ones (retries...), which the immediate
+    backend can't run later: they're left aside, like with the dummy backend."""
+
+    supports_defer = True
+
+    def enqueue(self, task, args, kwargs):
+        if task.run_after is None:
+            return ImmediateBackend.enqueue(self, task, args, kwargs)
+        return DummyBackend.enqueue(self, task, args, kwargs)
+
+
 @pytest.fixture
 def dummy_tasks(settings):
-    settings.TASKS = {"default": {"BACKEND": "django.tasks.backends.immediate.ImmediateBackend"}}
+    settings.TASKS = {
+        "default": {
+            "BACKEND": "ami.conftest.DeferringImmediateBackend",
+            "QUEUES": settings.TASK_QUEUES,
+        }
+    }
+
+
+@pytest.fixture
+def deferred_tasks(settings) -> Generator[list[TaskResult], None, None]:
+    """Collect the enqueued tasks, without running them."""
+    settings.TASKS = {
+        "default": {
+            "BACKEND": "django.tasks.backends.dummy.DummyBackend",
+            "QUEUES": settings.TASK_QUEUES,
+        }
+    }
+    results = []
+
+    # The backends are local to each thread: listen to all of them
+    def collect(sender, task_result: TaskResult, **kwargs) -> None:
+        results.append(task_result)
+
+    task_enqueued.connect(collect)
+    yield results
+    task_enqueued.disconnect(collect)
 
 
 @pytest.fixture
@@ -217,6 +265,27 @@ async def websocket(user: User, settings) -> AsyncGenerator[WebsocketCommunicato
     await communicator.disconnect()
 
 
+@pytest.fixture(scope="session", autouse=True)
+def close_sync_thread_connections(django_db_setup) -> Generator[None, None, None]:
+    yield
+    # Outside of `async_to_sync` (async tests, `asyncio.run` of the workers...), the ORM calls of
+    # the async code run in a single thread of asgiref: its connection would keep the test
+    # database busy, and fail its deletion
+    asyncio.run(sync_to_async(connections.close_all)())
+
+
+@pytest.fixture(autouse=True)
+def clear_user_cache() -> None:
+    """Users are created anew, with the same FC hashes, for each test."""
+    user_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_push_hosts() -> None:
+    """The push hosts limits and circuit breakers are local to the process."""
+    reset_hosts()
+
+
 @pytest.fixture(autouse=True)
 def use_in_memory_channel_layer(settings) -> None:
     """We don't want django-channels to use the postgresql backend during tests."""
@@ -242,6 +311,28 @@ def partner_auth(settings) -> dict[str, str]:
     return {"authorization": f"Basic {b64}"}
 
 
+@pytest.fixture
+def fcm_send(monkeypatch: pytest.MonkeyPatch) -> Mock:
+    """Replace the FCM batch sends: the returned mock is called with each message sent.
+
+    A message fails if the mock raises a Firebase error for it.
+    """
+    send_mock = Mock()
+
+    def send_each(messages, dry_run=False, app=None):
+        responses = []
+        for index, message in enumerate(messages):
+            try:
+                send_mock(message)
+                responses.append(messaging.SendResponse({"name": f"messages/{index}"}, None))
+            except exceptions.FirebaseError as e:
+                responses.append(messaging.SendResponse(None, e))
+        return messaging.BatchResponse(responses)
+
+    monkeypatch.setattr("ami.notification.push.messaging.send_each", send_each)
+    return send_mock
+
+
 @pytest.fixture
 def mobile_notification(mobile_registration: Registration) -> Notification:
     return Notification.objects.create(
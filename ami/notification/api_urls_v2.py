@@ -1,9 +1,15 @@
 from django.urls import path
 
 from .api_views_v2 import (
-    partner_create_event,
+    apartner_create_event,
+    apartner_create_events_stream,
+    partner_create_events,
+    partner_get_event,
 )
 
 urlpatterns = [
-    path("event", partner_create_event),
+    path("event", apartner_create_event),
+    path("event/<uuid:event_id>", partner_get_event),
+    path("events", partner_create_events),
+    path("events/stream", apartner_create_events_stream),
 ]
@@ -1,87 +1,90 @@
+import json
 import logging
-import os
-from functools import partial
-from typing import cast
+import uuid
+from collections.abc import AsyncIterator, Iterator
+from io import BytesIO
 
-from django.db import transaction
-from drf_spectacular.utils import extend_schema
-from rest_framework import serializers
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpRequest, JsonResponse, QueryDict, StreamingHttpResponse
+from django.http.response import HttpResponseBase
+from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework import exceptions, serializers
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
-from ami.notification.tasks import push_notification
 from ami.partner.auth import IsPartnerAuthenticated, PartnerBasicAuthentication
-from ami.user.models import User
-from ami.utils import sentry
+from ami.partner.models import Partner
 
-from .models import Notification
+from .models import InboxEvent
 from .serializers import (
     NotificationResponseSerializer,
+    PartnerEventAcceptedResponseSerializer,
+    PartnerEventBatchItemResponseSerializer,
     PartnerEventCreateSerializerV2,
+    PartnerEventStatusSerializer,
+)
+from .services import (
+    EVENTS_BATCH_CHUNK_SIZE,
+    EventResult,
+    RecipientError,
+    acreate_event,
+    create_event,
+    create_events,
+    validate_event,
 )
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of events accepted in a single batch request.
+EVENTS_BATCH_MAX_SIZE = 1000
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
 
-def _partner_create_event(request: Request, data: dict):
-    current_partner = request.ami_partner
-    ignore_unknown_user = os.getenv(
-        "IGNORE_NOTIFICATION_REQUESTS_FOR_UNREGISTERED_USER", "False"
-    ).lower() in ("true", "1", "t")
 
+def _create_event_response(result: EventResult) -> dict:
+    data = NotificationResponseSerializer(
+        {
+            "notification_id": result.notification_id,
+            "notification_send_status": result.notification_send_status,
+        }
+    ).data
+    assert isinstance(data, dict)
+    return data
+
+
+def _partner_create_event(request: Request, data: dict):
     try:
-        user = User.objects.get(fc_hash=data["recipient_fc_hash"])
-    except User.DoesNotExist:
-        user = None
-
-    if user is None:
-        if ignore_unknown_user:
-            logger.info("User not found")
-            return Response({"error": "User not found"}, status=404)
-        user = User.objects.create(fc_hash=data["recipient_fc_hash"])
-        notification_send_status = False
-    else:
-        if ignore_unknown_user and user.last_logged_in is None:
-            logger.info("User never seen")
-            return Response({"error": "User never seen"}, status=404)
-        notification_send_status = user.last_logged_in is not None
-
-    try_push = True
-    if not data["try_push"] or user.last_logged_in is None:
-        # don't push notification if not required or if user has never logged in on AMI
-        try_push = False
-
-    data.pop("recipient_fc_hash")
-    with transaction.atomic():
-        notification, created = Notification.objects.get_or_create(
-            user_id=user.id,
-            partner_id=current_partner.id,
-            defaults={"send_status": notification_send_status},
-            **data,
-        )
-        if created:
-            transaction.on_commit(
-                partial(push_notification.enqueue, str(notification.id), try_push)  # type: ignore[union-attr]
-            )
-
-    sentry.add_counter("notification.request.processed")
-
-    response_data = {
-        "notification_id": notification.id,
-        "notification_send_status": notification_send_status,
-    }
-    return Response(
-        NotificationResponseSerializer(response_data).data, status=201 if created else 200
-    )
+        result = create_event(request.ami_partner.id, data)
+    except RecipientError as error:
+        return Response({"error": str(error)}, status=404)
+    return Response(_create_event_response(result), status=201 if result.created else 200)
+
+
+def _wants_async_ingestion(request: Request) -> bool:
+    preferences = [value.strip() for value in request.headers.get("Prefer", "").split(",")]
+    return request.ami_partner.async_ingestion or "respond-async" in preferences
 
 
 @extend_schema(
     methods=["PUT"],
     request=PartnerEventCreateSerializerV2,
+    parameters=[
+        OpenApiParameter(
+            "Prefer",
+            location=OpenApiParameter.HEADER,
+            required=False,
+            description='"respond-async" pour que l\'événement soit traité de manière asynchrone : '
+            "la réponse 202 contient un identifiant permettant d'en suivre le traitement.",
+        )
+    ],
     responses={
         200: NotificationResponseSerializer,
         201: NotificationResponseSerializer,
+        202: PartnerEventAcceptedResponseSerializer,
     },
     tags=["API partenaires"],
 )
@@ -89,12 +92,279 @@ def _partner_create_event(request: Request, data: dict):
 @authentication_classes([PartnerBasicAuthentication])
 @permission_classes([IsPartnerAuthenticated])
 def partner_create_event(request: Request) -> Response[NotificationResponseSerializer]:
-    serializer = PartnerEventCreateSerializerV2(data=request.data)
-    try:
-        serializer.is_valid(raise_exception=True)
-    except serializers.ValidationError:
-        logger.exception("Partner create event serialization error")
-        raise
-    data: dict = cast(dict, serializer.validated_data)
+    data = validate_event(request.data)
+
+    if _wants_async_ingestion(request):
+        event = InboxEvent.objects.create(
+            partner_id=request.ami_partner.id, payload=_inbox_payload(request)
+        )
+        return Response(
+            PartnerEventAcceptedResponseSerializer({"event_id": event.id}).data, status=202
+        )
 
     return _partner_create_event(request, data)
+
+
+def _inbox_payload(request: Request) -> dict:
+    data = request.data
+    if isinstance(data, QueryDict):
+        return data.dict()
+    # Validated already, so a JSON object
+    assert isinstance(data, dict)
+    return data
+
+
+async def _apartner_create_event(partner: Partner, data: dict) -> JsonResponse:
+    """Async version of `_partner_create_event`, see `apartner_create_event`."""
+    try:
+        result = await acreate_event(partner.id, data)
+    except RecipientError as error:
+        return JsonResponse({"error": str(error)}, status=404)
+    return JsonResponse(_create_event_response(result), status=201 if result.created else 200)
+
+
+def _api_exception_response(request: Request, exc: exceptions.APIException) -> JsonResponse:
+    """Render an API exception the way DRF's default exception handler does."""
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+    response = JsonResponse(data, status=exc.status_code, safe=False)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response["WWW-Authenticate"] = PartnerBasicAuthentication().authenticate_header(request)
+    return response
+
+
+def _partner_request(request: HttpRequest) -> Request:
+    """Wrap the request of a native async partner view, see `apartner_create_event`."""
+    return Request(
+        request,
+        parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES or []],
+        authenticators=[PartnerBasicAuthentication()],
+    )
+
+
+def _authenticate_partner(request: Request) -> None:
+    """Check a PUT request to a native async partner view, as DRF's `api_view` would."""
+    if request.method != "PUT":
+        raise exceptions.MethodNotAllowed(request.method)
+    request.user  # authenticate the partner, if any  # noqa: B018
+    if not IsPartnerAuthenticated().has_permission(request, None):
+        raise exceptions.NotAuthenticated()
+
+
+@csrf_exempt
+async def apartner_create_event(request: HttpRequest) -> JsonResponse:
+    """Native async version of `partner_create_event`, with the same contract.
+
+    DRF views are sync only: under ASGI, each request would run in asgiref's thread pool. The
+    authentication, parsing and validation are still done by DRF, they don't hit the database.
+    """
+    drf_request = _partner_request(request)
+    try:
+        _authenticate_partner(drf_request)
+        data = validate_event(drf_request.data)
+    except exceptions.APIException as exc:
+        return _api_exception_response(drf_request, exc)
+
+    partner = drf_request.ami_partner
+    if _wants_async_ingestion(drf_request):
+        event = await InboxEvent.objects.acreate(
+            partner_id=partner.id, payload=_inbox_payload(drf_request)
+        )
+        return JsonResponse(
+            PartnerEventAcceptedResponseSerializer({"event_id": event.id}).data, status=202
+        )
+
+    return await _apartner_create_event(partner, data)
+
+
+# Served by the async view, documented with the OpenAPI schema of the DRF one
+apartner_create_event.cls = partner_create_event.cls  # type: ignore[attr-defined]
+apartner_create_event.initkwargs = partner_create_event.initkwargs  # type: ignore[attr-defined]
+
+
+@extend_schema(
+    responses={200: PartnerEventStatusSerializer},
+    tags=["API partenaires"],
+)
+@api_view(["GET"])
+@authentication_classes([PartnerBasicAuthentication])
+@permission_classes([IsPartnerAuthenticated])
+def partner_get_event(request: Request, event_id: uuid.UUID) -> Response:
+    event = get_object_or_404(InboxEvent, id=event_id, partner_id=request.ami_partner.id)
+    return Response(PartnerEventStatusSerializer(event).data)
+
+
+@extend_schema(
+    methods=["PUT"],
+    request=PartnerEventCreateSerializerV2(many=True),
+    responses={200: PartnerEventBatchItemResponseSerializer(many=True)},
+    tags=["API partenaires"],
+    description="Création d'événements par lot (jusqu'à "
+    f"{EVENTS_BATCH_MAX_SIZE} événements). Le résultat de chaque événement est renvoyé "
+    "dans le même ordre que la requête : une erreur sur un événement ne rejette pas le lot.",
+)
+@api_view(["PUT"])
+@authentication_classes([PartnerBasicAuthentication])
+@permission_classes([IsPartnerAuthenticated])
+def partner_create_events(request: Request) -> Response:
+    if not isinstance(request.data, list):
+        raise serializers.ValidationError(
+            {"non_field_errors": ["Une liste d'événements est attendue."]}
+        )
+    if len(request.data) > EVENTS_BATCH_MAX_SIZE:
+        raise serializers.ValidationError(
+            {
+                "non_field_errors": [
+                    f"Un lot ne peut pas contenir plus de {EVENTS_BATCH_MAX_SIZE} événements."
+                ]
+            }
+        )
+
+    results = create_events(request.ami_partner.id, request.data)
+    errors_count = sum(1 for result in results if result["status"] == "error")
+    if errors_count:
+        logger.warning(f"Partner create events: {errors_count}/{len(results)} events rejected")
+
+    return Response(PartnerEventBatchItemResponseSerializer(results, many=True).data)
+
+
+_INVALID_JSON = object()
+
+
+def _partner_create_events_ndjson_chunk(
+    partner_id: str, lines: Iterator[bytes], chunk_size: int, line_number: int
+) -> tuple[str, int]:
+    """Ingest the next `chunk_size` events of an NDJSON stream.
+
+    Return the NDJSON results of these events, and the number of the last line read. The
+    results are empty once the stream is exhausted.
+    """
+    chunk: list[tuple[int, object]] = []
+    for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            chunk.append((line_number, json.loads(line)))
+        except ValueError:
+            chunk.append((line_number, _INVALID_JSON))
+        if len(chunk) == chunk_size:
+            break
+
+    items = [item for _, item in chunk if item is not _INVALID_JSON]
+    results = iter(create_events(partner_id, items) if items else [])
+    output = []
+    for index, item in chunk:
+        if item is _INVALID_JSON:
+            result = {"status": "error", "errors": {"non_field_errors": ["JSON invalide."]}}
+        else:
+            result = next(results)
+        data = PartnerEventBatchItemResponseSerializer(result).data
+        assert isinstance(data, dict)
+        output.append(json.dumps({"line": index, **data}))
+    return "".join(f"{line}\n" for line in output), line_number
+
+
+def _streamcreate_events(partner_id: str, lines: Iterator[bytes], chunk_size: int) -> Iterator[str]:
+    line_number = 0
+    while True:
+        output, line_number = _partner_create_events_ndjson_chunk(
+            partner_id, lines, chunk_size, line_number
+        )
+        if not output:
+            break
+        yield output
+
+
+async def _astreamcreate_events(
+    partner_id: str, lines: Iterator[bytes], chunk_size: int
+) -> AsyncIterator[str]:
+    """Async version of `_streamcreate_events`."""
+    create_events_chunk = sync_to_async(_partner_create_events_ndjson_chunk)
+    line_number = 0
+    while True:
+        output, line_number = await create_events_chunk(partner_id, lines, chunk_size, line_number)
+        if not output:
+            break
+        yield output
+
+
+def _events_stream_chunk_size(request: Request) -> int:
+    """Check the content type of an events stream, and return its validated `chunk_size`."""
+    if request.content_type.split(";")[0].strip() != NDJSON_CONTENT_TYPE:
+        raise exceptions.UnsupportedMediaType(request.content_type)
+    try:
+        chunk_size = int(request.query_params.get("chunk_size", EVENTS_BATCH_CHUNK_SIZE))
+    except ValueError:
+        chunk_size = 0
+    if not 0 < chunk_size <= EVENTS_BATCH_MAX_SIZE:
+        raise serializers.ValidationError(
+            {
+                "chunk_size": [
+                    f"La taille des paquets doit être comprise entre 1 et {EVENTS_BATCH_MAX_SIZE}."
+                ]
+            }
+        )
+    return chunk_size
+
+
+@extend_schema(
+    methods=["PUT"],
+    request={NDJSON_CONTENT_TYPE: PartnerEventCreateSerializerV2},
+    parameters=[
+        OpenApiParameter(
+            "chunk_size",
+            int,
+            required=False,
+            description="Nombre d'événements enregistrés par transaction (par défaut "
+            f"{EVENTS_BATCH_CHUNK_SIZE}, au plus {EVENTS_BATCH_MAX_SIZE})",
+        )
+    ],
+    responses={(200, NDJSON_CONTENT_TYPE): PartnerEventBatchItemResponseSerializer},
+    tags=["API partenaires"],
+    description="Création d'événements en flux, pour la reprise d'historique : un événement "
+    "JSON par ligne, sans limite de nombre. Les événements sont enregistrés par paquets, et "
+    "le résultat de chaque ligne est renvoyé au fil de l'eau, avec son numéro de ligne.",
+)
+@api_view(["PUT"])
+@authentication_classes([PartnerBasicAuthentication])
+@permission_classes([IsPartnerAuthenticated])
+def partner_create_events_stream(request: Request) -> StreamingHttpResponse:
+    chunk_size = _events_stream_chunk_size(request)
+    # Read the body line by line from the request stream (None if empty), never as a whole
+    stream = request.stream
+    lines: Iterator[bytes] = (
+        iter(stream) if isinstance(stream, (HttpRequest, BytesIO)) else iter(())
+    )
+    return StreamingHttpResponse(
+        _streamcreate_events(request.ami_partner.id, lines, chunk_size),
+        content_type=NDJSON_CONTENT_TYPE,
+    )
+
+
+@csrf_exempt
+async def apartner_create_events_stream(request: HttpRequest) -> HttpResponseBase:
+    """Native async version of `partner_create_events_stream`, with the same contract.
+
+    The results are streamed from an asynchronous iterator under ASGI, and from a synchronous one
+    under WSGI: Django would buffer the whole response otherwise.
+    """
+    drf_request = _partner_request(request)
+    try:
+        _authenticate_partner(drf_request)
+        chunk_size = _events_stream_chunk_size(drf_request)
+    except exceptions.APIException as exc:
+        return _api_exception_response(drf_request, exc)
+
+    partner_id = drf_request.ami_partner.id
+    # Read the body line by line, never as a whole
+    lines = iter(request)
+    if isinstance(request, ASGIRequest):
+        content = _astreamcreate_events(partner_id, lines, chunk_size)
+    else:
+        content = _streamcreate_events(partner_id, lines, chunk_size)
+    return StreamingHttpResponse(content, content_type=NDJSON_CONTENT_TYPE)
+
+
+# Served by the async view, documented with the OpenAPI schema of the DRF one
+apartner_create_events_stream.cls = partner_create_events_stream.cls  # type: ignore[attr-defined]
+apartner_create_events_stream.initkwargs = partner_create_events_stream.initkwargs  # type: ignore[attr-defined]
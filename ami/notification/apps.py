@@ -14,4 +14,4 @@ class NotificationConfig(AppConfig):
             os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = settings.GOOGLE_APPLICATION_CREDENTIALS
         # This needs the "GOOGLE_APPLICATION_CREDENTIALS" env variable to be set to the secret json filename.
         # See the CONTRIBUTING.md file.
-        firebase_admin.initialize_app()
+        firebase_admin.initialize_app(options={"httpTimeout": settings.PUSH_HOST_TIMEOUT})
@@ -0,0 +1,113 @@
+"""Notification sent at once to all the users of a segment.
+
+A `Broadcast` is run by the `broadcast_notification` task: its recipients are walked in chunks by user
+id, the notifications of each chunk are created with a single insert, and pushed by one
+`push_notifications` task. Notifications are created once per recipient, so that a broadcast
+interrupted midway can be run again to finish it.
+"""
+
+import hashlib
+import uuid
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, QuerySet
+from django.utils.timezone import now
+
+from ami.notification.lanes import Lane, in_lane
+from ami.notification.models import Broadcast, Notification
+from ami.user.models import Consent, Registration, User
+
+# Recipients whose notifications are created at once, and pushed by the same task
+BROADCAST_CHUNK_SIZE = 1000
+
+
+def segment_users(broadcast: Broadcast) -> QuerySet[User]:
+    if broadcast.segment == Broadcast.Segment.REGISTERED:
+        return User.objects.filter(
+            Exists(Registration.objects.filter(user_id=OuterRef("id"), quarantined_at__isnull=True))
+        )
+    if broadcast.segment == Broadcast.Segment.CONSENT:
+        return User.objects.filter(
+            Exists(
+                Consent.objects.filter(
+                    user_id=OuterRef("id"),
+                    partner_id=broadcast.consent_partner_id,
+                    consent_datetime__isnull=False,
+                )
+            )
+        )
+    return User.objects.filter(fc_hash__in=broadcast.fc_hashes)
+
+
+def build_broadcast_idempotency_key(broadcast_id: uuid.UUID, user_id: uuid.UUID) -> str:
+    return hashlib.sha256(f"broadcast:{broadcast_id}:{user_id}".encode()).hexdigest()
+
+
+def build_notification(broadcast: Broadcast, user_id: uuid.UUID, send_status: bool) -> Notification:
+    return Notification(
+        user_id=user_id,
+        partner_id=broadcast.partner_id,
+        content_title=broadcast.content_title,
+        content_body=broadcast.content_body,
+        content_icon=broadcast.content_icon,
+        content_link=broadcast.content_link,
+        valid_until=broadcast.valid_until,
+        try_push=broadcast.try_push,
+        send_status=send_status,
+        idempotency_key=build_broadcast_idempotency_key(broadcast.id, user_id),
+    )
+
+
+def run_chunk(broadcast: Broadcast, users: list[tuple[uuid.UUID, bool]]) -> None:
+    """Create and push the notifications of `(user_id, send_status)` recipients."""
+    from ami.notification.tasks import push_notifications
+
+    notifications = [
+        build_notification(broadcast, user_id, send_status) for user_id, send_status in users
+    ]
+    with transaction.atomic():
+        stored_ids = Notification.bulk_create_once(notifications)
+        created = [
+            notification
+            for notification in notifications
+            if stored_ids[notification.idempotency_key] == notification.id
+        ]
+        Broadcast.objects.filter(id=broadcast.id).update(
+            recipients_count=F("recipients_count") + len(users),
+            created_count=F("created_count") + len(created),
+        )
+        if created:
+            # don't push notification if not required or if user has never logged in on AMI
+            to_push = [
+                (str(notification.id), broadcast.try_push and bool(notification.send_status))
+                for notification in created
+            ]
+            transaction.on_commit(
+                partial(in_lane(push_notifications, Lane.BULK).enqueue, to_push, str(broadcast.id))
+            )
+
+
+def run_broadcast(broadcast: Broadcast) -> None:
+    """Create and push the notifications of a broadcast, see the module docstring."""
+    queryset = segment_users(broadcast).order_by("id")
+    Broadcast.objects.filter(id=broadcast.id).update(
+        status=Broadcast.Status.RUNNING,
+        started_at=now(),
+        total_count=queryset.count(),
+        # Counted again when run again, unlike the notifications created or pushed
+        recipients_count=0,
+    )
+    last_id = None
+    while True:
+        chunk_queryset = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        chunk = list(chunk_queryset.values_list("id", "last_logged_in")[:BROADCAST_CHUNK_SIZE])
+        if not chunk:
+            break
+        run_chunk(
+            broadcast, [(user_id, last_logged_in is not None) for user_id, last_logged_in in chunk]
+        )
+        last_id = chunk[-1][0]
+    Broadcast.objects.filter(id=broadcast.id).update(
+        status=Broadcast.Status.DONE, finished_at=now()
+    )
@@ -0,0 +1,139 @@
+"""Web push message building: payload encryption and VAPID signature.
+
+Encrypting a payload for a subscription (ECDH key agreement, then AES-GCM) is pure CPU work.
+It's done on the event loop thread for a few messages, but pushes to many web push
+registrations at once encrypt in a process pool sized to the cores instead, see `encrypt_many`.
+
+The pool workers only import this module: it must not need Django to be set up.
+"""
+
+import asyncio
+import functools
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import webpush
+from cryptography.hazmat.primitives import serialization
+from django.conf import settings
+from pydantic import AnyHttpUrl, EmailStr
+from webpush.vapid import VAPID
+
+# VAPID headers are signed again when they expire in less than this (in seconds)
+VAPID_REFRESH_MARGIN = 60 * 60
+# Chunks of messages sent to each pool worker, to balance uneven workers
+CHUNKS_PER_WORKER = 4
+
+
+class CachedVAPID(VAPID):
+    """VAPID signer reusing its authorization headers for each push service.
+
+    A header is valid for all the endpoints of a push service (its "audience") until it
+    expires, so it's only signed again `VAPID_REFRESH_MARGIN` seconds before expiring.
+    """
+
+    def __init__(self, private_key: bytes, public_key: bytes) -> None:
+        super().__init__(private_key=private_key, public_key=public_key)
+        # Parse the PEM private key once, instead of at each signature
+        self.private_key = serialization.load_pem_private_key(private_key, password=None)
+        self._headers: dict[tuple[str, str], tuple[float, str]] = {}
+        # Sync callers push from several threads
+        self._lock = threading.Lock()
+
+    def get_authorization_header(
+        self, endpoint: AnyHttpUrl, subscriber: EmailStr, expiration: int
+    ) -> str:
+        key = (f"{endpoint.scheme}://{endpoint.host}", subscriber)
+        now_ = time.time()
+        with self._lock:
+            cached = self._headers.get(key)
+        if cached is not None and cached[0] - VAPID_REFRESH_MARGIN > now_:
+            return cached[1]
+        header = super().get_authorization_header(endpoint, subscriber, expiration)
+        with self._lock:
+            self._headers[key] = (now_ + expiration, header)
+        return header
+
+
+@functools.lru_cache(maxsize=1)
+def get_signer(private_key: str, public_key: str) -> webpush.WebPush:
+    """Return the signer of the process for these VAPID keys."""
+    webpush_ = webpush.WebPush(
+        public_key=public_key.encode(),
+        private_key=private_key.encode(),
+        subscriber="contact.ami@numerique.gouv.fr",
+    )
+    webpush_.vapid = CachedVAPID(private_key=private_key.encode(), public_key=public_key.encode())
+    return webpush_
+
+
+def encrypt_chunk(
+    private_key: str, public_key: str, messages: list[tuple[str, webpush.WebPushSubscription]]
+) -> list[webpush.WebPushMessage]:
+    """Build the web push messages of `(payload, subscription)` pairs, in a pool worker."""
+    signer = get_signer(private_key, public_key)
+    return [
+        signer.get(message=payload, subscription=subscription) for payload, subscription in messages
+    ]
+
+
+class EncryptionPool(ProcessPoolExecutor):
+    """A process pool which knows its number of workers, to split the work between them."""
+
+    def __init__(self, workers: int):
+        # Spawned rather than forked: the pushing process runs threads and event loops
+        super().__init__(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        self.workers = workers
+
+
+_executor: EncryptionPool | None = None
+_executor_lock = threading.Lock()
+
+
+def create_executor(workers: int) -> EncryptionPool:
+    return EncryptionPool(workers)
+
+
+def get_executor() -> EncryptionPool:
+    """Return the encryption pool of the process, started on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = create_executor(settings.PUSH_ENCRYPTION_WORKERS)
+        return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = None
+
+
+async def encrypt_many(
+    messages: list[tuple[str, webpush.WebPushSubscription]],
+    executor: EncryptionPool | None = None,
+) -> list[webpush.WebPushMessage]:
+    """Build the web push messages of `(payload, subscription)` pairs in the encryption pool.
+
+    The messages are returned in the same order.
+    """
+    executor = executor or get_executor()
+    chunk_size = math.ceil(len(messages) / (executor.workers * CHUNKS_PER_WORKER)) or 1
+    loop = asyncio.get_running_loop()
+    chunks = await asyncio.gather(
+        *(
+            loop.run_in_executor(
+                executor,
+                encrypt_chunk,
+                settings.VAPID_PRIVATE_KEY,
+                settings.VAPID_PUBLIC_KEY,
+                messages[index : index + chunk_size],
+            )
+            for index in range(0, len(messages), chunk_size)
+        )
+    )
+    return [message for chunk in chunks for message in chunk]
@@ -0,0 +1,78 @@
+"""Push delivery health of the registrations.
+
+The outcome of each delivery is recorded on its registration:
+
+- a success resets the failures;
+- a transient failure (server error, rate limiting, network error) backs the registration off:
+  pushes skip it for a delay growing exponentially with the consecutive failures, up to
+  `BACKOFF_MAX`. It's never quarantined for that: an outage of the push service would
+  quarantine healthy devices;
+- a permanent failure (the push service says the subscription is gone) quarantines it: pushes
+  skip it, and the `prune-registrations` command deletes it after
+  `REGISTRATION_QUARANTINE_DAYS`, unless the device registers it again meanwhile.
+"""
+
+import datetime
+import math
+
+from django.db.models import Count, F, Q
+from django.utils.timezone import now
+
+from ami.user.models import Registration
+
+BACKOFF_BASE = datetime.timedelta(minutes=1)
+BACKOFF_MAX = datetime.timedelta(days=1)
+# The success of a healthy registration is only recorded again after this delay
+SUCCESS_REFRESH_INTERVAL = datetime.timedelta(hours=1)
+
+
+def backoff_delay(failure_count: int) -> datetime.timedelta:
+    # The count of a registration failing for long grows without bound: cap the exponent
+    exponent = min(failure_count - 1, math.ceil(math.log2(BACKOFF_MAX / BACKOFF_BASE)))
+    return min(BACKOFF_BASE * 2**exponent, BACKOFF_MAX)
+
+
+async def record_success(registration: Registration) -> None:
+    now_ = now()
+    if (
+        registration.failure_count == 0
+        and registration.last_success_at is not None
+        and registration.last_success_at > now_ - SUCCESS_REFRESH_INTERVAL
+    ):
+        # Don't write on each push to healthy registrations
+        return
+    await Registration.objects.filter(id=registration.id).aupdate(
+        failure_count=0, backoff_until=None, last_success_at=now_
+    )
+
+
+async def record_transient_failure(
+    registration: Registration, retry_after: float | None = None
+) -> None:
+    """Back the registration off, for at least `retry_after` seconds if given."""
+    now_ = now()
+    delay = backoff_delay(registration.failure_count + 1)
+    if retry_after is not None:
+        delay = max(delay, datetime.timedelta(seconds=retry_after))
+    await Registration.objects.filter(id=registration.id).aupdate(
+        failure_count=F("failure_count") + 1, last_failure_at=now_, backoff_until=now_ + delay
+    )
+
+
+async def record_gone(registration: Registration) -> None:
+    now_ = now()
+    await Registration.objects.filter(id=registration.id).aupdate(
+        failure_count=F("failure_count") + 1, last_failure_at=now_, quarantined_at=now_
+    )
+
+
+def registration_health() -> dict[str, int]:
+    now_ = now()
+    quarantined = Q(quarantined_at__isnull=False)
+    return Registration.objects.aggregate(
+        total=Count("id"),
+        healthy=Count("id", filter=Q(failure_count=0) & ~quarantined),
+        failing=Count("id", filter=Q(failure_count__gt=0) & ~quarantined),
+        backing_off=Count("id", filter=Q(backoff_until__gt=now_) & ~quarantined),
+        quarantined=Count("id", filter=quarantined),
+    )
@@ -0,0 +1,167 @@
+"""Protection of the push pipeline against the push services (hosts) misbehaving.
+
+Each host gets:
+
+- a limit of concurrent requests (`PUSH_HOST_MAX_IN_FLIGHT`) and of requests per second
+  (`PUSH_HOST_MAX_RATE`), so a burst for one host doesn't use all the connections and workers;
+- a circuit breaker: after `PUSH_CIRCUIT_FAILURE_THRESHOLD` transient failures in a row (server
+  errors, rate limiting, timeouts), the circuit opens and the deliveries to the host fail fast
+  and are deferred, instead of waiting for timeouts. After `PUSH_CIRCUIT_OPEN_SECONDS`, a single
+  delivery probes the host: its success closes the circuit, its failure opens it again. The probe
+  is released if the delivery ends without either, for example when cancelled.
+
+The state is local to each worker process.
+"""
+
+import asyncio
+import threading
+import time
+from collections.abc import AsyncGenerator, Generator
+from contextlib import asynccontextmanager, contextmanager
+from weakref import WeakKeyDictionary
+
+from django.conf import settings
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self) -> None:
+        self.failures = 0
+        self.opened_until = 0.0
+        self.probing = False
+        # Outcomes recorded, to tell whether a probe got one
+        self.outcomes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.failures < settings.PUSH_CIRCUIT_FAILURE_THRESHOLD:
+            return self.CLOSED
+        if time.monotonic() < self.opened_until:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def _acquire(self) -> tuple[bool, bool]:
+        """Whether a request may be sent to the host now, and whether it's the probe."""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True, False
+            if state == self.HALF_OPEN and not self.probing:
+                self.probing = True
+                return True, True
+            return False, False
+
+    def allow(self) -> bool:
+        """Whether a request may be sent to the host now."""
+        allowed, _ = self._acquire()
+        return allowed
+
+    @contextmanager
+    def probe(self) -> Generator[bool]:
+        """`allow`, releasing the probe if no outcome is recorded within the context."""
+        allowed, probing = self._acquire()
+        outcomes = self.outcomes
+        try:
+            yield allowed
+        finally:
+            if probing:
+                with self._lock:
+                    if self.outcomes == outcomes:
+                        self.probing = False
+
+    def retry_after(self) -> float:
+        """Seconds before the host may be tried again."""
+        return max(self.opened_until - time.monotonic(), 0.0)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.probing = False
+            self.outcomes += 1
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= settings.PUSH_CIRCUIT_FAILURE_THRESHOLD:
+                self.opened_until = time.monotonic() + settings.PUSH_CIRCUIT_OPEN_SECONDS
+                self.failures = max(self.failures, settings.PUSH_CIRCUIT_FAILURE_THRESHOLD)
+            self.probing = False
+            self.outcomes += 1
+
+
+class Host:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.circuit = CircuitBreaker()
+        self.in_flight = 0
+        self._next_request_at = 0.0
+        # asyncio semaphores can't be shared by event loops (`async_to_sync` creates one by task)
+        self._semaphores: WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = (
+            WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(settings.PUSH_HOST_MAX_IN_FLIGHT)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    def _rate_delay(self) -> float:
+        if not settings.PUSH_HOST_MAX_RATE:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            request_at = max(now, self._next_request_at)
+            self._next_request_at = request_at + 1 / settings.PUSH_HOST_MAX_RATE
+        return request_at - now
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncGenerator[None]:
+        """Wait for the concurrency and rate limits to allow a request to the host."""
+        async with self._semaphore():
+            delay = self._rate_delay()
+            if delay:
+                await asyncio.sleep(delay)
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "state": self.circuit.state,
+            "failures": self.circuit.failures,
+            "retry_after": round(self.circuit.retry_after(), 3),
+            "in_flight": self.in_flight,
+        }
+
+
+_hosts: dict[str, Host] = {}
+_hosts_lock = threading.Lock()
+
+
+def get_host(name: str) -> Host:
+    with _hosts_lock:
+        host = _hosts.get(name)
+        if host is None:
+            host = _hosts[name] = Host(name)
+        return host
+
+
+def hosts_stats() -> dict[str, dict]:
+    with _hosts_lock:
+        hosts = list(_hosts.values())
+    return {host.name: host.stats() for host in hosts}
+
+
+def reset_hosts() -> None:
+    with _hosts_lock:
+        _hosts.clear()
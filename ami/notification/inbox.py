@@ -0,0 +1,53 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Min
+from django.utils.timezone import now
+
+from ami.notification.models import InboxEvent
+from ami.notification.services import create_events
+
+DRAIN_BATCH_SIZE = 1000
+
+
+def drain_inbox(batch_size: int = DRAIN_BATCH_SIZE) -> int:
+    """Ingest the oldest pending inbox events, and return how many were processed.
+
+    Pending events are locked with `SKIP LOCKED`, so several workers can drain the inbox
+    concurrently.
+    """
+    with transaction.atomic():
+        events = list(
+            InboxEvent.objects.filter(status=InboxEvent.Status.PENDING)
+            .order_by("created_at")
+            .select_for_update(skip_locked=True)[:batch_size]
+        )
+        events_by_partner: dict[str, list[InboxEvent]] = defaultdict(list)
+        for event in events:
+            events_by_partner[event.partner_id].append(event)
+
+        processed_at = now()
+        for partner_id, partner_events in events_by_partner.items():
+            results = create_events(partner_id, [event.payload for event in partner_events])
+            for event, result in zip(partner_events, results):
+                event.status = result["status"]
+                event.notification_id = result.get("notification_id")
+                event.notification_send_status = result.get("notification_send_status")
+                event.errors = result.get("errors")
+                event.processed_at = processed_at
+
+        InboxEvent.objects.bulk_update(
+            events,
+            ["status", "notification_id", "notification_send_status", "errors", "processed_at"],
+        )
+    return len(events)
+
+
+def inbox_lag() -> dict[str, int | float]:
+    """How far behind the inbox workers are: pending events, and age of the oldest one."""
+    pending = InboxEvent.objects.filter(status=InboxEvent.Status.PENDING)
+    oldest = pending.aggregate(oldest=Min("created_at"))["oldest"]
+    return {
+        "pending": pending.count(),
+        "oldest_pending_age_seconds": (now() - oldest).total_seconds() if oldest else 0.0,
+    }
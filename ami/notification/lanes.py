@@ -0,0 +1,87 @@
+"""Priority lanes of the push tasks.
+
+Each lane is a queue of the task backend, so that a large backfill or broadcast doesn't delay the
+notifications a user is waiting for:
+
+- interactive: the partner events sent one at a time, and the agent admin notifications;
+- scheduled: the scheduled notifications;
+- bulk: the partner events sent in batches or streams, and the broadcasts.
+
+The push worker shares its free slots between the lanes by smooth weighted round robin on
+`PUSH_LANE_WEIGHTS`, so the bulk lane still progresses while the interactive one is busy. The
+push tasks of the default queue, enqueued without a lane, are claimed with the interactive lane.
+The lanes are only run by the push worker: `make db-worker` runs the default queue, for the
+other tasks (retries, broadcasts...), unless `DB_WORKER_QUEUES` says otherwise.
+"""
+
+from collections import Counter
+from enum import Enum
+
+from django.conf import settings
+from django.db.models import Count, Min
+from django.tasks import DEFAULT_TASK_QUEUE_NAME  # type: ignore[import-untyped]
+from django.utils.timezone import now
+
+from ami.utils.tasks import Task, db_task_results
+
+
+class Lane(str, Enum):
+    INTERACTIVE = "interactive"
+    SCHEDULED = "scheduled"
+    BULK = "bulk"
+
+
+def in_lane(task: Task, lane: Lane) -> Task:
+    """The task, enqueued in the queue of the lane."""
+    return task.using(queue_name=lane.value)
+
+
+def lane_queues(lane: Lane) -> list[str]:
+    if lane == Lane.INTERACTIVE:
+        return [lane.value, DEFAULT_TASK_QUEUE_NAME]
+    return [lane.value]
+
+
+class LaneScheduler:
+    """Smooth weighted round robin over the lanes, see the module docstring.
+
+    Each lane is picked as often as its weight, and the picks of the lanes are interleaved.
+    """
+
+    def __init__(self, weights: dict[str, int] | None = None) -> None:
+        lane_weights: dict[str, int] = settings.PUSH_LANE_WEIGHTS if weights is None else weights
+        self.weights = {Lane(lane): weight for lane, weight in lane_weights.items() if weight > 0}
+        self._current = dict.fromkeys(self.weights, 0)
+
+    def next(self) -> Lane:
+        for lane, weight in self.weights.items():
+            self._current[lane] += weight
+        lane = max(self._current, key=self._current.__getitem__)
+        self._current[lane] -= sum(self.weights.values())
+        return lane
+
+    def shares(self, count: int) -> Counter[Lane]:
+        """Share `count` slots between the lanes."""
+        return Counter(self.next() for _ in range(count))
+
+
+def lanes_lag() -> dict[str, dict[str, int | float]]:
+    """How far behind the push workers are: ready tasks of each lane, and age of the oldest one."""
+    stats = {
+        queue_name: (ready, oldest)
+        for queue_name, ready, oldest in db_task_results()
+        .ready()
+        .filter(queue_name__in=[lane.value for lane in Lane])
+        .order_by()
+        .values("queue_name")
+        .annotate(ready=Count("id"), oldest=Min("enqueued_at"))
+        .values_list("queue_name", "ready", "oldest")
+    }
+    lag: dict[str, dict[str, int | float]] = {}
+    for lane in Lane:
+        ready, oldest = stats.get(lane.value, (0, None))
+        lag[lane.value] = {
+            "ready": ready,
+            "oldest_ready_age_seconds": (now() - oldest).total_seconds() if oldest else 0.0,
+        }
+    return lag
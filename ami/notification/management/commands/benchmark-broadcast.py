@@ -0,0 +1,116 @@
+import asyncio
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.utils.timezone import now
+from django_tasks_db.models import DBTaskResultQuerySet
+
+from ami.notification.broadcast import run_broadcast
+from ami.notification.models import Broadcast, Notification
+from ami.notification.push import close_push_resources
+from ami.notification.push_worker import PushWorker
+from ami.tests.fake_push_server import FakePushServer, webpush_subscription
+from ami.user.models import Registration, User
+from ami.utils.async_db import close_pool, open_pool
+from ami.utils.tasks import db_task_results
+
+
+def broadcast_tasks(broadcast_id: uuid.UUID) -> DBTaskResultQuerySet:
+    """The push tasks enqueued by a broadcast, see `ami.notification.broadcast`."""
+    return db_task_results().filter(args_kwargs__args__1=str(broadcast_id))
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark a broadcast to users having a web push registration on a local fake push "
+        "server: the notifications creation, then the pushes by a single push worker. The "
+        "benchmark data is deleted at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipients", type=int, default=20000, help="Broadcast recipients")
+        parser.add_argument("--latency", type=float, default=0.0, help="Answer latency (s)")
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.PUSH_WORKER_CONCURRENCY,
+            help="Push tasks run at once by the push worker",
+        )
+        parser.add_argument(
+            "--host-max-rate",
+            type=float,
+            default=settings.PUSH_HOST_MAX_RATE,
+            help="Pushes per second to the fake push server, which is a single host, 0: unlimited",
+        )
+
+    def handle(
+        self,
+        *args,
+        recipients: int,
+        latency: float,
+        concurrency: int,
+        host_max_rate: float,
+        **kwargs,
+    ):
+        server = FakePushServer(latency=latency)
+        server.start()
+        prefix = f"benchmark-{uuid.uuid4().hex}-"
+        try:
+            users = User.objects.bulk_create(
+                User(fc_hash=f"{prefix}{index}", last_logged_in=now())
+                for index in range(recipients)
+            )
+            registrations = [
+                Registration(
+                    user=user, subscription=webpush_subscription(server.endpoint(str(index)))
+                )
+                for index, user in enumerate(users)
+            ]
+            for registration in registrations:
+                registration.extract_subscription_fields()
+            Registration.objects.bulk_create(registrations, batch_size=5000)
+            broadcast = Broadcast.objects.create(
+                segment=Broadcast.Segment.FC_HASHES,
+                fc_hashes=[user.fc_hash for user in users],
+                partner_id="dinum-ami",
+                content_title="Brouillon de nouvelle demande de démarche d'OTV",
+                content_body="Merci d'avoir initié votre demande",
+                try_push=True,
+            )
+            with override_settings(PUSH_HOST_MAX_RATE=host_max_rate):
+                start = time.perf_counter()
+                run_broadcast(broadcast)
+                self.write_rate("notifications created", recipients, time.perf_counter() - start)
+
+                count = broadcast_tasks(broadcast.id).count()
+                start = time.perf_counter()
+                asyncio.run(self.push(PushWorker(worker_id=prefix, concurrency=concurrency)))
+                self.write_rate(
+                    f"notifications pushed by {count} tasks, {concurrency} at once",
+                    len(server.requests),
+                    time.perf_counter() - start,
+                )
+        finally:
+            server.stop()
+            for broadcast_id in Broadcast.objects.filter(
+                fc_hashes__0__startswith=prefix
+            ).values_list("id", flat=True):
+                broadcast_tasks(broadcast_id).delete()
+            Notification.objects.filter(user__fc_hash__startswith=prefix).delete()
+            Broadcast.objects.filter(fc_hashes__0__startswith=prefix).delete()
+            Registration.objects.filter(user__fc_hash__startswith=prefix).delete()
+            User.objects.filter(fc_hash__startswith=prefix).delete()
+
+    async def push(self, worker: PushWorker) -> None:
+        await open_pool()
+        try:
+            await worker.run(batch=True)
+        finally:
+            await close_pool()
+            await close_push_resources()
+
+    def write_rate(self, label: str, count: int, total: float) -> None:
+        self.stdout.write(f"{label}: {count} in {total:.3f}s ({count / total * 60:.0f}/min)")
@@ -0,0 +1,127 @@
+import datetime
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils.timezone import now
+
+from ami.notification.models import Notification
+from ami.notification.utils import build_event_idempotency_key
+from ami.user.models import User
+from ami.utils.benchmark import Timings
+
+PARTNER_ID = "psl"
+SEED_CHUNK_SIZE = 5000
+
+
+def build_event_data(index: int) -> dict:
+    return {
+        "content_title": "Brouillon de nouvelle demande de démarche d'OTV",
+        "content_body": f"Merci d'avoir initié votre demande {index}",
+        "content_private_body": None,
+        "content_subheading": None,
+        "content_icon": None,
+        "content_link": None,
+        "item_type": "OTV",
+        "item_id": f"A-{index}",
+        "item_parent_partner_id": None,
+        "item_parent_type": None,
+        "item_parent_id": None,
+        "item_status_label": "Brouillon",
+        "item_generic_status": "new",
+        "item_canal": None,
+        "item_milestone_start_date": None,
+        "item_milestone_end_date": None,
+        "event_date": datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+        + datetime.timedelta(minutes=index),
+        "valid_until": None,
+        "try_push": True,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the partner event deduplication: legacy `get_or_create` lookup against the "
+        "idempotency key insert. Everything is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000, help="Seeded notifications")
+        parser.add_argument("--events", type=int, default=1000, help="Events ingested per path")
+        parser.add_argument("--users", type=int, default=10_000, help="Seeded users")
+
+    def handle(self, *args, rows: int, events: int, users: int, **kwargs):
+        with transaction.atomic():
+            self.run(rows, events, users)
+            transaction.set_rollback(True)
+
+    def seed(self, rows: int, user_ids: list[uuid.UUID]) -> None:
+        for start in range(0, rows, SEED_CHUNK_SIZE):
+            notifications = []
+            for index in range(start, min(start + SEED_CHUNK_SIZE, rows)):
+                user_id = user_ids[index % len(user_ids)]
+                data = build_event_data(index)
+                notifications.append(
+                    Notification(
+                        user_id=user_id,
+                        partner_id=PARTNER_ID,
+                        idempotency_key=build_event_idempotency_key(user_id, PARTNER_ID, data),
+                        **data,
+                    )
+                )
+            Notification.objects.bulk_create(notifications)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE notification")
+
+    def run(self, rows: int, events: int, users: int) -> None:
+        user_objects = [User(fc_hash=f"benchmark-{uuid.uuid4().hex}") for _ in range(users)]
+        User.objects.bulk_create(user_objects)
+        user_ids = [user.id for user in user_objects]
+
+        start = now()
+        self.seed(rows, user_ids)
+        self.stdout.write(f"Seeded {rows} notifications in {(now() - start).total_seconds():.1f}s")
+
+        # Half of the events are duplicates of seeded rows, half are new ones.
+        def events_for(offset: int) -> list[tuple[uuid.UUID, dict]]:
+            duplicates = [
+                (user_ids[index % len(user_ids)], build_event_data(index))
+                for index in range(0, min(events // 2, rows))
+            ]
+            new = [
+                (user_ids[index % len(user_ids)], build_event_data(index))
+                for index in range(rows + offset, rows + offset + events - len(duplicates))
+            ]
+            return duplicates + new
+
+        legacy = Timings("get_or_create")
+        for user_id, data in events_for(0):
+            with legacy.measure():
+                with transaction.atomic():
+                    Notification.objects.get_or_create(
+                        user_id=user_id,
+                        partner_id=PARTNER_ID,
+                        defaults={"send_status": True},
+                        **data,
+                    )
+
+        keyed = Timings("idempotency key")
+        for user_id, data in events_for(events):
+            with keyed.measure():
+                with transaction.atomic():
+                    Notification.bulk_create_once(
+                        [
+                            Notification(
+                                user_id=user_id,
+                                partner_id=PARTNER_ID,
+                                send_status=True,
+                                idempotency_key=build_event_idempotency_key(
+                                    user_id, PARTNER_ID, data
+                                ),
+                                **data,
+                            )
+                        ]
+                    )
+
+        self.stdout.write(legacy.summary())
+        self.stdout.write(keyed.summary())
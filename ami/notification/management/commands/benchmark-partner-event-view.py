@@ -0,0 +1,85 @@
+import asyncio
+import base64
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.urls import path
+
+from ami.notification.api_views_v2 import apartner_create_event, partner_create_event
+from ami.notification.models import Notification
+from ami.user.models import User
+from ami.utils.benchmark import Timings, asgi_request
+
+
+class BenchmarkURLConf:
+    urlpatterns = [
+        path("sync", partner_create_event),
+        path("async", apartner_create_event),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the partner event ingestion under concurrent load, through the ASGI app: "
+        "DRF sync view against the native async view. The benchmark data is deleted at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per view")
+        parser.add_argument("--concurrency", type=int, default=50, help="Concurrent requests")
+
+    def handle(self, *args, requests: int, concurrency: int, **kwargs):
+        user = User.objects.create(fc_hash=f"benchmark-{uuid.uuid4().hex}")
+        # Push tasks are not enqueued: only the request handling is measured
+        tasks = {
+            "default": {
+                "BACKEND": "django.tasks.backends.dummy.DummyBackend",
+                "QUEUES": settings.TASK_QUEUES,
+            }
+        }
+        try:
+            with override_settings(
+                ROOT_URLCONF=BenchmarkURLConf, TASKS=tasks, ALLOWED_HOSTS=["testserver"]
+            ):
+                for view in ["sync", "async"]:
+                    timings, total = asyncio.run(self.run(view, user, requests, concurrency))
+                    self.stdout.write(timings.summary(total))
+        finally:
+            Notification.objects.filter(user=user).delete()
+            user.delete()
+
+    async def run(
+        self, view: str, user: User, requests: int, concurrency: int
+    ) -> tuple[Timings, float]:
+        application = get_asgi_application()
+        credentials = base64.b64encode(f"psl:{settings.PARTNERS_PSL_SECRET}".encode()).decode()
+        headers = {"authorization": f"Basic {credentials}", "content-type": "application/json"}
+        timings = Timings(f"{view} view, concurrency {concurrency}")
+
+        async def send(indices: range) -> None:
+            for index in indices:
+                body = {
+                    "recipient_fc_hash": user.fc_hash,
+                    "content_title": "Brouillon de nouvelle demande de démarche d'OTV",
+                    "content_body": "Merci d'avoir initié votre demande",
+                    "item_type": "OTV",
+                    "item_id": f"{view}-{index}",
+                    "item_status_label": "Brouillon",
+                    "item_generic_status": "new",
+                    "event_date": "2025-11-27T10:55:00.000Z",
+                }
+                with timings.measure():
+                    status, content = await asgi_request(
+                        application, "PUT", f"/{view}", headers, json.dumps(body).encode()
+                    )
+                if status != 201:
+                    raise CommandError(f"{view} view answered {status}: {content[:200]!r}")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send(range(i, requests, concurrency)) for i in range(concurrency)))
+        return timings, time.perf_counter() - start
@@ -0,0 +1,179 @@
+import asyncio
+import base64
+import random
+import threading
+import time
+import uuid
+from collections.abc import Callable
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.tasks import DEFAULT_TASK_BACKEND_ALIAS  # type: ignore[import-untyped]
+from django.test import Client, override_settings
+from django.utils.timezone import now
+from django_tasks_db.management.commands.db_worker import Worker
+from django_tasks_db.models import DBTaskResult
+
+from ami.notification.models import Notification
+from ami.notification.push_worker import PushWorker
+from ami.tests.fake_push_server import FakePushServer, webpush_subscription
+from ami.user.models import Registration, User
+from ami.utils.benchmark import Timings
+from ami.utils.httpx import close_httpx_shared_async_client
+from ami.utils.task_wakeup import ListeningWorker, notify_tasks
+
+WORKERS = ["db_worker", "task-worker", "push-worker"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the latency from a partner event PUT to the attempt to push it, to a local "
+        "fake web push server, with each task worker: `db_worker` polling for tasks, against "
+        "`task-worker` and `push-worker` woken up by the new tasks. The events are sent one at "
+        "a time, after a random pause. The benchmark data is deleted at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--events", type=int, default=20, help="Events per worker")
+        parser.add_argument(
+            "--interval", type=float, default=1.0, help="Polling interval of db_worker (s)"
+        )
+        parser.add_argument(
+            "--pause", type=float, default=0.5, help="Maximum pause between events (s)"
+        )
+        parser.add_argument("--workers", default=",".join(WORKERS), help="Workers to benchmark")
+
+    def handle(self, *args, events: int, interval: float, pause: float, workers: str, **kwargs):
+        unknown = set(workers.split(",")) - set(WORKERS)
+        if unknown:
+            raise CommandError(f"Unknown workers: {', '.join(sorted(unknown))}")
+        server = FakePushServer(seed=0)
+        server.start()
+        user = User.objects.create(fc_hash=f"benchmark-{uuid.uuid4().hex}", last_logged_in=now())
+        registration = Registration(
+            user=user, subscription=webpush_subscription(server.endpoint("0"))
+        )
+        registration.extract_subscription_fields()
+        registration.save()
+        try:
+            for name in workers.split(","):
+                timings = Timings(self.label(name, interval))
+                start, stop = self.worker(name, interval)
+                thread = threading.Thread(target=start)
+                thread.start()
+                try:
+                    with override_settings(ALLOWED_HOSTS=["testserver"]):
+                        self.send_events(server, user, name, events, pause, timings)
+                finally:
+                    stop()
+                    thread.join()
+                self.stdout.write(timings.summary())
+        finally:
+            server.stop()
+            for name in WORKERS:
+                DBTaskResult.objects.filter(worker_ids__contains=[f"benchmark-{name}"]).delete()
+            Notification.objects.filter(user=user).delete()
+            Registration.objects.filter(user=user).delete()
+            user.delete()
+
+    def label(self, name: str, interval: float) -> str:
+        if name == "db_worker":
+            return f"db_worker, polling every {interval}s"
+        return f"{name}, woken up by the new tasks"
+
+    def worker(self, name: str, interval: float) -> tuple[Callable, Callable]:
+        """Functions to run the worker in a thread, and to stop it."""
+        worker_id = f"benchmark-{name}"
+        if name == "push-worker":
+            return self.push_worker(PushWorker(worker_id))
+
+        worker_class = Worker if name == "db_worker" else ListeningWorker
+        worker = worker_class(
+            queue_names=["*"],
+            interval=interval if name == "db_worker" else settings.TASK_WORKER_POLL_INTERVAL,
+            batch=False,
+            backend_name=DEFAULT_TASK_BACKEND_ALIAS,
+            startup_delay=False,
+            max_tasks=None,
+            worker_id=worker_id,
+        )
+
+        def start() -> None:
+            try:
+                worker.run()
+            finally:
+                connection.close()
+
+        def stop() -> None:
+            worker.running = False
+            # Wake it up, instead of waiting for its next poll
+            notify_tasks()
+
+        return start, stop
+
+    def push_worker(self, worker: PushWorker) -> tuple[Callable, Callable]:
+        loops: list[asyncio.AbstractEventLoop] = []
+        running = threading.Event()
+
+        async def run() -> None:
+            loops.append(asyncio.get_running_loop())
+            running.set()
+            try:
+                await worker.run()
+            finally:
+                await close_httpx_shared_async_client()
+
+        def start() -> None:
+            try:
+                async_to_sync(run)()
+            finally:
+                connection.close()
+
+        def stop() -> None:
+            if running.wait(timeout=10):
+                loops[0].call_soon_threadsafe(worker.stop)
+
+        return start, stop
+
+    def send_events(
+        self,
+        server: FakePushServer,
+        user: User,
+        name: str,
+        events: int,
+        pause: float,
+        timings: Timings,
+    ) -> None:
+        client = Client()
+        credentials = base64.b64encode(f"psl:{settings.PARTNERS_PSL_SECRET}".encode()).decode()
+        randomizer = random.Random(0)
+        for index in range(events):
+            # Events don't come in step with the polls
+            time.sleep(randomizer.uniform(0, pause))
+            pushes = len(server.received_at)
+            start = time.perf_counter()
+            response = client.put(
+                "/api/v2/event",
+                {
+                    "recipient_fc_hash": user.fc_hash,
+                    "content_title": "Brouillon de nouvelle demande de démarche d'OTV",
+                    "content_body": "Merci d'avoir initié votre demande",
+                    "item_type": "OTV",
+                    "item_id": f"{name}-{index}",
+                    "item_status_label": "Brouillon",
+                    "item_generic_status": "new",
+                    "event_date": "2025-11-27T10:55:00.000Z",
+                },
+                content_type="application/json",
+                headers={"authorization": f"Basic {credentials}"},
+            )
+            if response.status_code != 201:
+                raise CommandError(f"Event answered {response.status_code}: {response.content!r}")
+            deadline = start + 10
+            while len(server.received_at) == pushes:
+                if time.perf_counter() > deadline:
+                    raise CommandError(f"{name} didn't push the event within 10s")
+                time.sleep(0.001)
+            timings.add(server.received_at[pushes] - start)
@@ -0,0 +1,133 @@
+import asyncio
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from ami.notification.models import Notification
+from ami.notification.push import push, run_push
+from ami.notification.tasks import push_notification
+from ami.tests.fake_push_server import FakePushServer, webpush_subscription
+from ami.user.models import Registration, User
+from ami.utils.benchmark import Timings
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the push of notifications end to end, to a local fake server emulating the "
+        "web push services and FCM: the `push_notification` task one notification at a time, "
+        "then `push()` for concurrent notifications. The push host limits apply as set, and "
+        "the retries aren't run. The benchmark data is deleted at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--notifications", type=int, default=100, help="Pushes per path")
+        parser.add_argument("--webpush", type=int, default=5, help="Web push devices")
+        parser.add_argument("--mobile", type=int, default=5, help="Mobile app devices")
+        parser.add_argument("--concurrency", type=int, default=10, help="Concurrent pushes")
+        parser.add_argument("--latency", type=float, default=0.02, help="Answer latency (s)")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 503s")
+        parser.add_argument("--gone-rate", type=float, default=0.0, help="Share of gone devices")
+
+    def handle(
+        self,
+        *args,
+        notifications: int,
+        webpush: int,
+        mobile: int,
+        concurrency: int,
+        latency: float,
+        error_rate: float,
+        gone_rate: float,
+        **kwargs,
+    ):
+        server = FakePushServer(latency=latency, error_rate=error_rate, gone_rate=gone_rate, seed=0)
+        server.start()
+        user = User.objects.create(fc_hash=f"benchmark-{uuid.uuid4().hex}")
+        registrations = [
+            Registration(user=user, subscription=webpush_subscription(server.endpoint(f"{i}")))
+            for i in range(webpush)
+        ] + [
+            Registration(
+                user=user,
+                subscription={
+                    "app_version": "1.0",
+                    "device_id": f"device-{i}",
+                    "fcm_token": f"token-{i}",
+                    "model": "benchmark",
+                    "platform": "android",
+                },
+            )
+            for i in range(mobile)
+        ]
+        for registration in registrations:
+            registration.extract_subscription_fields()
+        Registration.objects.bulk_create(registrations)
+        stored = Notification.objects.bulk_create(
+            Notification(
+                user=user,
+                content_title="Brouillon de nouvelle demande de démarche d'OTV",
+                content_body="Merci d'avoir initié votre demande",
+            )
+            for _ in range(2 * notifications)
+        )
+        # Retries are enqueued, but not run
+        tasks = {
+            "default": {
+                "BACKEND": "django.tasks.backends.dummy.DummyBackend",
+                "QUEUES": settings.TASK_QUEUES,
+            }
+        }
+        try:
+            with override_settings(TASKS=tasks, FCM_URL=server.fcm_url):
+                timings = Timings("push_notification task")
+                statuses = self.reset(server, user)
+                for notification in stored[:notifications]:
+                    with timings.measure():
+                        push_notification.call(str(notification.id), True)
+                self.write_report(server, timings, statuses, sum(timings.durations))
+
+                timings = Timings(f"push(), {concurrency} concurrent")
+                statuses = self.reset(server, user)
+                start = time.perf_counter()
+                run_push(self.push_concurrently, stored[notifications:], concurrency, timings)
+                self.write_report(server, timings, statuses, time.perf_counter() - start)
+        finally:
+            server.stop()
+            Notification.objects.filter(user=user).delete()
+            Registration.objects.filter(user=user).delete()
+            user.delete()
+
+    async def push_concurrently(
+        self, notifications: list[Notification], concurrency: int, timings: Timings
+    ) -> None:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def push_one(notification: Notification) -> None:
+            async with semaphore:
+                with timings.measure():
+                    await push(notification, True)
+
+        await asyncio.gather(*(push_one(notification) for notification in notifications))
+
+    def reset(self, server: FakePushServer, user: User) -> Counter[int]:
+        """Make the registrations healthy again, returning the statuses answered until now."""
+        Registration.objects.filter(user=user).update(
+            failure_count=0, backoff_until=None, quarantined_at=None
+        )
+        return Counter(server.statuses)
+
+    def write_report(
+        self, server: FakePushServer, timings: Timings, statuses: Counter[int], total: float
+    ) -> None:
+        answered = server.statuses - statuses
+        deliveries = answered.total()
+        answers = ", ".join(f"{status}: {count}" for status, count in sorted(answered.items()))
+        self.stdout.write(timings.summary(total=total))
+        self.stdout.write(
+            f"{timings.label}: {deliveries} deliveries in {total:.3f}s "
+            f"({deliveries / total if total else 0.0:.1f}/s), answers {answers}"
+        )
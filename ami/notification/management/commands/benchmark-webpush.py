@@ -0,0 +1,91 @@
+import asyncio
+import os
+import time
+
+import webpush
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ami.notification import encryption
+from ami.notification.push import provide_webpush
+from ami.tests.fake_push_server import webpush_subscription
+from ami.user.models import NotificationPush
+from ami.utils.benchmark import Timings
+
+PUSH_SERVICES = [
+    "https://fcm.googleapis.com/fcm/send/",
+    "https://updates.push.services.mozilla.com/wpush/v2/",
+    "https://web.push.apple.com/",
+]
+
+
+def build_subscription(index: int) -> webpush.WebPushSubscription:
+    return webpush.WebPushSubscription.model_validate(
+        webpush_subscription(f"{PUSH_SERVICES[index % len(PUSH_SERVICES)]}{index}")
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the web push message building (encryption and VAPID signature): a new signer "
+        "for each message against the cached process-wide signer, then the encryption pool for "
+        "1, 2, 4... workers up to the cores."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=2000, help="Messages built per path")
+        parser.add_argument(
+            "--max-workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Largest encryption pool measured, the cores by default",
+        )
+
+    def handle(self, *args, messages: int, max_workers: int, **kwargs):
+        subscriptions = [build_subscription(index) for index in range(messages)]
+        message = NotificationPush(
+            title="Brouillon de nouvelle demande de démarche d'OTV",
+            message="Merci d'avoir initié votre demande",
+            content_icon=None,
+            sender="AMI",
+        ).model_dump_json()
+
+        uncached = Timings("new signer")
+        for subscription in subscriptions:
+            with uncached.measure():
+                webpush.WebPush(
+                    public_key=settings.VAPID_PUBLIC_KEY.encode(),
+                    private_key=settings.VAPID_PRIVATE_KEY.encode(),
+                    subscriber="contact.ami@numerique.gouv.fr",
+                ).get(message=message, subscription=subscription)
+
+        cached = Timings("cached signer")
+        for subscription in subscriptions:
+            with cached.measure():
+                provide_webpush().get(message=message, subscription=subscription)
+
+        self.stdout.write(uncached.summary())
+        self.stdout.write(cached.summary())
+
+        pairs = [(message, subscription) for subscription in subscriptions]
+        workers = 1
+        while True:
+            self.stdout.write(self.run_pool(pairs, workers))
+            if workers >= max_workers:
+                break
+            workers = min(workers * 2, max_workers)
+
+    def run_pool(self, pairs: list[tuple[str, webpush.WebPushSubscription]], workers: int) -> str:
+        executor = encryption.create_executor(workers)
+        try:
+            # Start the workers, and their signer, before measuring
+            asyncio.run(encryption.encrypt_many(pairs[:workers], executor))
+            start = time.perf_counter()
+            asyncio.run(encryption.encrypt_many(pairs, executor))
+            total = time.perf_counter() - start
+        finally:
+            executor.shutdown()
+        return (
+            f"process pool, {workers} workers: {len(pairs)} ops in {total:.3f}s "
+            f"({len(pairs) / total:.1f} ops/s)"
+        )
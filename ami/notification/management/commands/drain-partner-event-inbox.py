@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ami.notification.inbox import DRAIN_BATCH_SIZE, drain_inbox, inbox_lag
+
+
+class Command(BaseCommand):
+    help = "Ingest the partner events accepted asynchronously (202) into notifications"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DRAIN_BATCH_SIZE)
+        parser.add_argument(
+            "--loop", action="store_true", help="Keep draining the inbox until interrupted"
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the inbox is empty, in loop mode",
+        )
+
+    def handle(self, *args, batch_size: int, loop: bool, interval: float, **kwargs):
+        while True:
+            count = drain_inbox(batch_size)
+            if count:
+                lag = inbox_lag()
+                print(
+                    f"Ingested {count} inbox events, {lag['pending']} pending, "
+                    f"oldest is {lag['oldest_pending_age_seconds']:.1f}s old"
+                )
+            if not loop:
+                break
+            if count < batch_size:
+                time.sleep(interval)
@@ -0,0 +1,19 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from ami.user.models import Registration
+
+
+class Command(BaseCommand):
+    help = "Delete the registrations quarantined for more than REGISTRATION_QUARANTINE_DAYS days"
+
+    def handle(self, *args, **kwargs):
+        registrations = Registration.objects.filter(
+            quarantined_at__lt=now()
+            - datetime.timedelta(days=settings.REGISTRATION_QUARANTINE_DAYS)
+        )
+        deleted, _ = registrations.delete()
+        self.stdout.write(f"Deleted {deleted} quarantined registrations")
@@ -1,22 +1,33 @@
+import time
+
 from django.core.management.base import BaseCommand
-from django.utils.timezone import now
 
-from ami.notification.models import ScheduledNotification
+from ami.notification.scheduled import PUBLISH_BATCH_SIZE, publish_due
 
 
 class Command(BaseCommand):
-    help = "Create scheduled notifications to be automatically send"
+    help = (
+        "Create the notifications of the due scheduled notifications, and push them, in "
+        "batches, see `ami.notification.scheduled`"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=PUBLISH_BATCH_SIZE,
+            help="Scheduled notifications published per transaction",
+        )
 
-    def handle(self, *args, **kwargs):
-        scheduled_notifications = ScheduledNotification.objects.filter(
-            scheduled_at__lt=now(),
-            sent_at__isnull=True,
-        ).order_by("created_at")
-        scheduled_notifications_count = 0
-        for scheduled_notification in scheduled_notifications:
-            scheduled_notification.publish()
-            scheduled_notifications_count += 1
-        print(
-            f"Pushed {scheduled_notifications_count} scheduled notifications",
-            scheduled_notifications,
+    def handle(self, *args, batch_size: int, **kwargs):
+        start = time.perf_counter()
+        published = 0
+        for index, batch in enumerate(publish_due(batch_size), start=1):
+            published += batch.count
+            self.stdout.write(
+                f"Batch {index}: published {batch.count} scheduled notifications "
+                f"in {batch.duration:.3f}s"
+            )
+        self.stdout.write(
+            f"Published {published} scheduled notifications in {time.perf_counter() - start:.3f}s"
         )
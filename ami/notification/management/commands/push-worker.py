@@ -0,0 +1,62 @@
+import asyncio
+import logging
+import signal
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ami.notification.push import close_push_resources
+from ami.notification.push_worker import PushWorker
+from ami.utils.async_db import close_pool, open_pool
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the push tasks in batches, concurrently on a single event loop, until SIGINT or "
+        "SIGTERM, see `ami.notification.push_worker`"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.PUSH_WORKER_CONCURRENCY,
+            help="Push tasks run at once",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.TASK_WORKER_POLL_INTERVAL,
+            help="Seconds between two polls for push tasks, when not woken up by new ones",
+        )
+        parser.add_argument(
+            "--batch", action="store_true", help="Run the push tasks ready, then exit"
+        )
+        parser.add_argument("--worker-id", default=uuid.uuid4().hex)
+
+    def handle(
+        self, *args, concurrency: int, interval: float, batch: bool, worker_id: str, **kwargs
+    ):
+        asyncio.run(
+            self.serve(
+                PushWorker(worker_id=worker_id, concurrency=concurrency, interval=interval), batch
+            )
+        )
+
+    async def serve(self, worker: PushWorker, batch: bool) -> None:
+        loop = asyncio.get_running_loop()
+        for signum in [signal.SIGINT, signal.SIGTERM]:
+            loop.add_signal_handler(signum, worker.stop)
+        try:
+            await open_pool()
+        except Exception:
+            # Not fatal: the queries fall back to the Django ORM
+            logger.exception("Could not open the asyncpg pool")
+        try:
+            await worker.run(batch=batch)
+        finally:
+            await close_pool()
+            await close_push_resources()
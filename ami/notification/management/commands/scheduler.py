@@ -0,0 +1,26 @@
+import signal
+import sys
+
+from django.core.management.base import BaseCommand
+
+from ami.notification.scheduler import Scheduler
+
+
+class Command(BaseCommand):
+    help = (
+        "Publish the scheduled notifications as soon as they're due, until SIGINT or SIGTERM, "
+        "see `ami.notification.scheduler`"
+    )
+
+    def handle(self, *args, **kwargs):
+        scheduler = Scheduler()
+
+        def stop(signum, frame) -> None:
+            scheduler.running = False
+            # Not while publishing: the pushes are enqueued once the publication is committed
+            if scheduler.waiting:
+                sys.exit(0)
+
+        for signum in [signal.SIGINT, signal.SIGTERM]:
+            signal.signal(signum, stop)
+        scheduler.run()
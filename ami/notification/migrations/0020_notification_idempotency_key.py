@@ -0,0 +1,107 @@
+import datetime
+import hashlib
+import json
+
+from django.db import migrations, models, transaction
+
+CHUNK_SIZE = 2000
+
+# Frozen copy of `ami.notification.utils` at the time of this migration: the keys backfilled
+# must not change with later versions of the module.
+EVENT_FIELDS = [
+    "content_title",
+    "content_body",
+    "content_private_body",
+    "content_subheading",
+    "content_icon",
+    "content_link",
+    "item_type",
+    "item_id",
+    "item_parent_partner_id",
+    "item_parent_type",
+    "item_parent_id",
+    "item_status_label",
+    "item_generic_status",
+    "item_canal",
+    "item_milestone_start_date",
+    "item_milestone_end_date",
+    "event_date",
+    "valid_until",
+    "try_push",
+]
+
+
+def _canonical_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.astimezone(datetime.timezone.utc).isoformat()
+    return value
+
+
+def build_event_idempotency_key(user_id, partner_id, data):
+    canonical = {
+        "user_id": str(user_id),
+        "partner_id": partner_id,
+        **{field: _canonical_value(data.get(field)) for field in EVENT_FIELDS},
+    }
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Rows that were duplicated before the unique constraint existed keep an empty key.
+sql_deduplicate = """
+UPDATE notification SET idempotency_key = NULL
+WHERE id IN (
+    SELECT id FROM (
+        SELECT id, row_number() OVER (
+            PARTITION BY idempotency_key ORDER BY created_at, id
+        ) AS position
+        FROM notification
+        WHERE idempotency_key IS NOT NULL
+    ) AS ranked
+    WHERE position > 1
+);
+"""
+
+
+def backfill_idempotency_key(apps, schema_editor):
+    Notification = apps.get_model("notification", "Notification")
+    queryset = Notification.objects.filter(idempotency_key__isnull=True).order_by("pk")
+    last_pk = None
+    while True:
+        chunk_queryset = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        chunk = list(chunk_queryset.only("pk", "user_id", "partner_id", *EVENT_FIELDS)[:CHUNK_SIZE])
+        if not chunk:
+            break
+        for notification in chunk:
+            notification.idempotency_key = build_event_idempotency_key(
+                notification.user_id,
+                notification.partner_id,
+                {field: getattr(notification, field) for field in EVENT_FIELDS},
+            )
+        # Commit each chunk on its own, so that an interrupted backfill can be resumed.
+        with transaction.atomic():
+            Notification.objects.bulk_update(chunk, ["idempotency_key"])
+        last_pk = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("notification", "0019_apiv2_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="idempotency_key",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_idempotency_key, reverse_code=migrations.RunPython.noop),
+        migrations.RunSQL(sql=sql_deduplicate, reverse_sql=migrations.RunSQL.noop),
+        migrations.AlterField(
+            model_name="notification",
+            name="idempotency_key",
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,52 @@
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notification", "0020_notification_idempotency_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InboxEvent",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4, editable=False, primary_key=True, serialize=False
+                    ),
+                ),
+                ("partner_id", models.CharField()),
+                ("payload", models.JSONField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("created", "Created"),
+                            ("duplicate", "Duplicate"),
+                            ("error", "Error"),
+                        ],
+                        default="pending",
+                    ),
+                ),
+                ("notification_id", models.UUIDField(blank=True, null=True)),
+                ("notification_send_status", models.BooleanField(blank=True, null=True)),
+                ("errors", models.JSONField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "db_table": "partner_event_inbox",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "pending")),
+                        fields=["created_at"],
+                        name="inbox_event_pending_idx",
+                    )
+                ],
+            },
+        ),
+    ]
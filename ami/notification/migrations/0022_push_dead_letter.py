@@ -0,0 +1,43 @@
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notification", "0021_partner_event_inbox"),
+        ("user", "0004_registration_health"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PushDeadLetter",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4, editable=False, primary_key=True, serialize=False
+                    ),
+                ),
+                ("attempts", models.PositiveIntegerField()),
+                ("last_error", models.TextField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "notification",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="notification.notification"
+                    ),
+                ),
+                (
+                    "registration",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="user.registration"
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "push_dead_letter",
+            },
+        ),
+    ]
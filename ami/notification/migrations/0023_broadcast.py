@@ -0,0 +1,67 @@
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notification", "0022_push_dead_letter"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Broadcast",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4, editable=False, primary_key=True, serialize=False
+                    ),
+                ),
+                (
+                    "segment",
+                    models.CharField(
+                        choices=[
+                            ("registered", "Utilisateurs ayant un appareil enregistré"),
+                            (
+                                "consent",
+                                "Utilisateurs ayant donné leur consentement à un partenaire",
+                            ),
+                            ("fc_hashes", "Liste d'identifiants FC-Hash"),
+                        ]
+                    ),
+                ),
+                ("consent_partner_id", models.CharField(blank=True, null=True)),
+                ("fc_hashes", models.JSONField(blank=True, default=list)),
+                ("partner_id", models.CharField()),
+                ("content_title", models.CharField()),
+                ("content_body", models.CharField()),
+                ("content_icon", models.CharField(blank=True, null=True)),
+                ("content_link", models.CharField(blank=True, null=True)),
+                ("valid_until", models.DateTimeField(blank=True, null=True)),
+                ("try_push", models.BooleanField(default=False)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "En attente"),
+                            ("running", "En cours"),
+                            ("done", "Terminée"),
+                        ],
+                        default="pending",
+                    ),
+                ),
+                ("total_count", models.PositiveIntegerField(blank=True, null=True)),
+                ("recipients_count", models.PositiveIntegerField(default=0)),
+                ("created_count", models.PositiveIntegerField(default=0)),
+                ("pushed_count", models.PositiveIntegerField(default=0)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "broadcast",
+            },
+        ),
+    ]
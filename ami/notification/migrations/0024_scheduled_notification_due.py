@@ -0,0 +1,46 @@
+from django.db import migrations, models
+
+# Notify the scheduler of the upcoming scheduled notifications, see `ami.notification.scheduler`.
+# The notifications are only delivered on commit.
+sql_notify_scheduled_notification = """
+CREATE FUNCTION notify_scheduled_notification() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify(
+        'ami_scheduled_notifications', extract(epoch FROM NEW.scheduled_at)::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER notify_scheduled_notification
+AFTER INSERT OR UPDATE OF scheduled_at ON scheduled_notification
+FOR EACH ROW WHEN (NEW.sent_at IS NULL)
+EXECUTE FUNCTION notify_scheduled_notification();
+"""
+
+reverse_sql_notify_scheduled_notification = """
+DROP TRIGGER notify_scheduled_notification ON scheduled_notification;
+DROP FUNCTION notify_scheduled_notification();
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notification", "0023_broadcast"),
+        ("user", "0006_registration_upsert_keys"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="schedulednotification",
+            index=models.Index(
+                condition=models.Q(("sent_at__isnull", True)),
+                fields=["scheduled_at"],
+                name="scheduled_notification_due_idx",
+            ),
+        ),
+        migrations.RunSQL(
+            sql=sql_notify_scheduled_notification,
+            reverse_sql=reverse_sql_notify_scheduled_notification,
+        ),
+    ]
@@ -1,12 +1,11 @@
 import uuid
 from enum import Enum
 
-from asgiref.sync import async_to_sync
 from django.db import models
 from django.utils import timezone
 
 from ami.partner.models import partners
-from ami.user.models import User
+from ami.user.models import Registration, User
 
 
 class NotificationEvent(str, Enum):  # Subclassing `str` makes it automagically serializable in json
@@ -50,6 +49,8 @@ class Notification(models.Model):
     event_date = models.DateTimeField(default=timezone.now)
     valid_until = models.DateTimeField(blank=True, null=True)
     try_push = models.BooleanField(blank=True, null=True)
+    # digest of the partner event, see `build_event_idempotency_key`
+    idempotency_key = models.CharField(max_length=64, unique=True, blank=True, null=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -57,6 +58,31 @@ class Notification(models.Model):
     class Meta:
         db_table = "notification"
 
+    @staticmethod
+    def bulk_create_once(notifications: list["Notification"]) -> dict[str, uuid.UUID]:
+        """Insert the notifications, skipping those whose idempotency key is already stored.
+
+        Returns the id of the stored notification for each idempotency key: a notification was
+        created if and only if its own id is returned.
+        """
+        Notification.objects.bulk_create(notifications, ignore_conflicts=True)
+        return dict(
+            Notification.objects.filter(
+                idempotency_key__in=[notification.idempotency_key for notification in notifications]
+            ).values_list("idempotency_key", "id")
+        )
+
+    @staticmethod
+    async def abulk_create_once(notifications: list["Notification"]) -> dict[str, uuid.UUID]:
+        """Async version of `bulk_create_once`."""
+        await Notification.objects.abulk_create(notifications, ignore_conflicts=True)
+        return {
+            idempotency_key: notification_id
+            async for idempotency_key, notification_id in Notification.objects.filter(
+                idempotency_key__in=[notification.idempotency_key for notification in notifications]
+            ).values_list("idempotency_key", "id")
+        }
+
     @property
     def url(self):
         if self.has_item():
@@ -104,6 +130,101 @@ class Notification(models.Model):
         return body
 
 
+class InboxEvent(models.Model):
+    """Partner event accepted asynchronously, waiting to be ingested as a `Notification`."""
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        CREATED = "created"
+        DUPLICATE = "duplicate"
+        ERROR = "error"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    partner_id = models.CharField()
+    payload = models.JSONField()
+
+    status = models.CharField(choices=Status, default=Status.PENDING)
+    notification_id = models.UUIDField(blank=True, null=True)
+    notification_send_status = models.BooleanField(blank=True, null=True)
+    errors = models.JSONField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = "partner_event_inbox"
+        indexes = [
+            models.Index(
+                fields=["created_at"],
+                name="inbox_event_pending_idx",
+                condition=models.Q(status="pending"),
+            ),
+        ]
+
+
+class PushDeadLetter(models.Model):
+    """Delivery of a notification to a registration, given up after `PUSH_MAX_ATTEMPTS`."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    notification_id: uuid.UUID  # For typing purposes: this is only a type annotation
+    notification = models.ForeignKey(Notification, models.CASCADE)
+    registration_id: uuid.UUID  # For typing purposes: this is only a type annotation
+    registration = models.ForeignKey(Registration, models.CASCADE)
+    attempts = models.PositiveIntegerField()
+    last_error = models.TextField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "push_dead_letter"
+
+
+class Broadcast(models.Model):
+    """Notification sent to all the users of a segment, see `ami.notification.broadcast`."""
+
+    class Segment(models.TextChoices):
+        REGISTERED = "registered", "Utilisateurs ayant un appareil enregistré"
+        CONSENT = "consent", "Utilisateurs ayant donné leur consentement à un partenaire"
+        FC_HASHES = "fc_hashes", "Liste d'identifiants FC-Hash"
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "En attente"
+        RUNNING = "running", "En cours"
+        DONE = "done", "Terminée"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    segment = models.CharField(choices=Segment)
+    consent_partner_id = models.CharField(blank=True, null=True)
+    fc_hashes = models.JSONField(blank=True, default=list)
+
+    partner_id = models.CharField()
+    content_title = models.CharField()
+    content_body = models.CharField()
+    content_icon = models.CharField(blank=True, null=True)
+    content_link = models.CharField(blank=True, null=True)
+    valid_until = models.DateTimeField(blank=True, null=True)
+    try_push = models.BooleanField(default=False)
+
+    # Progress: recipients of the segment, recipients done, notifications created for them,
+    # and notifications pushed
+    status = models.CharField(choices=Status, default=Status.PENDING)
+    total_count = models.PositiveIntegerField(blank=True, null=True)
+    recipients_count = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    pushed_count = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "broadcast"
+
+
 class ScheduledNotification(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
 
@@ -135,15 +256,6 @@ class ScheduledNotification(models.Model):
             send_status=self.user.last_logged_in is not None,
         )
 
-    def publish(self):
-        from ami.notification.push import push
-
-        notification = self.build_notification()
-        notification.save()
-        self.sent_at = notification.created_at
-        self.save()
-        async_to_sync(push)(notification, True)
-
     @classmethod
     async def acreate_welcome_scheduled_notification(cls, user: User):
         scheduled_notification, _ = await cls.objects.aget_or_create(
@@ -161,3 +273,11 @@ class ScheduledNotification(models.Model):
     class Meta:
         db_table = "scheduled_notification"
         unique_together = (("user", "reference"),)
+        indexes = [
+            # Upcoming scheduled notifications, see `ami.notification.scheduler`
+            models.Index(
+                fields=["scheduled_at"],
+                name="scheduled_notification_due_idx",
+                condition=models.Q(sent_at__isnull=True),
+            ),
+        ]
@@ -1,105 +1,400 @@
+import asyncio
+import logging
+import uuid
+from collections.abc import Awaitable, Callable
 from typing import cast
+from urllib.parse import urlsplit
 
+import firebase_admin
+import google.auth.credentials
 import webpush
+from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from django.conf import settings
 from django.utils.timezone import now
-from firebase_admin import messaging
+from firebase_admin import credentials, exceptions, messaging
 from firebase_admin.messaging import UnregisteredError
 
+from ami.notification import encryption, health, hosts, retries
 from ami.notification.models import Notification, NotificationEvent
-from ami.user.models import NotificationPush, Registration, WebPushSubscription
+from ami.user.models import (
+    MobileAppSubscription,
+    NotificationPush,
+    Registration,
+    WebPushSubscription,
+)
 from ami.utils import sentry
-from ami.utils.httpx import httpxClient
+from ami.utils.async_db import list_users_registrations
+from ami.utils.httpx import (
+    TransportError,
+    close_httpx_shared_async_client,
+    httpxSharedAsyncClient,
+    retry_after_seconds,
+)
+
+logger = logging.getLogger(__name__)
+
+# An FCM message to send, with the notification and registration it delivers
+FCMDelivery = tuple[Notification, Registration, messaging.Message]
+
+# Maximum number of messages of a `send_each` call
+FCM_BATCH_SIZE = 500
+FCM_HOST = "fcm.googleapis.com"
+# FCM errors for which the message may be sent again later
+TRANSIENT_FCM_ERRORS = (
+    exceptions.DeadlineExceededError,
+    exceptions.InternalError,
+    exceptions.ResourceExhaustedError,
+    exceptions.UnavailableError,
+)
 
 
 def provide_webpush() -> webpush.WebPush:
-    webpush_ = webpush.WebPush(
-        public_key=settings.VAPID_PUBLIC_KEY.encode(),
-        private_key=settings.VAPID_PRIVATE_KEY.encode(),
-        subscriber="contact.ami@numerique.gouv.fr",
-    )
-    return webpush_
+    """Return the process-wide web push signer, for the current VAPID keys."""
+    return encryption.get_signer(settings.VAPID_PRIVATE_KEY, settings.VAPID_PUBLIC_KEY)
+
+
+class _AnonymousCredential(credentials.Base):
+    def get_credential(self) -> google.auth.credentials.Credentials:
+        return google.auth.credentials.AnonymousCredentials()
+
+
+def get_fcm_app() -> firebase_admin.App | None:
+    """Return the Firebase app to send FCM messages with.
+
+    That's the default app, unless `FCM_URL` is set to the send URL of a local fake FCM server:
+    no Google credentials are needed then.
+    """
+    if not settings.FCM_URL:
+        return None
+    name = f"fake-fcm:{settings.FCM_URL}"
+    try:
+        return firebase_admin.get_app(name)
+    except ValueError:
+        app = firebase_admin.initialize_app(
+            _AnonymousCredential(),
+            {"projectId": "ami", "httpTimeout": settings.PUSH_HOST_TIMEOUT},
+            name=name,
+        )
+        # The Firebase admin SDK has no setting for the FCM URL
+        messaging._get_messaging_service(app)._fcm_url = settings.FCM_URL
+        return app
+
+
+async def close_push_resources() -> None:
+    """Close the HTTP client of the event loop and the encryption pool, before exiting."""
+    await close_httpx_shared_async_client()
+    encryption.shutdown_executor()
 
 
 async def push(notification: Notification, try_push: bool) -> None:
-    import logging
-
-    logger = logging.getLogger(__name__)
-
-    if notification.valid_until is not None and notification.valid_until < now():
-        return
-
-    channel_layer = get_channel_layer()
-    assert channel_layer is not None
-    await channel_layer.group_send(
-        f"user_{notification.user_id}",
-        {
-            "type": "notification.event",  # maps to notification_event() on the consumer
-            "user_id": str(notification.user_id),
-            "id": str(notification.id),
-            "event": NotificationEvent.CREATED,
-        },
+    await push_many([(notification, try_push)])
+
+
+async def push_many(
+    notifications: list[tuple[Notification, bool]],
+    registrations: dict[uuid.UUID, list[Registration]] | None = None,
+) -> None:
+    """Push notifications, given as `(notification, try_push)` pairs, to the users' devices.
+
+    The registrations of the users are loaded, unless given, see `list_users_registrations`.
+    The deliveries to the registrations backed off are deferred until the end of their backoff.
+    Web push requests are all sent concurrently, and FCM messages are grouped in `send_each`
+    batches. The deliveries failing transiently are retried later on their own, see
+    `ami.notification.retries`. An unexpected error on a device doesn't stop the delivery to
+    the other ones, but is still raised once they're all done.
+    """
+    webpush_deliveries: list[tuple[Notification, Registration, NotificationPush]] = []
+    fcm_deliveries: list[FCMDelivery] = []
+    deferred: list[Awaitable[None]] = []
+    to_push: list[Notification] = []
+    for notification, try_push in notifications:
+        if notification.valid_until is not None and notification.valid_until < now():
+            continue
+
+        channel_layer = get_channel_layer()
+        assert channel_layer is not None
+        await channel_layer.group_send(
+            f"user_{notification.user_id}",
+            {
+                "type": "notification.event",  # maps to notification_event() on the consumer
+                "user_id": str(notification.user_id),
+                "id": str(notification.id),
+                "event": NotificationEvent.CREATED,
+            },
+        )
+
+        if try_push:
+            to_push.append(notification)
+
+    if registrations is None:
+        registrations = await list_users_registrations(
+            {notification.user_id for notification in to_push}
+        )
+    current = now()
+    for notification in to_push:
+        notification_data = build_notification_push(notification)
+        for registration in registrations.get(notification.user_id, []):
+            if registration.backoff_until is not None and registration.backoff_until > current:
+                deferred.append(
+                    retries.schedule_retry(
+                        notification,
+                        registration,
+                        0,
+                        f"Backed off until {registration.backoff_until}",
+                        run_after=registration.backoff_until,
+                    )
+                )
+            elif isinstance(registration.typed_subscription, WebPushSubscription):
+                webpush_deliveries.append((notification, registration, notification_data))
+            else:
+                fcm_deliveries.append(
+                    (notification, registration, build_fcm_message(registration, notification_data))
+                )
+
+    # Many web push messages are encrypted in the process pool, instead of the event loop thread
+    webpush_messages: list[webpush.WebPushMessage | None] = [None] * len(webpush_deliveries)
+    threshold = settings.PUSH_ENCRYPTION_POOL_THRESHOLD
+    if threshold and len(webpush_deliveries) >= threshold:
+        try:
+            webpush_messages = list(
+                await encryption.encrypt_many(
+                    [
+                        (
+                            notification_data.model_dump_json(),
+                            cast(WebPushSubscription, registration.typed_subscription),
+                        )
+                        for _, registration, notification_data in webpush_deliveries
+                    ]
+                )
+            )
+        except Exception:
+            # Each delivery builds its own message then
+            logger.exception("Failed to encrypt web push messages in the process pool")
+    fcm_batches = [
+        fcm_deliveries[index : index + FCM_BATCH_SIZE]
+        for index in range(0, len(fcm_deliveries), FCM_BATCH_SIZE)
+    ]
+    results = await asyncio.gather(
+        *(
+            deliver_webpush(notification, registration, notification_data, message=message)
+            for (notification, registration, notification_data), message in zip(
+                webpush_deliveries, webpush_messages
+            )
+        ),
+        *(send_fcm_batch(batch) for batch in fcm_batches),
+        *deferred,
+        return_exceptions=True,
     )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+
+async def retry_delivery(
+    notification: Notification, registration: Registration, attempt: int
+) -> None:
+    """Attempt again to deliver a notification to a single registration."""
+    notification_data = build_notification_push(notification)
+    if isinstance(registration.typed_subscription, WebPushSubscription):
+        await deliver_webpush(notification, registration, notification_data, attempt)
+    else:
+        message = build_fcm_message(registration, notification_data)
+        await send_fcm_batch([(notification, registration, message)], attempt)
 
-    if not try_push:
-        return
 
-    notification_data = NotificationPush(
+def build_notification_push(notification: Notification) -> NotificationPush:
+    return NotificationPush(
         title=notification.content_title,
         message=notification.content_body,
         content_icon=notification.content_icon,
         sender="AMI",
     )
-    registrations = [r async for r in Registration.objects.filter(user_id=notification.user_id)]
-    for registration in registrations:
-        if isinstance(registration.typed_subscription, WebPushSubscription):
-            subscription = registration.typed_subscription
-            message = provide_webpush().get(
-                message=notification_data.model_dump_json(), subscription=subscription
-            )
-            headers = cast(dict[str, str], message.headers)
 
-            # fail silently
-            with httpxClient() as httpx_client:
-                response = httpx_client.post(
-                    str(subscription.endpoint), content=message.encrypted, headers=headers
+
+async def transient_failure(
+    notification: Notification,
+    registration: Registration,
+    attempt: int,
+    error: str,
+    retry_after: float | None = None,
+) -> None:
+    await health.record_transient_failure(registration, retry_after)
+    await retries.schedule_retry(notification, registration, attempt, error, retry_after)
+
+
+async def deliver_webpush(
+    notification: Notification,
+    registration: Registration,
+    notification_data: NotificationPush,
+    attempt: int = 1,
+    message: webpush.WebPushMessage | None = None,
+) -> None:
+    """Send a web push message, built here unless it's already `message`."""
+    subscription = cast(WebPushSubscription, registration.typed_subscription)
+    host = hosts.get_host(str(subscription.endpoint.host))
+    if message is None:
+        message = provide_webpush().get(
+            message=notification_data.model_dump_json(), subscription=subscription
+        )
+    headers = cast(dict[str, str], message.headers)
+
+    with host.circuit.probe() as allowed:
+        if not allowed:
+            await retries.schedule_retry(
+                notification,
+                registration,
+                attempt,
+                f"Circuit open for {host.name}",
+                host.circuit.retry_after(),
+            )
+            return
+        try:
+            async with host.slot():
+                response = await httpxSharedAsyncClient().post(
+                    str(subscription.endpoint),
+                    content=message.encrypted,
+                    headers=headers,
+                    timeout=settings.PUSH_HOST_TIMEOUT,
                 )
-            if response.status_code < 500:
-                # For example we could have "410: gone" if the registration has been revoked.
-                # TODO: delete this registration from the database
-                logger.warning("Subscription is 'gone', obsolete, and should be removed")
-            else:
-                try:
-                    response.raise_for_status()
-                except Exception as e:
-                    logger.exception(f"Failed to send notification: {e}")
+        except TransportError as e:
+            host.circuit.record_failure()
+            logger.exception(f"Failed to send notification: {e}")
+            await transient_failure(notification, registration, attempt, repr(e))
+            return
+        except Exception:
+            host.circuit.record_failure()
+            raise
+        # fail silently
+        if response.is_success:
+            host.circuit.record_success()
+            await health.record_success(registration)
+        elif response.status_code in (404, 410):
+            host.circuit.record_success()
+            # For example we could have "410: gone" if the registration has been revoked.
+            logger.warning("Subscription is 'gone', obsolete, and is quarantined")
+            await health.record_gone(registration)
+        elif response.status_code == 429 or response.status_code >= 500:
+            host.circuit.record_failure()
+            try:
+                response.raise_for_status()
+            except Exception as e:
+                logger.exception(f"Failed to send notification: {e}")
+            await transient_failure(
+                notification,
+                registration,
+                attempt,
+                f"HTTP {response.status_code}",
+                retry_after_seconds(response),
+            )
         else:
-            # We need to make absolutely sure that there are no values that are not strings,
-            # or the Firebase admin SDK will fail.
-            data = {
-                k: str(v)
-                for k, v in notification_data.model_dump(mode="json", exclude_none=True).items()
-            }
-            message = messaging.Message(
-                # Send both a Notification (displayed automatically by the operating system)
-                # even if the app is in the background...
-                notification=messaging.Notification(
-                    title=notification_data.title,
-                    body=notification_data.message,
-                ),
-                # ... and a full data dump, so the app can display more information if needed
-                # once the application is displayed.
-                data={**data, "app_url": settings.PUBLIC_APP_URL},
-                token=registration.typed_subscription.fcm_token,
+            host.circuit.record_success()
+            logger.warning(f"Push service refused the notification: {response.status_code}")
+
+
+def build_fcm_message(
+    registration: Registration, notification_data: NotificationPush
+) -> messaging.Message:
+    # We need to make absolutely sure that there are no values that are not strings,
+    # or the Firebase admin SDK will fail.
+    data = {
+        k: str(v) for k, v in notification_data.model_dump(mode="json", exclude_none=True).items()
+    }
+    return messaging.Message(
+        # Send both a Notification (displayed automatically by the operating system)
+        # even if the app is in the background...
+        notification=messaging.Notification(
+            title=notification_data.title,
+            body=notification_data.message,
+        ),
+        # ... and a full data dump, so the app can display more information if needed
+        # once the application is displayed.
+        data={**data, "app_url": settings.PUBLIC_APP_URL},
+        token=cast(MobileAppSubscription, registration.typed_subscription).fcm_token,
+    )
+
+
+async def send_fcm_batch(deliveries: list[FCMDelivery], attempt: int = 1) -> None:
+    """Send up to `FCM_BATCH_SIZE` messages in a single `send_each` call."""
+    host = hosts.get_host(urlsplit(settings.FCM_URL).netloc if settings.FCM_URL else FCM_HOST)
+    with host.circuit.probe() as allowed:
+        if not allowed:
+            await asyncio.gather(
+                *(
+                    retries.schedule_retry(
+                        notification,
+                        registration,
+                        attempt,
+                        f"Circuit open for {host.name}",
+                        host.circuit.retry_after(),
+                    )
+                    for notification, registration, _ in deliveries
+                )
             )
-            try:
-                response = messaging.send(message)
+            return
+        try:
+            async with host.slot():
+                # The Firebase admin SDK is sync only
+                batch_response = await asyncio.to_thread(
+                    messaging.send_each,
+                    [message for _, _, message in deliveries],
+                    app=get_fcm_app(),
+                )
+        except Exception as e:
+            host.circuit.record_failure()
+            logger.exception(f"Failed to send notifications: {e}")
+            await asyncio.gather(
+                *(
+                    retries.schedule_retry(notification, registration, attempt, repr(e))
+                    for notification, registration, _ in deliveries
+                )
+            )
+            return
+        # The responses are in the order of the messages
+        updates = []
+        transient_failures = 0
+        for (notification, registration, _), response in zip(deliveries, batch_response.responses):
+            if response.success:
                 sentry.add_counter("notification.request.pushed")
-            except UnregisteredError:
+                updates.append(health.record_success(registration))
+            elif isinstance(response.exception, UnregisteredError):
                 logger.warning(
-                    f"FCM token is invalid or expired for device. Token should be removed: {registration.typed_subscription.fcm_token}"
+                    f"FCM token is invalid or expired for device, registration quarantined: {cast(MobileAppSubscription, registration.typed_subscription).fcm_token}"
                 )
-                # TODO: delete this registration from the database
-            except Exception as e:
-                logger.exception(f"Failed to send notification: {e}")
+                updates.append(health.record_gone(registration))
+            else:
+                logger.error(
+                    f"Failed to send notification: {response.exception}",
+                    exc_info=response.exception,
+                )
+                if isinstance(response.exception, TRANSIENT_FCM_ERRORS):
+                    transient_failures += 1
+                    updates.append(
+                        transient_failure(
+                            notification, registration, attempt, repr(response.exception)
+                        )
+                    )
+        # FCM is failing if none of the messages got through
+        if transient_failures and batch_response.success_count == 0:
+            host.circuit.record_failure()
+        else:
+            host.circuit.record_success()
+        await asyncio.gather(*updates)
+
+
+def run_push(push_function: Callable[..., Awaitable[None]], *args) -> None:
+    """Run a push coroutine function from sync code."""
+
+    async def run() -> None:
+        try:
+            await push_function(*args)
+        finally:
+            # `async_to_sync` closes its event loop once done
+            await close_httpx_shared_async_client()
+
+    async_to_sync(run)()
+
+
+def push_sync(notifications: list[tuple[Notification, bool]]) -> None:
+    """Push notifications, given as `(notification, try_push)` pairs, from sync code."""
+    run_push(push_many, notifications)
@@ -0,0 +1,230 @@
+"""Worker running the push tasks in batches, on a single long-lived event loop.
+
+`db_worker` runs one task at a time, and each push task loads its notifications then starts an
+event loop of its own. The push worker instead claims the ready push tasks in batches, loads the
+notifications and registrations of a batch in one query each, and pushes them concurrently on
+its event loop, up to `PUSH_WORKER_CONCURRENCY` tasks at once, shared between the priority lanes
+(see `ami.notification.lanes`). Both workers can run side by side: the push worker leaves the
+other tasks to `db_worker`, and they claim tasks with `SKIP LOCKED`. When idle, the push worker
+is woken up by the new tasks, see `ami.utils.task_wakeup`.
+
+Once stopped, the push worker doesn't claim tasks anymore, and waits up to
+`PUSH_WORKER_SHUTDOWN_TIMEOUT` seconds for its running tasks. The unfinished ones are then put
+back in the queue, for another worker: their notifications may be pushed twice.
+"""
+
+import asyncio
+import inspect
+import logging
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.tasks import (  # type: ignore[import-untyped]
+    DEFAULT_TASK_BACKEND_ALIAS,
+    TaskResultStatus,
+)
+from django.utils.timezone import now
+from django_tasks_db.models import DBTaskResult, DBTaskResultQuerySet
+
+from ami.notification.lanes import Lane, LaneScheduler, lane_queues
+from ami.notification.models import Notification
+from ami.notification.tasks import push_batch, push_notification, push_notifications
+from ami.user.models import Registration
+from ami.utils.async_db import list_users_registrations
+from ami.utils.task_wakeup import AsyncTaskListener, wait_timeout
+from ami.utils.tasks import db_task_results
+
+logger = logging.getLogger(__name__)
+
+PUSH_TASKS = {task.module_path: task for task in [push_notification, push_notifications]}
+
+
+def task_pushes(db_task: DBTaskResult) -> tuple[list[tuple[str, bool]], str | None]:
+    """The `(notification_id, try_push)` pairs pushed by a push task, and its broadcast id."""
+    task = PUSH_TASKS[db_task.task_path]
+    arguments = (
+        inspect.signature(task.func)
+        .bind(*db_task.args_kwargs["args"], **db_task.args_kwargs["kwargs"])
+        .arguments
+    )
+    if task is push_notification:
+        return [(arguments["notification_id"], arguments["try_push"])], None
+    return [
+        (notification_id, try_push) for notification_id, try_push in arguments["notifications"]
+    ], arguments.get("broadcast_id")
+
+
+class PushWorker:
+    def __init__(
+        self,
+        worker_id: str,
+        backend_name: str = DEFAULT_TASK_BACKEND_ALIAS,
+        concurrency: int | None = None,
+        interval: float | None = None,
+        shutdown_timeout: float | None = None,
+    ) -> None:
+        self.worker_id = worker_id
+        self.backend_name = backend_name
+        self.concurrency = concurrency or settings.PUSH_WORKER_CONCURRENCY
+        self.interval = settings.TASK_WORKER_POLL_INTERVAL if interval is None else interval
+        self.shutdown_timeout = (
+            settings.PUSH_WORKER_SHUTDOWN_TIMEOUT if shutdown_timeout is None else shutdown_timeout
+        )
+        self.lanes = LaneScheduler()
+        self.listener = AsyncTaskListener()
+        self.running: dict[asyncio.Task, DBTaskResult] = {}
+        self._stopping = asyncio.Event()
+        self._task_done = asyncio.Event()
+
+    def stop(self) -> None:
+        """Stop claiming tasks, see the module docstring."""
+        self._stopping.set()
+
+    def tasks(self) -> DBTaskResultQuerySet:
+        return db_task_results().filter(
+            backend_name=self.backend_name, task_path__in=PUSH_TASKS.keys()
+        )
+
+    def claim(self, limit: int) -> list[DBTaskResult]:
+        """Claim up to `limit` ready push tasks, shared between the lanes by weight.
+
+        In each lane, the tasks are claimed by priority then age. The share of the lanes without
+        enough ready tasks goes to the other ones.
+        """
+        shares = self.lanes.shares(limit)
+        lanes = sorted(self.lanes.weights, key=self.lanes.weights.__getitem__, reverse=True)
+        with transaction.atomic():
+            db_tasks: list[DBTaskResult] = []
+            exhausted: set[Lane] = set()
+            for lane in lanes:
+                db_tasks += self._lock(lane, shares[lane], db_tasks, exhausted)
+            for lane in lanes:
+                db_tasks += self._lock(lane, limit - len(db_tasks), db_tasks, exhausted)
+            started_at = now()
+            for db_task in db_tasks:
+                db_task.status = TaskResultStatus.RUNNING
+                db_task.started_at = started_at
+                db_task.worker_ids = [*db_task.worker_ids, self.worker_id]
+            DBTaskResult.objects.bulk_update(db_tasks, ["status", "started_at", "worker_ids"])
+        return db_tasks
+
+    def _lock(
+        self, lane: Lane, count: int, locked: list[DBTaskResult], exhausted: set[Lane]
+    ) -> list[DBTaskResult]:
+        if not count or lane in exhausted:
+            return []
+        db_tasks = list(
+            self.tasks()
+            .ready()
+            .filter(queue_name__in=lane_queues(lane))
+            # Locked by this transaction already, so not skipped
+            .exclude(id__in=[db_task.id for db_task in locked])
+            .select_for_update(skip_locked=True)[:count]
+        )
+        if len(db_tasks) < count:
+            exhausted.add(lane)
+        return db_tasks
+
+    def requeue(self, db_tasks: list[DBTaskResult]) -> None:
+        DBTaskResult.objects.filter(id__in=[db_task.id for db_task in db_tasks]).update(
+            status=TaskResultStatus.READY, started_at=None
+        )
+
+    async def run(self, batch: bool = False) -> None:
+        """Run the push tasks until stopped, or until there are none left in `batch` mode."""
+        logger.info("Starting push worker worker_id=%s", self.worker_id)
+        try:
+            await self._run(batch)
+        finally:
+            await self.listener.close()
+        await self.shutdown()
+
+    async def _run(self, batch: bool) -> None:
+        while not self._stopping.is_set():
+            self._task_done.clear()
+            self.listener.notified.clear()
+            free = self.concurrency - len(self.running)
+            if free:
+                db_tasks = await sync_to_async(self.claim)(free)
+                await self.start(db_tasks)
+                if len(db_tasks) == free:
+                    # There may be more tasks ready, claimed once a running one is done
+                    continue
+                if batch and not self.running:
+                    break
+            await self._wait()
+
+    async def _wait(self) -> None:
+        """Wait until a running task is done, a task is notified, the worker is stopped, or the
+        next poll."""
+        await self.listener.listen()
+        timeout = await sync_to_async(wait_timeout)(self.tasks(), self.interval)
+        waiters = [
+            asyncio.ensure_future(self._task_done.wait()),
+            asyncio.ensure_future(self.listener.notified.wait()),
+            asyncio.ensure_future(self._stopping.wait()),
+        ]
+        await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in waiters:
+            waiter.cancel()
+
+    async def start(self, db_tasks: list[DBTaskResult]) -> None:
+        """Load the notifications and registrations of the tasks, and start pushing them."""
+        if not db_tasks:
+            return
+        pushes = [task_pushes(db_task) for db_task in db_tasks]
+        notification_ids = {notification_id for pairs, _ in pushes for notification_id, _ in pairs}
+        notifications = await sync_to_async(Notification.objects.in_bulk)(notification_ids)
+        registrations = await list_users_registrations(
+            {
+                notifications[uuid.UUID(notification_id)].user_id
+                for pairs, _ in pushes
+                for notification_id, try_push in pairs
+                if try_push and uuid.UUID(notification_id) in notifications
+            }
+        )
+        for db_task, (pairs, broadcast_id) in zip(db_tasks, pushes):
+            batch = [
+                (notifications[uuid.UUID(notification_id)], try_push)
+                for notification_id, try_push in pairs
+                if uuid.UUID(notification_id) in notifications
+            ]
+            running = asyncio.create_task(
+                self.run_task(db_task, batch, broadcast_id, registrations)
+            )
+            self.running[running] = db_task
+            running.add_done_callback(self._done)
+
+    def _done(self, running: asyncio.Task) -> None:
+        self.running.pop(running, None)
+        self._task_done.set()
+
+    async def run_task(
+        self,
+        db_task: DBTaskResult,
+        batch: list[tuple[Notification, bool]],
+        broadcast_id: str | None,
+        registrations: dict[uuid.UUID, list[Registration]],
+    ) -> None:
+        try:
+            await push_batch(batch, broadcast_id, registrations)
+        except Exception as exc:
+            logger.exception("Push task id=%s failed", db_task.id)
+            await sync_to_async(db_task.set_failed)(exc)
+        else:
+            await sync_to_async(db_task.set_successful)(None)
+
+    async def shutdown(self) -> None:
+        if not self.running:
+            return
+        logger.info("Waiting for %s running push tasks", len(self.running))
+        _, pending = await asyncio.wait(list(self.running), timeout=self.shutdown_timeout)
+        unfinished = [self.running[running] for running in pending]
+        for running in pending:
+            running.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if unfinished:
+            logger.warning("Requeuing %s unfinished push tasks", len(unfinished))
+            await sync_to_async(self.requeue)(unfinished)
@@ -0,0 +1,70 @@
+"""Retries of the push deliveries failing transiently.
+
+Each failed delivery of a notification to a registration is retried on its own, through a
+deferred `retry_push_delivery` task: the other devices and the websocket event aren't affected.
+The delay grows exponentially with the attempts, with jitter so that the deliveries failed by
+an outage aren't all retried at once, and is at least the `Retry-After` asked by the push
+service. Retries stop once the notification isn't valid anymore, and the delivery is
+dead-lettered after `PUSH_MAX_ATTEMPTS` attempts.
+"""
+
+import datetime
+import logging
+import random
+
+from django.conf import settings
+from django.utils.timezone import now
+
+from ami.notification.models import Notification, PushDeadLetter
+from ami.user.models import Registration
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE = datetime.timedelta(seconds=30)
+RETRY_MAX = datetime.timedelta(hours=1)
+
+
+def retry_delay(attempt: int, retry_after: float | None = None) -> datetime.timedelta:
+    """Delay before the attempt following the `attempt`-th one."""
+    delay = min(RETRY_BASE * 2 ** (attempt - 1), RETRY_MAX)
+    # "Equal jitter": half of the delay is random
+    delay = delay / 2 + delay / 2 * random.random()
+    if retry_after is not None:
+        delay = max(delay, datetime.timedelta(seconds=retry_after))
+    return delay
+
+
+async def schedule_retry(
+    notification: Notification,
+    registration: Registration,
+    attempt: int,
+    error: str,
+    retry_after: float | None = None,
+    run_after: datetime.datetime | None = None,
+) -> None:
+    """Schedule the next delivery attempt after the failed `attempt`-th one, or dead-letter it.
+
+    The attempt is due after the retry delay, unless `run_after` is given.
+    """
+    from ami.notification.tasks import retry_push_delivery
+
+    if attempt >= settings.PUSH_MAX_ATTEMPTS:
+        logger.warning(
+            f"Giving up pushing notification {notification.id} to registration {registration.id} "
+            f"after {attempt} attempts: {error}"
+        )
+        await PushDeadLetter.objects.acreate(
+            notification=notification,
+            registration=registration,
+            attempts=attempt,
+            last_error=error,
+        )
+        return
+
+    if run_after is None:
+        run_after = now() + retry_delay(attempt, retry_after)
+    if notification.valid_until is not None and run_after > notification.valid_until:
+        return
+    await retry_push_delivery.using(run_after=run_after).aenqueue(
+        str(notification.id), str(registration.id), attempt + 1
+    )
@@ -0,0 +1,77 @@
+"""Publication of the due scheduled notifications, in batches.
+
+The due scheduled notifications are loaded with their users, `PUBLISH_BATCH_SIZE` at a time. The
+notifications of a batch are created with a single insert, the scheduled notifications marked as
+sent with a single update, and the notifications pushed by one `push_notifications` task in the
+scheduled lane once committed.
+
+The rows of a batch are locked until it's committed, and skipped by the other publishers: the
+overlapping runs of the command, or several ones started to split a large backlog, never publish
+a scheduled notification twice.
+"""
+
+import datetime
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from functools import partial
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils.timezone import now
+
+from ami.notification.lanes import Lane, in_lane
+from ami.notification.models import Notification, ScheduledNotification
+from ami.notification.tasks import push_notifications
+
+# Scheduled notifications published per transaction
+PUBLISH_BATCH_SIZE = 500
+
+
+@dataclass
+class PublishedBatch:
+    count: int
+    duration: float  # seconds
+
+
+def due_scheduled_notifications(at: datetime.datetime) -> QuerySet[ScheduledNotification]:
+    return ScheduledNotification.objects.filter(scheduled_at__lt=at, sent_at__isnull=True).order_by(
+        "created_at"
+    )
+
+
+def publish_batch(scheduled_notifications: list[ScheduledNotification]) -> list[Notification]:
+    """Create and push the notifications of scheduled notifications loaded with their users."""
+    notifications = Notification.objects.bulk_create(
+        scheduled_notification.build_notification()
+        for scheduled_notification in scheduled_notifications
+    )
+    for scheduled_notification, notification in zip(scheduled_notifications, notifications):
+        scheduled_notification.sent_at = notification.created_at
+        # Not set by `bulk_update`
+        scheduled_notification.updated_at = notification.created_at
+    ScheduledNotification.objects.bulk_update(scheduled_notifications, ["sent_at", "updated_at"])
+    transaction.on_commit(
+        partial(
+            in_lane(push_notifications, Lane.SCHEDULED).enqueue,
+            [(str(notification.id), True) for notification in notifications],
+        )
+    )
+    return notifications
+
+
+def publish_due(batch_size: int = PUBLISH_BATCH_SIZE) -> Iterator[PublishedBatch]:
+    """Publish the scheduled notifications due by now, one transaction per batch."""
+    at = now()
+    while True:
+        start = time.perf_counter()
+        with transaction.atomic():
+            batch = list(
+                due_scheduled_notifications(at)
+                .select_related("user")
+                .select_for_update(skip_locked=True, of=("self",))[:batch_size]
+            )
+            if not batch:
+                return
+            publish_batch(batch)
+        yield PublishedBatch(len(batch), time.perf_counter() - start)
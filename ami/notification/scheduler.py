@@ -0,0 +1,115 @@
+"""Scheduler publishing the scheduled notifications as soon as they're due.
+
+The `publish-scheduled-notifications` cron only runs every 5 minutes. The scheduler instead keeps
+the upcoming `scheduled_at` of the unsent scheduled notifications in a min-heap, and sleeps until
+the first one is due, to publish the due ones (see `ami.notification.scheduled`).
+
+The heap is loaded incrementally: only the scheduled notifications due within
+`SCHEDULER_HORIZON` seconds, and at most `SCHEDULER_MAX_LOADED` of them, the following ones
+being loaded once these are published. A trigger (see the `0024_scheduled_notification_due`
+migration) notifies `SCHEDULED_NOTIFICATIONS_CHANNEL` of the new and rescheduled ones, to add
+them to the heap. Stale entries, of scheduled notifications since rescheduled or deleted, only
+cause a publication without anything due. The heap is reloaded every `TASK_WORKER_POLL_INTERVAL`
+seconds anyway, in case notifications were missed.
+
+Nothing is lost on restart: the heap is rebuilt from the database, and the scheduled
+notifications are marked as sent by the transaction publishing them. The scheduler can run along
+the cron, or another scheduler, without publishing twice.
+"""
+
+import datetime
+import heapq
+import logging
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.timezone import now
+
+from ami.notification.models import ScheduledNotification
+from ami.notification.scheduled import publish_due
+from ami.utils.task_wakeup import Listener
+
+logger = logging.getLogger(__name__)
+
+# Keep in sync with the `notify_scheduled_notification` trigger
+SCHEDULED_NOTIFICATIONS_CHANNEL = "ami_scheduled_notifications"
+
+
+class Scheduler:
+    def __init__(
+        self,
+        horizon: float | None = None,
+        max_loaded: int | None = None,
+        poll_interval: float | None = None,
+    ) -> None:
+        self.horizon = datetime.timedelta(
+            seconds=settings.SCHEDULER_HORIZON if horizon is None else horizon
+        )
+        self.max_loaded = max_loaded or settings.SCHEDULER_MAX_LOADED
+        self.poll_interval = (
+            settings.TASK_WORKER_POLL_INTERVAL if poll_interval is None else poll_interval
+        )
+        self.running = True
+        self.waiting = False
+        # `scheduled_at` of the scheduled notifications loaded
+        self.heap: list[datetime.datetime] = []
+        # All the scheduled notifications due until then are loaded
+        self.loaded_until = now()
+        self.reload_at = now()
+
+    def load(self) -> None:
+        """Load the upcoming scheduled notifications, see the module docstring."""
+        start = now()
+        until = start + self.horizon
+        self.heap = list(
+            ScheduledNotification.objects.filter(sent_at__isnull=True, scheduled_at__lt=until)
+            .order_by("scheduled_at")
+            .values_list("scheduled_at", flat=True)[: self.max_loaded]
+        )
+        # Sorted, so already a heap
+        self.loaded_until = self.heap[-1] if len(self.heap) == self.max_loaded else until
+        self.reload_at = min(
+            self.loaded_until, start + datetime.timedelta(seconds=self.poll_interval)
+        )
+
+    def add(self, scheduled_at: datetime.datetime) -> None:
+        """Add a new or rescheduled scheduled notification, unless not loaded yet."""
+        if scheduled_at < self.loaded_until:
+            heapq.heappush(self.heap, scheduled_at)
+
+    def publish(self) -> int:
+        """Publish the due scheduled notifications, if any, returning how many were published."""
+        current = now()
+        if not self.heap or self.heap[0] > current:
+            return 0
+        while self.heap and self.heap[0] <= current:
+            heapq.heappop(self.heap)
+        published = sum(batch.count for batch in publish_due())
+        if published:
+            logger.info("Published %s scheduled notifications", published)
+        return published
+
+    def timeout(self) -> float:
+        """Seconds until the next scheduled notification is due, or the next reload."""
+        until = min(self.heap[0], self.reload_at) if self.heap else self.reload_at
+        return max(0.0, (until - now()).total_seconds())
+
+    def run(self) -> None:
+        logger.info("Starting scheduler")
+        with Listener(SCHEDULED_NOTIFICATIONS_CHANNEL) as listener:
+            # Listen before loading, not to miss the scheduled notifications created meanwhile
+            listener.listen()
+            self.load()
+            while self.running:
+                close_old_connections()
+                self.publish()
+                if now() >= self.reload_at:
+                    self.load()
+                    continue
+                self.waiting = True
+                try:
+                    payloads = listener.wait(self.timeout())
+                finally:
+                    self.waiting = False
+                for payload in payloads:
+                    self.add(datetime.datetime.fromtimestamp(float(payload), tz=datetime.UTC))
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from ami.notification.models import Notification
+from ami.notification.models import InboxEvent, Notification
 
 
 class NotificationReadSerializer(serializers.Serializer):
@@ -12,6 +12,47 @@ class NotificationResponseSerializer(serializers.Serializer):
     notification_send_status = serializers.BooleanField()
 
 
+class PartnerEventBatchItemResponseSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(
+        choices=["created", "duplicate", "error"],
+        help_text="Résultat du traitement de l'événement",
+    )
+    notification_id = serializers.UUIDField(required=False)
+    notification_send_status = serializers.BooleanField(required=False)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Not declared as an attribute, which would override `Serializer.errors`
+        fields["errors"] = serializers.DictField(
+            child=serializers.ListField(child=serializers.CharField()),
+            required=False,
+            help_text="Erreurs de validation de l'événement, par champ",
+        )
+        return fields
+
+
+class PartnerEventAcceptedResponseSerializer(serializers.Serializer):
+    event_id = serializers.UUIDField(
+        help_text="Identifiant de l'événement, pour en consulter le statut de traitement"
+    )
+
+
+class PartnerEventStatusSerializer(serializers.ModelSerializer):
+    event_id = serializers.UUIDField(source="id")
+
+    class Meta:
+        fields = [
+            "event_id",
+            "status",
+            "notification_id",
+            "notification_send_status",
+            "errors",
+            "created_at",
+            "processed_at",
+        ]
+        model = InboxEvent
+
+
 class NotificationSerializer(serializers.ModelSerializer):
     # Remap the "user" field from the model to "user_id" in the serializer
     user_id = serializers.UUIDField(source="user.id")
@@ -0,0 +1,274 @@
+"""Ingestion of partner events: the notifications they create, and their pushes.
+
+The partner APIs, the inbox workers and the agent admin all ingest events through these
+functions, in process. The callers only differ by how they get the events, and how they report
+the results: `RecipientError` is answered as a 404 by the APIs, for instance.
+"""
+
+import logging
+import os
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import partial
+from typing import cast
+
+from django.db import IntegrityError, connection, transaction
+from rest_framework import serializers
+
+from ami.notification.tasks import push_notification, push_notifications
+from ami.user.cache import CachedUser, aresolve_user, resolve_user, resolve_users, user_cache
+from ami.user.models import User
+from ami.utils import sentry
+from ami.utils.async_db import create_notification_once
+
+from .lanes import Lane, in_lane
+from .models import Notification
+from .serializers import PartnerEventCreateSerializerV2
+from .utils import build_event_idempotency_key
+
+logger = logging.getLogger(__name__)
+
+# Number of notifications inserted per transaction when ingesting several events.
+EVENTS_BATCH_CHUNK_SIZE = 500
+
+
+class RecipientError(Exception):
+    """The recipient of an event is unknown, or has never logged in, and mustn't be notified.
+
+    Only raised when `IGNORE_NOTIFICATION_REQUESTS_FOR_UNREGISTERED_USER` is set: otherwise
+    unknown recipients are created.
+    """
+
+
+@dataclass
+class EventResult:
+    notification_id: uuid.UUID
+    notification_send_status: bool
+    created: bool
+
+
+def ignore_unknown_user() -> bool:
+    return os.getenv("IGNORE_NOTIFICATION_REQUESTS_FOR_UNREGISTERED_USER", "False").lower() in (
+        "true",
+        "1",
+        "t",
+    )
+
+
+def validate_event(payload) -> dict:
+    """Validate a partner event, raising `serializers.ValidationError` if it's invalid."""
+    serializer = PartnerEventCreateSerializerV2(data=payload)
+    try:
+        serializer.is_valid(raise_exception=True)
+    except serializers.ValidationError:
+        logger.exception("Partner create event serialization error")
+        raise
+    return dict(cast(dict, serializer.validated_data))
+
+
+def _check_recipient(user: CachedUser | User | None) -> None:
+    if not ignore_unknown_user():
+        return
+    if user is None:
+        logger.info("User not found")
+        raise RecipientError("User not found")
+    if user.last_logged_in is None:
+        logger.info("User never seen")
+        raise RecipientError("User never seen")
+
+
+def _build_notification(partner_id: str, user: CachedUser | User, data: dict) -> Notification:
+    return Notification(
+        user_id=user.id,
+        partner_id=partner_id,
+        send_status=user.last_logged_in is not None,
+        idempotency_key=build_event_idempotency_key(user.id, partner_id, data),
+        **data,
+    )
+
+
+@contextmanager
+def _atomic() -> Iterator[None]:
+    """`transaction.atomic`, raising the `IntegrityError` of a deleted recipient at its end.
+
+    The foreign keys are only checked on commit: nested in the transaction of the caller (the
+    inbox...), they're checked at the end of the block instead, so the block can be retried.
+    """
+    nested = connection.in_atomic_block
+    with transaction.atomic():
+        yield
+        if nested:
+            connection.check_constraints()
+
+
+def _resolve_recipient(fc_hash: str) -> CachedUser:
+    user = resolve_user(fc_hash)
+    _check_recipient(user)
+    if user is None:
+        user = user_cache.set(fc_hash, User.objects.create(fc_hash=fc_hash))
+    return user
+
+
+async def _aresolve_recipient(fc_hash: str) -> CachedUser:
+    user = await aresolve_user(fc_hash)
+    _check_recipient(user)
+    if user is None:
+        user = user_cache.set(fc_hash, await User.objects.acreate(fc_hash=fc_hash))
+    return user
+
+
+def _create_event(partner_id: str, user: CachedUser, data: dict) -> EventResult:
+    notification = _build_notification(partner_id, user, data)
+    # don't push notification if not required or if user has never logged in on AMI
+    try_push = data["try_push"] and bool(notification.send_status)
+    with _atomic():
+        stored_ids = Notification.bulk_create_once([notification])
+        notification_id = stored_ids[notification.idempotency_key]
+        created = notification_id == notification.id
+        if created:
+            transaction.on_commit(
+                partial(
+                    in_lane(push_notification, Lane.INTERACTIVE).enqueue,
+                    str(notification.id),
+                    try_push,
+                )
+            )
+    return EventResult(notification_id, bool(notification.send_status), created)
+
+
+async def _acreate_event(partner_id: str, user: CachedUser, data: dict) -> EventResult:
+    notification = _build_notification(partner_id, user, data)
+    # don't push notification if not required or if user has never logged in on AMI
+    try_push = data["try_push"] and bool(notification.send_status)
+    # A single statement in autocommit mode: the notification is committed once inserted
+    notification_id = await create_notification_once(notification)
+    created = notification_id == notification.id
+    if created:
+        await in_lane(push_notification, Lane.INTERACTIVE).aenqueue(str(notification.id), try_push)
+    return EventResult(notification_id, bool(notification.send_status), created)
+
+
+def create_event(partner_id: str, data: dict) -> EventResult:
+    """Ingest a validated partner event: create its notification once, and push it.
+
+    The recipient is created if unknown, see `RecipientError`.
+    """
+    fc_hash = data.pop("recipient_fc_hash")
+    try:
+        result = _create_event(partner_id, _resolve_recipient(fc_hash), data)
+    except IntegrityError:
+        # The cached recipient may have been deleted by another process, see `ami.user.cache`
+        user_cache.invalidate(fc_hash)
+        result = _create_event(partner_id, _resolve_recipient(fc_hash), data)
+
+    sentry.add_counter("notification.request.processed")
+    return result
+
+
+async def acreate_event(partner_id: str, data: dict) -> EventResult:
+    """Async version of `create_event`."""
+    fc_hash = data.pop("recipient_fc_hash")
+    try:
+        result = await _acreate_event(partner_id, await _aresolve_recipient(fc_hash), data)
+    except IntegrityError:
+        # The cached recipient may have been deleted by another process, see `ami.user.cache`
+        user_cache.invalidate(fc_hash)
+        result = await _acreate_event(partner_id, await _aresolve_recipient(fc_hash), data)
+
+    sentry.add_counter("notification.request.processed")
+    return result
+
+
+def _resolve_event_users(fc_hashes: set[str], ignore_unknown: bool) -> dict[str, CachedUser]:
+    users = resolve_users(fc_hashes)
+    missing = fc_hashes - users.keys()
+    if missing and not ignore_unknown:
+        User.objects.bulk_create(
+            [User(fc_hash=fc_hash) for fc_hash in missing], ignore_conflicts=True
+        )
+        # Re-fetch instead of trusting the created instances: a concurrent request may have
+        # inserted some of these users in the meantime.
+        users.update(resolve_users(missing))
+    return users
+
+
+def _create_events_chunk(
+    partner_id: str,
+    chunk: list[tuple[int, dict, str]],
+    users: dict[str, CachedUser],
+    ignore_unknown: bool,
+    results: list[dict],
+) -> None:
+    notifications: list[tuple[int, Notification, bool]] = []
+    for index, data, fc_hash in chunk:
+        user = users.get(fc_hash)
+        if user is None:
+            results[index] = {
+                "status": "error",
+                "errors": {"recipient_fc_hash": ["User not found"]},
+            }
+        elif ignore_unknown and user.last_logged_in is None:
+            results[index] = {
+                "status": "error",
+                "errors": {"recipient_fc_hash": ["User never seen"]},
+            }
+        else:
+            notification = _build_notification(partner_id, user, data)
+            # don't push notification if not required or if user has never logged in on AMI
+            try_push = data["try_push"] and notification.send_status
+            notifications.append((index, notification, try_push))
+
+    with _atomic():
+        stored_ids = Notification.bulk_create_once([n for _, n, _ in notifications])
+        to_push = []
+        for index, notification, try_push in notifications:
+            notification_id = stored_ids[notification.idempotency_key]
+            created = notification_id == notification.id
+            if created:
+                to_push.append((str(notification_id), try_push))
+            results[index] = {
+                "status": "created" if created else "duplicate",
+                "notification_id": notification_id,
+                "notification_send_status": notification.send_status,
+            }
+        if to_push:
+            transaction.on_commit(partial(in_lane(push_notifications, Lane.BULK).enqueue, to_push))
+
+
+def create_events(partner_id: str, items: list) -> list[dict]:
+    """Validate and ingest partner events, in chunks of `EVENTS_BATCH_CHUNK_SIZE`.
+
+    The result of each event is returned in the same order: an invalid event doesn't reject the
+    others.
+    """
+    ignore_unknown = ignore_unknown_user()
+
+    results: list[dict] = [{} for _ in items]
+    valid_items: list[tuple[int, dict, str]] = []
+    for index, item in enumerate(items):
+        serializer = PartnerEventCreateSerializerV2(data=item)
+        if serializer.is_valid():
+            data = dict(cast(dict, serializer.validated_data))
+            valid_items.append((index, data, data.pop("recipient_fc_hash")))
+        else:
+            results[index] = {"status": "error", "errors": serializer.errors}
+
+    users = _resolve_event_users({fc_hash for _, _, fc_hash in valid_items}, ignore_unknown)
+
+    for start in range(0, len(valid_items), EVENTS_BATCH_CHUNK_SIZE):
+        chunk = valid_items[start : start + EVENTS_BATCH_CHUNK_SIZE]
+        try:
+            _create_events_chunk(partner_id, chunk, users, ignore_unknown, results)
+        except IntegrityError:
+            # Cached recipients may have been deleted by another process, see `ami.user.cache`
+            fc_hashes = {fc_hash for _, _, fc_hash in chunk}
+            for fc_hash in fc_hashes:
+                user_cache.invalidate(fc_hash)
+                users.pop(fc_hash, None)
+            users.update(_resolve_event_users(fc_hashes, ignore_unknown))
+            _create_events_chunk(partner_id, chunk, users, ignore_unknown, results)
+
+    sentry.add_counter("notification.batch.processed")
+    return results
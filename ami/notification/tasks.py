@@ -1,11 +1,65 @@
-from asgiref.sync import async_to_sync
-from django.tasks import task  # type: ignore[import-untyped]
+import uuid
 
-from ami.notification.models import Notification
-from ami.notification.push import push
+from django.db.models import F
+from django.utils.timezone import now
+
+from ami.notification.broadcast import run_broadcast
+from ami.notification.models import Broadcast, Notification
+from ami.notification.push import push_many, push_sync, retry_delivery, run_push
+from ami.user.models import Registration
+from ami.utils.tasks import task
 
 
 @task
 def push_notification(notification_id: str, try_push: bool) -> None:
     notification = Notification.objects.get(id=notification_id)
-    async_to_sync(push)(notification, try_push)
+    push_sync([(notification, try_push)])
+
+
+@task
+def push_notifications(
+    notifications: list[tuple[str, bool]], broadcast_id: str | None = None
+) -> None:
+    """Push a batch of notifications, given as `(notification_id, try_push)` pairs.
+
+    The pushed notifications are counted in the progress of their broadcast, if any.
+    """
+    try_push_by_id = dict(notifications)
+    batch = [
+        (notification, try_push_by_id[str(notification.id)])
+        for notification in Notification.objects.filter(id__in=try_push_by_id.keys())
+    ]
+    run_push(push_batch, batch, broadcast_id)
+
+
+async def push_batch(
+    batch: list[tuple[Notification, bool]],
+    broadcast_id: str | None,
+    registrations: dict[uuid.UUID, list[Registration]] | None = None,
+) -> None:
+    """Push the notifications of a `push_notifications` task, see `push_many`."""
+    await push_many(batch, registrations)
+    if broadcast_id is not None:
+        await Broadcast.objects.filter(id=broadcast_id).aupdate(
+            pushed_count=F("pushed_count") + len(batch)
+        )
+
+
+@task
+def broadcast_notification(broadcast_id: str) -> None:
+    run_broadcast(Broadcast.objects.get(id=broadcast_id))
+
+
+@task
+def retry_push_delivery(notification_id: str, registration_id: str, attempt: int) -> None:
+    """Attempt again to deliver a notification to a registration, see `ami.notification.retries`."""
+    notification = Notification.objects.filter(id=notification_id).first()
+    registration = Registration.objects.filter(
+        id=registration_id, quarantined_at__isnull=True
+    ).first()
+    if notification is None or registration is None:
+        # Deleted meanwhile, or the registration is gone
+        return
+    if notification.valid_until is not None and notification.valid_until < now():
+        return
+    run_push(retry_delivery, notification, registration, attempt)
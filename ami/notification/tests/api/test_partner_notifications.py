@@ -12,6 +12,7 @@ from pytest_httpx import HTTPXMock
 from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED
 
 from ami.notification.models import Notification
+from ami.notification.utils import EVENT_FIELDS, build_event_idempotency_key
 from ami.tests.utils import get_from_stream
 from ami.user.models import Registration, User
 
@@ -121,10 +122,8 @@ def test_create_mobile_notification(
     mobile_notification: Notification,
     mobile_registration: Registration,
     partner_auth: dict[str, str],
-    monkeypatch: pytest.MonkeyPatch,
+    fcm_send: Mock,
 ) -> None:
-    send_mock = Mock()
-    monkeypatch.setattr("firebase_admin.messaging.send", send_mock)
     notification_data = {
         "recipient_fc_hash": mobile_registration.user.fc_hash,
         "content_title": "Brouillon de nouvelle demande de démarche d'OTV",
@@ -180,8 +179,8 @@ def test_create_mobile_notification(
         "notification_send_status": True,
     }
 
-    send_mock.assert_called_once()
-    call_args = send_mock.call_args
+    fcm_send.assert_called_once()
+    call_args = fcm_send.call_args
     message = call_args[0][0]  # First positional argument
     assert message.notification.title == "Brouillon de nouvelle demande de démarche d'OTV"
     assert message.notification.body == "Merci d'avoir initié votre demande"
@@ -537,7 +536,12 @@ def test_create_notification_duplicated_payload(
     }
 
     # same payload but notification payload exists for another partner
-    Notification.objects.all().update(partner_id="foo")
+    Notification.objects.all().update(
+        partner_id="foo",
+        idempotency_key=build_event_idempotency_key(
+            user.id, "foo", Notification.objects.values(*EVENT_FIELDS).get()
+        ),
+    )
     response = app.post("/api/v1/notifications", notification_data, headers=partner_auth)
     assert response.status_code == HTTP_201_CREATED
     assert Notification.objects.count() == 2
@@ -594,10 +598,8 @@ def test_create_notification_duplicated_payload_with_push(
     app,
     mobile_registration: Registration,
     partner_auth: dict[str, str],
-    monkeypatch: pytest.MonkeyPatch,
+    fcm_send: Mock,
 ) -> None:
-    send_mock = Mock()
-    monkeypatch.setattr("ami.notification.push.messaging.send", send_mock)
     notification_data = {
         "recipient_fc_hash": mobile_registration.user.fc_hash,
         "item_type": "OTV",
@@ -618,7 +620,7 @@ def test_create_notification_duplicated_payload_with_push(
         "notification_id": str(notification.id),
         "notification_send_status": True,
     }
-    send_mock.assert_called_once()
+    fcm_send.assert_called_once()
 
     # again, same payload
     response = app.post("/api/v1/notifications", notification_data, headers=partner_auth)
@@ -628,7 +630,7 @@ def test_create_notification_duplicated_payload_with_push(
         "notification_id": str(notification.id),
         "notification_send_status": True,
     }
-    send_mock.assert_called_once()  # no new call
+    fcm_send.assert_called_once()  # no new call
 
 
 @pytest.mark.django_db
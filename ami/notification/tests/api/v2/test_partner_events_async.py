@@ -0,0 +1,128 @@
+import datetime
+from unittest.mock import Mock
+
+import pytest
+from django.test import TestCase
+from django.utils.timezone import now
+from rest_framework.status import HTTP_202_ACCEPTED
+
+from ami.notification.inbox import drain_inbox, inbox_lag
+from ami.notification.models import InboxEvent, Notification
+from ami.partner.models import partners
+from ami.user.models import Registration
+
+
+def build_event(fc_hash: str, **kwargs) -> dict:
+    return {
+        "recipient_fc_hash": fc_hash,
+        "content_title": "Brouillon de nouvelle demande de démarche d'OTV",
+        "content_body": "Merci d'avoir initié votre demande",
+        "item_type": "OTV",
+        "item_id": "A-5-JGBJ5VMOY",
+        "item_status_label": "Brouillon",
+        "item_generic_status": "new",
+        "event_date": "2025-11-27T10:55:00.000Z",
+        **kwargs,
+    }
+
+
+@pytest.mark.django_db
+def test_create_event_async(
+    app,
+    mobile_registration: Registration,
+    partner_auth: dict[str, str],
+    fcm_send: Mock,
+) -> None:
+    user = mobile_registration.user
+
+    response = app.put_json(
+        "/api/v2/event",
+        build_event(user.fc_hash),
+        headers={**partner_auth, "Prefer": "respond-async"},
+    )
+    assert response.status_code == HTTP_202_ACCEPTED
+    event = InboxEvent.objects.get()
+    assert response.json == {"event_id": str(event.id)}
+    assert event.partner_id == "psl"
+    assert event.status == InboxEvent.Status.PENDING
+    assert Notification.objects.count() == 0
+    assert inbox_lag()["pending"] == 1
+
+    response = app.get(f"/api/v2/event/{event.id}", headers=partner_auth)
+    assert response.json["status"] == "pending"
+    assert response.json["notification_id"] is None
+
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        assert drain_inbox() == 1
+    assert drain_inbox() == 0
+    notification = Notification.objects.get()
+    assert notification.user_id == user.id
+    assert notification.partner_id == "psl"
+    assert notification.send_status is True
+    assert fcm_send.call_count == 1
+    assert inbox_lag() == {"pending": 0, "oldest_pending_age_seconds": 0.0}
+
+    response = app.get(f"/api/v2/event/{event.id}", headers=partner_auth)
+    assert response.json["status"] == "created"
+    assert response.json["notification_id"] == str(notification.id)
+    assert response.json["notification_send_status"] is True
+    assert response.json["processed_at"] is not None
+
+    # the same event again is a duplicate
+    app.put_json(
+        "/api/v2/event",
+        build_event(user.fc_hash),
+        headers={**partner_auth, "Prefer": "respond-async"},
+    )
+    drain_inbox()
+    event = InboxEvent.objects.latest("created_at")
+    assert event.status == InboxEvent.Status.DUPLICATE
+    assert event.notification_id == notification.id
+    assert Notification.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_create_event_async_partner_opt_in(
+    app,
+    partner_auth: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(partners["psl"], "async_ingestion", True)
+    monkeypatch.setenv("IGNORE_NOTIFICATION_REQUESTS_FOR_UNREGISTERED_USER", "true")
+
+    response = app.put_json("/api/v2/event", build_event("unknown_hash"), headers=partner_auth)
+    assert response.status_code == HTTP_202_ACCEPTED
+
+    drain_inbox()
+    event = InboxEvent.objects.get()
+    assert event.status == InboxEvent.Status.ERROR
+    assert event.errors == {"recipient_fc_hash": ["User not found"]}
+    assert Notification.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_create_event_async_invalid(app, partner_auth: dict[str, str]) -> None:
+    response = app.put_json(
+        "/api/v2/event",
+        build_event("some_hash", content_title=""),
+        headers={**partner_auth, "Prefer": "respond-async"},
+        status=400,
+    )
+    assert "content_title" in response.json
+    assert InboxEvent.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_get_event_of_another_partner(app, partner_auth: dict[str, str]) -> None:
+    event = InboxEvent.objects.create(partner_id="dinum-dn", payload=build_event("some_hash"))
+    app.get(f"/api/v2/event/{event.id}", headers=partner_auth, status=404)
+    app.get(f"/api/v2/event/{event.id}", status=401)
+
+
+@pytest.mark.django_db
+def test_inbox_lag() -> None:
+    event = InboxEvent.objects.create(partner_id="psl", payload=build_event("some_hash"))
+    InboxEvent.objects.filter(id=event.id).update(created_at=now() - datetime.timedelta(minutes=1))
+    lag = inbox_lag()
+    assert lag["pending"] == 1
+    assert lag["oldest_pending_age_seconds"] >= 60
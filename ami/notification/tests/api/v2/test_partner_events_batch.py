@@ -0,0 +1,141 @@
+from unittest.mock import Mock
+
+import pytest
+from django.test import TestCase
+from rest_framework.status import HTTP_200_OK
+
+from ami.notification.api_views_v2 import EVENTS_BATCH_MAX_SIZE
+from ami.notification.models import Notification
+from ami.notification.serializers import PartnerEventBatchItemResponseSerializer
+from ami.user.models import Registration, User
+
+
+def build_event(fc_hash: str, **kwargs) -> dict:
+    return {
+        "recipient_fc_hash": fc_hash,
+        "content_title": "Brouillon de nouvelle demande de démarche d'OTV",
+        "content_body": "Merci d'avoir initié votre demande",
+        "item_type": "OTV",
+        "item_id": "A-5-JGBJ5VMOY",
+        "item_status_label": "Brouillon",
+        "item_generic_status": "new",
+        "event_date": "2025-11-27T10:55:00.000Z",
+        **kwargs,
+    }
+
+
+@pytest.mark.django_db
+def test_create_events(
+    app,
+    mobile_registration: Registration,
+    partner_auth: dict[str, str],
+    fcm_send: Mock,
+) -> None:
+    user = mobile_registration.user
+    events = [
+        build_event(user.fc_hash),
+        build_event(user.fc_hash, item_generic_status="wip", item_status_label="En cours"),
+        build_event(user.fc_hash),  # duplicate of the first event
+        build_event(user.fc_hash, content_title=""),
+        build_event("unknown_hash", try_push=False),
+    ]
+
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        response = app.put_json("/api/v2/events", events, headers=partner_auth)
+    assert response.status_code == HTTP_200_OK
+    assert Notification.objects.count() == 3
+    first, second, duplicate, error, unknown = response.json
+    notification = Notification.objects.get(id=first["notification_id"])
+    assert notification.user_id == user.id
+    assert notification.partner_id == "psl"
+    assert notification.send_status is True
+    assert first == {
+        "status": "created",
+        "notification_id": str(notification.id),
+        "notification_send_status": True,
+    }
+    assert second["status"] == "created"
+    assert Notification.objects.get(id=second["notification_id"]).item_generic_status == "wip"
+    assert duplicate == {**first, "status": "duplicate"}
+    assert error == {
+        "status": "error",
+        "errors": {"content_title": ["Ce champ ne peut être vide."]},
+    }
+    new_user = User.objects.get(fc_hash="unknown_hash")
+    assert new_user.last_logged_in is None
+    assert unknown["status"] == "created"
+    assert unknown["notification_send_status"] is False
+    assert Notification.objects.get(id=unknown["notification_id"]).user_id == new_user.id
+    # One push for each notification created for the user having a registration.
+    assert fcm_send.call_count == 2
+
+    # Sending the same batch again only reports duplicates.
+    response = app.put_json("/api/v2/events", events, headers=partner_auth)
+    assert Notification.objects.count() == 3
+    assert [result["status"] for result in response.json] == [
+        "duplicate",
+        "duplicate",
+        "duplicate",
+        "error",
+        "duplicate",
+    ]
+    assert fcm_send.call_count == 2
+
+
+@pytest.mark.django_db
+def test_create_events_ignore_unknown_user(
+    app,
+    never_seen_user: User,
+    partner_auth: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("IGNORE_NOTIFICATION_REQUESTS_FOR_UNREGISTERED_USER", "true")
+    events = [build_event("unknown_hash"), build_event(never_seen_user.fc_hash)]
+    response = app.put_json("/api/v2/events", events, headers=partner_auth)
+    assert response.json == [
+        {"status": "error", "errors": {"recipient_fc_hash": ["User not found"]}},
+        {"status": "error", "errors": {"recipient_fc_hash": ["User never seen"]}},
+    ]
+    assert Notification.objects.count() == 0
+    assert User.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_create_events_send_ko_with_400_when_payload_is_invalid(
+    app,
+    user: User,
+    partner_auth: dict[str, str],
+) -> None:
+    response = app.put_json(
+        "/api/v2/events", build_event(user.fc_hash), headers=partner_auth, status=400
+    )
+    assert response.json == {"non_field_errors": ["Une liste d'événements est attendue."]}
+
+    events = [build_event(user.fc_hash)] * (EVENTS_BATCH_MAX_SIZE + 1)
+    response = app.put_json("/api/v2/events", events, headers=partner_auth, status=400)
+    assert response.json == {
+        "non_field_errors": [
+            f"Un lot ne peut pas contenir plus de {EVENTS_BATCH_MAX_SIZE} événements."
+        ]
+    }
+    assert Notification.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_create_events_without_auth(app) -> None:
+    app.put_json("/api/v2/events", [], status=401)
+
+
+def test_batch_item_response_serializer_errors() -> None:
+    serializer = PartnerEventBatchItemResponseSerializer(
+        data={"status": "error", "errors": {"content_title": ["Ce champ est obligatoire."]}}
+    )
+    assert serializer.is_valid(), serializer.errors
+    assert serializer.validated_data == {
+        "status": "error",
+        "errors": {"content_title": ["Ce champ est obligatoire."]},
+    }
+
+    serializer = PartnerEventBatchItemResponseSerializer(data={"status": "unknown"})
+    assert not serializer.is_valid()
+    assert "status" in serializer.errors
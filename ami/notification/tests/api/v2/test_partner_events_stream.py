@@ -0,0 +1,125 @@
+import json
+from collections.abc import AsyncIterator
+from typing import cast
+from unittest.mock import Mock
+
+import pytest
+from django.http import StreamingHttpResponse
+from django.test import AsyncClient
+from rest_framework.status import HTTP_200_OK
+
+from ami.notification.models import Notification
+from ami.user.models import Registration, User
+
+
+def build_event(fc_hash: str, **kwargs) -> dict:
+    return {
+        "recipient_fc_hash": fc_hash,
+        "content_title": "Brouillon de nouvelle demande de démarche d'OTV",
+        "content_body": "Merci d'avoir initié votre demande",
+        "item_type": "OTV",
+        "item_id": "A-5-JGBJ5VMOY",
+        "item_status_label": "Brouillon",
+        "item_generic_status": "new",
+        "event_date": "2025-11-27T10:55:00.000Z",
+        **kwargs,
+    }
+
+
+def build_ndjson(*lines: dict | str) -> bytes:
+    return "\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines).encode(
+        "utf8"
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_create_events_stream(
+    app,
+    mobile_registration: Registration,
+    partner_auth: dict[str, str],
+    fcm_send: Mock,
+) -> None:
+    user = mobile_registration.user
+    body = build_ndjson(
+        build_event(user.fc_hash),
+        build_event(user.fc_hash, item_id="2"),
+        "",
+        build_event(user.fc_hash),  # duplicate of the first event
+        "{not json",
+        build_event(user.fc_hash, content_title=""),
+        build_event("unknown_hash", item_id="3", try_push=False),
+    )
+
+    response = app.put(
+        "/api/v2/events/stream?chunk_size=2",
+        body,
+        content_type="application/x-ndjson",
+        headers=partner_auth,
+    )
+    assert response.status_code == HTTP_200_OK
+    assert response.content_type == "application/x-ndjson"
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [result["line"] for result in results] == [1, 2, 4, 5, 6, 7]
+    assert [result["status"] for result in results] == [
+        "created",
+        "created",
+        "duplicate",
+        "error",
+        "error",
+        "created",
+    ]
+    assert results[2]["notification_id"] == results[0]["notification_id"]
+    assert results[3]["errors"] == {"non_field_errors": ["JSON invalide."]}
+    assert "content_title" in results[4]["errors"]
+    assert Notification.objects.count() == 3
+    assert Notification.objects.get(id=results[5]["notification_id"]).user == User.objects.get(
+        fc_hash="unknown_hash"
+    )
+    assert fcm_send.call_count == 2
+
+
+@pytest.mark.django_db
+def test_create_events_stream_invalid_request(app, partner_auth: dict[str, str]) -> None:
+    body = build_ndjson(build_event("some_hash"))
+    app.put("/api/v2/events/stream", body, content_type="application/x-ndjson", status=401)
+    app.put(
+        "/api/v2/events/stream",
+        body,
+        content_type="application/json",
+        headers=partner_auth,
+        status=415,
+    )
+    response = app.put(
+        "/api/v2/events/stream?chunk_size=0",
+        body,
+        content_type="application/x-ndjson",
+        headers=partner_auth,
+        status=400,
+    )
+    assert response.json == {
+        "chunk_size": ["La taille des paquets doit être comprise entre 1 et 1000."]
+    }
+    assert Notification.objects.count() == 0
+
+
+@pytest.mark.django_db(transaction=True)
+async def test_create_events_stream_asgi(
+    mobile_registration: Registration,
+    partner_auth: dict[str, str],
+    fcm_send: Mock,
+) -> None:
+    user = await User.objects.aget(registration=mobile_registration)
+    body = build_ndjson(build_event(user.fc_hash), build_event(user.fc_hash, item_id="2"))
+
+    response = await AsyncClient().put(
+        "/api/v2/events/stream?chunk_size=1",
+        body,
+        content_type="application/x-ndjson",
+        headers=partner_auth,
+    )
+    assert response.status_code == HTTP_200_OK
+    assert isinstance(response, StreamingHttpResponse) and response.is_async
+    # Typed as a synchronous iterator, which it isn't under ASGI
+    chunks = [chunk async for chunk in cast(AsyncIterator[bytes], response.streaming_content)]
+    assert [json.loads(chunk)["status"] for chunk in chunks] == ["created", "created"]
+    assert await Notification.objects.acount() == 2
@@ -0,0 +1,20 @@
+import pytest
+from django.core.management import call_command
+from django_tasks_db.models import DBTaskResult
+
+from ami.notification.models import Broadcast, Notification
+from ami.user.models import Registration, User
+
+
+@pytest.mark.django_db(transaction=True)
+def test_command_benchmark_broadcast(capsys) -> None:
+    call_command("benchmark-broadcast", "--recipients", "3", "--host-max-rate", "0")
+
+    output = capsys.readouterr().out
+    assert "notifications created: 3 in" in output
+    assert "notifications pushed by 1 tasks, 20 at once: 3 in" in output
+    assert DBTaskResult.objects.count() == 0
+    assert Broadcast.objects.count() == 0
+    assert Notification.objects.count() == 0
+    assert Registration.objects.count() == 0
+    assert User.objects.count() == 0
@@ -0,0 +1,21 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from ami.notification.models import Notification
+from ami.user.models import User
+
+
+@pytest.mark.django_db
+def test_command_benchmark_partner_event_ingest() -> None:
+    stdout = StringIO()
+    call_command("benchmark-partner-event-ingest", rows=20, events=10, users=5, stdout=stdout)
+    output = stdout.getvalue()
+    assert "Seeded 20 notifications" in output
+    assert "get_or_create: 10 ops" in output
+    assert "idempotency key: 10 ops" in output
+
+    # everything is rolled back
+    assert Notification.objects.count() == 0
+    assert User.objects.count() == 0
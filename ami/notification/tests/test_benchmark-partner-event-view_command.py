@@ -0,0 +1,16 @@
+import pytest
+from django.core.management import call_command
+
+from ami.notification.models import Notification
+from ami.user.models import User
+
+
+@pytest.mark.django_db(transaction=True)
+def test_command_benchmark_partner_event_view(capsys) -> None:
+    call_command("benchmark-partner-event-view", "--requests", "20", "--concurrency", "4")
+
+    output = capsys.readouterr().out
+    assert "sync view, concurrency 4: 20 ops" in output
+    assert "async view, concurrency 4: 20 ops" in output
+    assert Notification.objects.count() == 0
+    assert User.objects.count() == 0
@@ -0,0 +1,20 @@
+import pytest
+from django.core.management import call_command
+from django_tasks_db.models import DBTaskResult
+
+from ami.notification.models import Notification
+from ami.user.models import Registration, User
+
+
+@pytest.mark.django_db(transaction=True)
+def test_command_benchmark_push_latency(capsys) -> None:
+    call_command("benchmark-push-latency", "--events", "2", "--interval", "0.2", "--pause", "0.1")
+
+    output = capsys.readouterr().out
+    assert "db_worker, polling every 0.2s: 2 ops" in output
+    assert "task-worker, woken up by the new tasks: 2 ops" in output
+    assert "push-worker, woken up by the new tasks: 2 ops" in output
+    assert DBTaskResult.objects.count() == 0
+    assert Notification.objects.count() == 0
+    assert Registration.objects.count() == 0
+    assert User.objects.count() == 0
@@ -0,0 +1,29 @@
+import pytest
+from django.core.management import call_command
+
+from ami.notification.models import Notification
+from ami.user.models import Registration, User
+
+
+@pytest.mark.django_db(transaction=True)
+def test_command_benchmark_push(capsys) -> None:
+    call_command(
+        "benchmark-push",
+        "--notifications",
+        "3",
+        "--webpush",
+        "2",
+        "--mobile",
+        "2",
+        "--latency",
+        "0",
+    )
+
+    output = capsys.readouterr().out
+    assert "push_notification task: 3 ops" in output
+    assert "push_notification task: 12 deliveries" in output
+    assert "push(), 10 concurrent: 3 ops" in output
+    assert "answers 200: 6, 201: 6" in output
+    assert Notification.objects.count() == 0
+    assert Registration.objects.count() == 0
+    assert User.objects.count() == 0
@@ -0,0 +1,13 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+
+def test_command_benchmark_webpush() -> None:
+    stdout = StringIO()
+    call_command("benchmark-webpush", messages=10, max_workers=2, stdout=stdout)
+    output = stdout.getvalue()
+    assert "new signer: 10 ops" in output
+    assert "cached signer: 10 ops" in output
+    assert "process pool, 1 workers: 10 ops" in output
+    assert "process pool, 2 workers: 10 ops" in output
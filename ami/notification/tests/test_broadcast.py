@@ -0,0 +1,123 @@
+import datetime
+
+import pytest
+from django.tasks import TaskResult  # type: ignore[import-untyped]
+from django.test import TestCase
+from django.utils.timezone import now
+
+from ami.notification.models import Broadcast, Notification
+from ami.notification.tasks import broadcast_notification, push_notifications
+from ami.user.models import Consent, Registration, User
+
+
+def create_broadcast(**kwargs) -> Broadcast:
+    return Broadcast.objects.create(
+        partner_id="dinum-ami",
+        content_title="Titre",
+        content_body="Message",
+        try_push=True,
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def users() -> list[User]:
+    return [
+        User.objects.create(fc_hash=f"user-{index}", last_logged_in=now() if index else None)
+        for index in range(4)
+    ]
+
+
+def run(broadcast: Broadcast) -> Broadcast:
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        broadcast_notification.call(str(broadcast.id))
+    broadcast.refresh_from_db()
+    return broadcast
+
+
+@pytest.mark.django_db
+def test_broadcast_registered_users(
+    users: list[User], deferred_tasks: list[TaskResult], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("ami.notification.broadcast.BROADCAST_CHUNK_SIZE", 2)
+    for user in users[:3]:
+        Registration.objects.create(user=user, subscription={"endpoint": "https://push.test"})
+    Registration.objects.filter(user=users[2]).update(quarantined_at=now())
+    broadcast = create_broadcast(segment=Broadcast.Segment.REGISTERED)
+
+    broadcast = run(broadcast)
+
+    assert broadcast.status == Broadcast.Status.DONE
+    assert broadcast.total_count == 2
+    assert broadcast.recipients_count == 2
+    assert broadcast.created_count == 2
+    notifications = Notification.objects.order_by("user__fc_hash")
+    assert [notification.user for notification in notifications] == users[:2]
+    assert all(notification.content_title == "Titre" for notification in notifications)
+    [task] = deferred_tasks
+    assert task.task.func is push_notifications.func
+    assert task.task.queue_name == "bulk"
+    # The user who never logged in isn't pushed to
+    assert sorted(task.args[0], key=lambda pair: pair[1]) == [
+        [str(notifications[0].id), False],
+        [str(notifications[1].id), True],
+    ]
+    assert task.args[1] == str(broadcast.id)
+
+
+@pytest.mark.django_db
+def test_broadcast_chunks(
+    users: list[User], deferred_tasks: list[TaskResult], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("ami.notification.broadcast.BROADCAST_CHUNK_SIZE", 3)
+    broadcast = create_broadcast(
+        segment=Broadcast.Segment.FC_HASHES,
+        fc_hashes=[user.fc_hash for user in users] + ["unknown"],
+    )
+
+    broadcast = run(broadcast)
+
+    assert broadcast.created_count == 4
+    assert [len(task.args[0]) for task in deferred_tasks] == [3, 1]
+    assert Notification.objects.count() == 4
+
+    # Run again, nothing new is created nor pushed
+    broadcast = run(broadcast)
+    assert broadcast.recipients_count == 4
+    assert broadcast.created_count == 4
+    assert len(deferred_tasks) == 2
+    assert Notification.objects.count() == 4
+
+
+@pytest.mark.django_db
+def test_broadcast_consent(users: list[User], deferred_tasks: list[TaskResult]) -> None:
+    Consent.objects.create(user=users[0], partner_id="psl", consent_datetime=now())
+    Consent.objects.create(user=users[1], partner_id="psl")
+    Consent.objects.create(user=users[2], partner_id="dinum-dn", consent_datetime=now())
+    broadcast = create_broadcast(
+        segment=Broadcast.Segment.CONSENT,
+        consent_partner_id="psl",
+        valid_until=now() + datetime.timedelta(days=1),
+    )
+
+    run(broadcast)
+
+    notification = Notification.objects.get()
+    assert notification.user == users[0]
+    assert notification.valid_until == broadcast.valid_until
+
+
+@pytest.mark.django_db
+def test_push_notifications_broadcast_progress(users: list[User]) -> None:
+    broadcast = create_broadcast(segment=Broadcast.Segment.REGISTERED)
+    notifications = Notification.objects.bulk_create(
+        Notification(user=user, partner_id="dinum-ami", content_title="Titre", content_body="M")
+        for user in users[:2]
+    )
+
+    push_notifications.call(
+        [(str(notification.id), False) for notification in notifications], str(broadcast.id)
+    )
+
+    broadcast.refresh_from_db()
+    assert broadcast.pushed_count == 2
@@ -0,0 +1,33 @@
+import pytest
+from django.core.management import call_command
+
+from ami.notification.models import InboxEvent, Notification
+from ami.user.models import User
+
+
+@pytest.mark.django_db
+def test_command_drain_partner_event_inbox(user: User, capsys) -> None:
+    for item_id in ["1", "2", "3"]:
+        InboxEvent.objects.create(
+            partner_id="psl",
+            payload={
+                "recipient_fc_hash": user.fc_hash,
+                "content_title": "title",
+                "content_body": "body",
+                "item_type": "OTV",
+                "item_id": item_id,
+                "item_status_label": "Brouillon",
+                "item_generic_status": "new",
+                "event_date": "2025-11-27T10:55:00Z",
+                "try_push": False,
+            },
+        )
+
+    call_command("drain-partner-event-inbox", "--batch-size", "2")
+    assert InboxEvent.objects.filter(status=InboxEvent.Status.CREATED).count() == 2
+    assert Notification.objects.count() == 2
+    assert "Ingested 2 inbox events, 1 pending" in capsys.readouterr().out
+
+    call_command("drain-partner-event-inbox")
+    assert InboxEvent.objects.filter(status=InboxEvent.Status.CREATED).count() == 3
+    assert Notification.objects.count() == 3
@@ -0,0 +1,188 @@
+import asyncio
+import time
+from typing import Generator
+
+import pytest
+from django.tasks import TaskResult  # type: ignore[import-untyped]
+
+from ami.notification.hosts import CircuitBreaker, get_host, hosts_stats
+from ami.notification.models import Notification
+from ami.notification.push import push_sync
+from ami.tests.fake_push_server import FakePushServer
+from ami.user.models import Registration, User
+
+
+@pytest.fixture
+def fake_push_server() -> Generator[FakePushServer, None, None]:
+    server = FakePushServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def fake_registration(
+    user: User, webpushsubscription: dict, fake_push_server: FakePushServer
+) -> Registration:
+    return Registration.objects.create(
+        user=user,
+        subscription={**webpushsubscription, "endpoint": fake_push_server.endpoint("device")},
+    )
+
+
+def test_circuit_breaker(settings) -> None:
+    settings.PUSH_CIRCUIT_FAILURE_THRESHOLD = 2
+    settings.PUSH_CIRCUIT_OPEN_SECONDS = 0.1
+    circuit = CircuitBreaker()
+
+    circuit.record_failure()
+    assert circuit.state == CircuitBreaker.CLOSED
+    assert circuit.allow()
+    circuit.record_failure()
+    assert circuit.state == CircuitBreaker.OPEN
+    assert not circuit.allow()
+    assert 0 < circuit.retry_after() <= 0.1
+
+    # Once open long enough, a single request probes the host
+    time.sleep(0.1)
+    assert circuit.state == CircuitBreaker.HALF_OPEN
+    assert circuit.allow()
+    assert not circuit.allow()
+    # The probe failed: open again
+    circuit.record_failure()
+    assert circuit.state == CircuitBreaker.OPEN
+
+    time.sleep(0.1)
+    assert circuit.allow()
+    # The probe succeeded: closed
+    circuit.record_success()
+    assert circuit.state == CircuitBreaker.CLOSED
+    assert circuit.allow()
+    assert circuit.allow()
+
+
+def test_circuit_breaker_probe_released(settings) -> None:
+    settings.PUSH_CIRCUIT_FAILURE_THRESHOLD = 1
+    settings.PUSH_CIRCUIT_OPEN_SECONDS = 0
+    circuit = CircuitBreaker()
+    circuit.record_failure()
+    assert circuit.state == CircuitBreaker.HALF_OPEN
+
+    # The probe ends without an outcome, for example cancelled: another request may probe
+    with pytest.raises(asyncio.CancelledError):
+        with circuit.probe() as allowed:
+            assert allowed
+            with circuit.probe() as other:
+                assert not other
+            raise asyncio.CancelledError
+    assert not circuit.probing
+
+    # The outcome recorded within the context is kept
+    with circuit.probe() as allowed:
+        assert allowed
+        circuit.record_success()
+        assert circuit.allow()
+    assert circuit.state == CircuitBreaker.CLOSED
+
+
+def run_requests(count: int, duration: float) -> tuple[int, float]:
+    """Run concurrent requests to a host, returning the max in flight and the total duration."""
+    host = get_host("push.example.com")
+    max_in_flight = 0
+
+    async def request() -> None:
+        nonlocal max_in_flight
+        async with host.slot():
+            max_in_flight = max(max_in_flight, host.in_flight)
+            await asyncio.sleep(duration)
+
+    async def requests() -> None:
+        await asyncio.gather(*(request() for _ in range(count)))
+
+    start = time.monotonic()
+    asyncio.run(requests())
+    assert host.in_flight == 0
+    return max_in_flight, time.monotonic() - start
+
+
+def test_host_max_in_flight(settings) -> None:
+    settings.PUSH_HOST_MAX_IN_FLIGHT = 2
+    settings.PUSH_HOST_MAX_RATE = 0
+
+    max_in_flight, duration = run_requests(6, 0.05)
+
+    assert max_in_flight == 2
+    assert duration >= 0.15
+
+
+def test_host_max_rate(settings) -> None:
+    settings.PUSH_HOST_MAX_RATE = 50
+
+    _, duration = run_requests(10, 0)
+
+    # 10 requests at 50 per second
+    assert duration >= 0.18
+
+
+@pytest.mark.django_db
+def test_push_circuit_opens_on_broken_host(
+    notification: Notification,
+    fake_registration: Registration,
+    fake_push_server: FakePushServer,
+    deferred_tasks: list[TaskResult],
+    settings,
+) -> None:
+    settings.PUSH_CIRCUIT_FAILURE_THRESHOLD = 2
+    fake_push_server.status = 503
+
+    for _ in range(2):
+        # Not skipped by the registration backoff
+        Registration.objects.update(backoff_until=None)
+        push_sync([(notification, True)])
+    assert len(fake_push_server.requests) == 2
+    assert hosts_stats()["127.0.0.1"]["state"] == "open"
+
+    # The host isn't tried anymore: the delivery is deferred
+    Registration.objects.update(backoff_until=None)
+    push_sync([(notification, True)])
+    assert len(fake_push_server.requests) == 2
+    assert len(deferred_tasks) == 3
+    assert deferred_tasks[-1].args == [str(notification.id), str(fake_registration.id), 2]
+    assert deferred_tasks[-1].task.run_after is not None
+    # The registration isn't blamed for the host failure
+    fake_registration.refresh_from_db()
+    assert fake_registration.failure_count == 2
+
+
+@pytest.mark.django_db
+def test_push_slow_host_times_out(
+    notification: Notification,
+    fake_registration: Registration,
+    fake_push_server: FakePushServer,
+    deferred_tasks: list[TaskResult],
+    settings,
+) -> None:
+    settings.PUSH_HOST_TIMEOUT = 0.2
+    fake_push_server.latency = 2
+
+    start = time.monotonic()
+    push_sync([(notification, True)])
+
+    assert time.monotonic() - start < 1
+    assert hosts_stats()["127.0.0.1"]["failures"] == 1
+    [result] = deferred_tasks
+    assert result.args == [str(notification.id), str(fake_registration.id), 2]
+
+
+@pytest.mark.django_db
+def test_push_healthy_host(
+    notification: Notification,
+    fake_registration: Registration,
+    fake_push_server: FakePushServer,
+) -> None:
+    push_sync([(notification, True)])
+
+    assert fake_push_server.requests == ["/push/device"]
+    assert hosts_stats() == {
+        "127.0.0.1": {"state": "closed", "failures": 0, "retry_after": 0.0, "in_flight": 0}
+    }
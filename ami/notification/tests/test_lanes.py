@@ -0,0 +1,38 @@
+import datetime
+
+import pytest
+from django.utils.timezone import now
+from django_tasks_db.models import DBTaskResult
+
+from ami.notification.lanes import Lane, LaneScheduler, in_lane, lanes_lag
+from ami.notification.models import Notification
+from ami.notification.tasks import push_notification
+
+
+def test_lane_scheduler() -> None:
+    scheduler = LaneScheduler({"interactive": 3, "scheduled": 0, "bulk": 1})
+
+    # Picked as often as their weight, interleaved
+    assert [scheduler.next() for _ in range(8)] == [
+        Lane.INTERACTIVE,
+        Lane.INTERACTIVE,
+        Lane.BULK,
+        Lane.INTERACTIVE,
+    ] * 2
+    assert scheduler.shares(4) == {Lane.INTERACTIVE: 3, Lane.BULK: 1}
+
+
+@pytest.mark.django_db
+def test_lanes_lag(notification: Notification) -> None:
+    for _ in range(2):
+        in_lane(push_notification, Lane.BULK).enqueue(str(notification.id), True)
+    DBTaskResult.objects.update(enqueued_at=now() - datetime.timedelta(minutes=2))
+    in_lane(push_notification, Lane.INTERACTIVE).enqueue(str(notification.id), True)
+
+    lag = lanes_lag()
+
+    assert lag["bulk"]["ready"] == 2
+    assert lag["bulk"]["oldest_ready_age_seconds"] >= 120
+    assert lag["interactive"]["ready"] == 1
+    assert lag["interactive"]["oldest_ready_age_seconds"] < 60
+    assert lag["scheduled"] == {"ready": 0, "oldest_ready_age_seconds": 0.0}
@@ -0,0 +1,30 @@
+import datetime
+
+import pytest
+from django.core.management import call_command
+from django.utils.timezone import now
+
+from ami.user.models import Registration, User
+
+
+@pytest.mark.django_db
+def test_command_prune_registrations(user: User, settings) -> None:
+    settings.REGISTRATION_QUARANTINE_DAYS = 30
+    healthy = Registration.objects.create(user=user, subscription={"endpoint": "https://1"})
+    recently_quarantined = Registration.objects.create(
+        user=user,
+        subscription={"endpoint": "https://2"},
+        quarantined_at=now() - datetime.timedelta(days=30, minutes=-2),
+    )
+    Registration.objects.create(
+        user=user,
+        subscription={"endpoint": "https://3"},
+        quarantined_at=now() - datetime.timedelta(days=30),
+    )
+
+    call_command("prune-registrations")
+
+    assert set(Registration.objects.values_list("id", flat=True)) == {
+        healthy.id,
+        recently_quarantined.id,
+    }
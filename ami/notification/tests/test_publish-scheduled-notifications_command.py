@@ -4,6 +4,8 @@ import pytest
 from asgiref.sync import sync_to_async
 from channels.testing.websocket import WebsocketCommunicator
 from django.core.management import call_command
+from django.tasks import TaskResult  # type: ignore[import-untyped]
+from django.test import TestCase
 from django.utils.timezone import now
 from pytest_httpx import HTTPXMock
 
@@ -14,6 +16,7 @@ from ami.user.models import Registration, User
 
 @pytest.mark.django_db(transaction=True)
 async def test_command_publish_scheduled_notifications(
+    dummy_tasks,
     websocket: WebsocketCommunicator,
     webpush_registration: Registration,
     httpx_mock: HTTPXMock,
@@ -104,6 +107,7 @@ async def test_command_publish_scheduled_notifications(
 
 @pytest.mark.django_db
 def test_command_publish_scheduled_notification_when_registration_gone(
+    dummy_tasks,
     webpush_registration: Registration,
     httpx_mock: HTTPXMock,
 ) -> None:
@@ -120,7 +124,8 @@ def test_command_publish_scheduled_notification_when_registration_gone(
         scheduled_at=now(),
     )
 
-    call_command("publish-scheduled-notifications")
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        call_command("publish-scheduled-notifications")
 
     notification_count = Notification.objects.count()
     assert notification_count == 1
@@ -129,6 +134,7 @@ def test_command_publish_scheduled_notification_when_registration_gone(
 
 @pytest.mark.django_db
 def test_command_publish_scheduled_notification_no_registration(
+    dummy_tasks,
     user: User,
     httpx_mock: HTTPXMock,
 ) -> None:
@@ -141,7 +147,8 @@ def test_command_publish_scheduled_notification_no_registration(
         scheduled_at=now(),
     )
 
-    call_command("publish-scheduled-notifications")
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        call_command("publish-scheduled-notifications")
 
     notification_count = Notification.objects.count()
     assert notification_count == 1
@@ -150,6 +157,7 @@ def test_command_publish_scheduled_notification_no_registration(
 
 @pytest.mark.django_db
 def test_command_publish_scheduled_notification_never_seen_user(
+    dummy_tasks,
     never_seen_user: User,
     httpx_mock: HTTPXMock,
 ) -> None:
@@ -162,7 +170,8 @@ def test_command_publish_scheduled_notification_never_seen_user(
         scheduled_at=now(),
     )
 
-    call_command("publish-scheduled-notifications")
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        call_command("publish-scheduled-notifications")
 
     all_notifications = Notification.objects.all()
     assert len(all_notifications) == 1
@@ -170,3 +179,52 @@ def test_command_publish_scheduled_notification_never_seen_user(
     assert notification.try_push is None
     assert notification.send_status is False
     assert not httpx_mock.get_request()
+
+
+@pytest.mark.django_db
+def test_command_publish_scheduled_notifications_in_batches(
+    user: User,
+    deferred_tasks: list[TaskResult],
+    capsys,
+    django_assert_num_queries,
+) -> None:
+    never_seen_user = User.objects.create(fc_hash="never-seen")
+    scheduled_notifications = [
+        ScheduledNotification.objects.create(
+            user_id=recipient.id,
+            content_title=f"title {index}",
+            content_body="body",
+            content_icon="icon",
+            reference=f"reference {index}",
+            scheduled_at=now(),
+        )
+        for index, recipient in enumerate([user, never_seen_user, user])
+    ]
+
+    # Per batch: savepoint, due scheduled notifications with their users, insert, update, release
+    with django_assert_num_queries(5 + 5 + 3):
+        with TestCase.captureOnCommitCallbacks(execute=True):
+            call_command("publish-scheduled-notifications", "--batch-size", "2")
+
+    output = capsys.readouterr().out
+    assert "Batch 1: published 2 scheduled notifications" in output
+    assert "Batch 2: published 1 scheduled notifications" in output
+    assert "Published 3 scheduled notifications" in output
+    notifications = {
+        notification.content_title: notification for notification in Notification.objects.all()
+    }
+    assert notifications["title 0"].send_status is True
+    assert notifications["title 1"].send_status is False
+    for scheduled_notification in scheduled_notifications:
+        scheduled_notification.refresh_from_db()
+        assert (
+            scheduled_notification.sent_at
+            == notifications[scheduled_notification.content_title].created_at
+        )
+    # Pushed once committed, in the scheduled lane
+    assert [task.task.name for task in deferred_tasks] == ["push_notifications"] * 2
+    assert {task.task.queue_name for task in deferred_tasks} == {"scheduled"}
+    assert [task.args for task in deferred_tasks] == [
+        [[[str(notifications["title 0"].id), True], [str(notifications["title 1"].id), True]]],
+        [[[str(notifications["title 2"].id), True]]],
+    ]
@@ -0,0 +1,18 @@
+import pytest
+from django.core.management import call_command
+from django.tasks import TaskResultStatus  # type: ignore[import-untyped]
+from django_tasks_db.models import DBTaskResult
+
+from ami.notification.models import Notification
+from ami.notification.tasks import push_notification
+
+
+@pytest.mark.django_db(transaction=True)
+def test_command_push_worker(notification: Notification) -> None:
+    result = push_notification.enqueue(str(notification.id), False)
+
+    call_command("push-worker", "--batch", "--interval", "0", "--worker-id", "push-worker-test")
+
+    db_task = DBTaskResult.objects.get(id=result.id)
+    assert db_task.status == TaskResultStatus.SUCCESSFUL
+    assert db_task.worker_ids == ["push-worker-test"]
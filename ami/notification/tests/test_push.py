@@ -0,0 +1,368 @@
+import datetime
+import time
+from typing import Any, Generator
+from unittest.mock import Mock
+
+import pytest
+from django.utils.timezone import now
+from firebase_admin import exceptions, messaging
+from pytest_httpx import HTTPXMock
+from webpush import WebPushSubscription
+from webpush.vapid import VAPID
+
+from ami.notification import encryption, health, push
+from ami.notification.models import Notification
+from ami.notification.push import provide_webpush, push_sync
+from ami.tests.fake_push_server import FakePushServer
+from ami.user.models import Registration, User
+from ami.utils.httpx import DecodingError
+
+
+@pytest.mark.django_db
+def test_push_to_all_registrations(
+    webpush_notification: Notification,
+    webpush_registration: Registration,
+    mobile_registration: Registration,
+    httpx_mock: HTTPXMock,
+    fcm_send: Mock,
+) -> None:
+    httpx_mock.add_response(url=webpush_registration.subscription["endpoint"])
+
+    push_sync([(webpush_notification, True)])
+
+    assert httpx_mock.get_request() is not None
+    fcm_send.assert_called_once()
+    assert fcm_send.call_args[0][0].token == mobile_registration.subscription["fcm_token"]
+
+
+@pytest.mark.django_db
+def test_push_fcm_failure_does_not_block_webpush(
+    webpush_notification: Notification,
+    webpush_registration: Registration,
+    mobile_registration: Registration,
+    httpx_mock: HTTPXMock,
+    fcm_send: Mock,
+) -> None:
+    httpx_mock.add_response(url=webpush_registration.subscription["endpoint"])
+    fcm_send.side_effect = Exception("FCM is down")
+
+    # The FCM error is logged, as before
+    push_sync([(webpush_notification, True)])
+
+    fcm_send.assert_called_once()
+    assert httpx_mock.get_request() is not None
+
+
+@pytest.mark.django_db
+def test_push_unexpected_error_raised_after_all_registrations(
+    webpush_notification: Notification,
+    webpush_registration: Registration,
+    mobile_registration: Registration,
+    httpx_mock: HTTPXMock,
+    fcm_send: Mock,
+) -> None:
+    httpx_mock.add_exception(
+        DecodingError("Unexpected answer"),
+        url=webpush_registration.subscription["endpoint"],
+    )
+
+    with pytest.raises(DecodingError):
+        push_sync([(webpush_notification, True)])
+
+    # The mobile device was still notified
+    fcm_send.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_push_dont_try_push(
+    webpush_notification: Notification,
+    webpush_registration: Registration,
+    httpx_mock: HTTPXMock,
+) -> None:
+    push_sync([(webpush_notification, False)])
+
+    assert httpx_mock.get_request() is None
+
+
+@pytest.fixture
+def mobile_registrations(user: User, mobileAppSubscription: dict[str, Any]) -> list[Registration]:
+    return [
+        Registration.objects.create(
+            user=user,
+            subscription={**mobileAppSubscription, "device_id": token, "fcm_token": token},
+        )
+        for token in ["token-1", "token-2", "unregistered-token"]
+    ]
+
+
+@pytest.mark.django_db
+def test_push_fcm_batches(
+    notification: Notification,
+    mobile_registrations: list[Registration],
+    fcm_send: Mock,
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    monkeypatch.setattr("ami.notification.push.FCM_BATCH_SIZE", 2)
+    send_each = Mock(wraps=push.messaging.send_each)
+    monkeypatch.setattr("ami.notification.push.messaging.send_each", send_each)
+
+    def send(message: messaging.Message) -> None:
+        if message.token == "unregistered-token":
+            raise messaging.UnregisteredError("Requested entity was not found.")
+
+    fcm_send.side_effect = send
+
+    push_sync([(notification, True), (notification, True)])
+
+    assert [len(call.args[0]) for call in send_each.call_args_list] == [2, 2, 2]
+    assert fcm_send.call_count == 6
+    # Each response is mapped back to its registration
+    unregistered = [record for record in caplog.records if "FCM token is invalid" in record.message]
+    assert len(unregistered) == 2
+    assert all("unregistered-token" in record.message for record in unregistered)
+
+
+@pytest.fixture
+def fake_fcm(settings) -> Generator[list[str], None, None]:
+    """Run a local fake FCM server, returning the tokens it received messages for."""
+    server = FakePushServer()
+    server.start()
+    settings.FCM_URL = server.fcm_url
+    yield server.fcm_tokens
+    server.stop()
+
+
+@pytest.mark.django_db
+def test_push_fcm_fake_server(
+    notification: Notification,
+    mobile_registrations: list[Registration],
+    fake_fcm: list[str],
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    push_sync([(notification, True)])
+
+    assert sorted(fake_fcm) == ["token-1", "token-2", "unregistered-token"]
+    unregistered = [record for record in caplog.records if "FCM token is invalid" in record.message]
+    assert len(unregistered) == 1
+    assert "unregistered-token" in unregistered[0].message
+
+
+def test_provide_webpush_caches_vapid_headers(monkeypatch: pytest.MonkeyPatch) -> None:
+    webpush_ = provide_webpush()
+    assert provide_webpush() is webpush_
+
+    def authorization(endpoint: str) -> str:
+        subscription = WebPushSubscription.model_validate(
+            {
+                "endpoint": endpoint,
+                "keys": {
+                    "auth": "ribfIxhEOtCZ0lkcbB4yCg",
+                    "p256dh": "BGsTJAJDhGijvPLi0DVPHB86MGLmW1Y6VzjX-FpTlKbhhOtCmU0Vffaj1djCXzR6vkUYrwkOTmh1dgbIQHEyy1k",
+                },
+            }
+        )
+        return webpush_.get(message="hello", subscription=subscription).headers["authorization"]
+
+    mozilla = authorization("https://updates.push.services.mozilla.com/wpush/v2/1")
+    # Same push service: same header
+    assert authorization("https://updates.push.services.mozilla.com/wpush/v2/2") == mozilla
+    # Another push service: its own header
+    assert authorization("https://fcm.googleapis.com/fcm/send/1") != mozilla
+
+    # Close to the expiration, the header is signed again
+    expires_at = time.time() + webpush_.expiration
+    monkeypatch.setattr(time, "time", lambda: expires_at - encryption.VAPID_REFRESH_MARGIN + 1)
+    assert authorization("https://updates.push.services.mozilla.com/wpush/v2/1") != mozilla
+
+
+def test_provide_webpush_new_keys(settings) -> None:
+    webpush_ = provide_webpush()
+    private_key, public_key, _ = VAPID.generate_keys()
+    settings.VAPID_PRIVATE_KEY = private_key.decode()
+    settings.VAPID_PUBLIC_KEY = public_key.decode()
+    assert provide_webpush() is not webpush_
+
+
+@pytest.mark.django_db
+def test_push_webpush_health(
+    webpush_notification: Notification,
+    webpush_registration: Registration,
+    httpx_mock: HTTPXMock,
+) -> None:
+    endpoint = webpush_registration.subscription["endpoint"]
+
+    # A success is recorded
+    httpx_mock.add_response(url=endpoint, status_code=201)
+    push_sync([(webpush_notification, True)])
+    webpush_registration.refresh_from_db()
+    assert webpush_registration.failure_count == 0
+    assert webpush_registration.last_success_at is not None
+
+    # A transient failure backs the registration off, at least for the Retry-After delay
+    httpx_mock.add_response(url=endpoint, status_code=429, headers={"Retry-After": "7200"})
+    push_sync([(webpush_notification, True)])
+    webpush_registration.refresh_from_db()
+    assert webpush_registration.failure_count == 1
+    assert webpush_registration.last_failure_at is not None
+    assert webpush_registration.backoff_until is not None
+    assert webpush_registration.backoff_until > now() + datetime.timedelta(seconds=7100)
+    assert webpush_registration.quarantined_at is None
+
+    # Meanwhile, it's not pushed to
+    push_sync([(webpush_notification, True)])
+    assert len(httpx_mock.get_requests()) == 2
+
+    # Then a success resets the failures
+    Registration.objects.filter(id=webpush_registration.id).update(backoff_until=now())
+    httpx_mock.add_response(url=endpoint, status_code=201)
+    push_sync([(webpush_notification, True)])
+    webpush_registration.refresh_from_db()
+    assert webpush_registration.failure_count == 0
+    assert webpush_registration.backoff_until is None
+
+    # A gone registration is quarantined, and not pushed to anymore
+    httpx_mock.add_response(url=endpoint, status_code=410)
+    push_sync([(webpush_notification, True)])
+    webpush_registration.refresh_from_db()
+    assert webpush_registration.quarantined_at is not None
+    push_sync([(webpush_notification, True)])
+    assert len(httpx_mock.get_requests()) == 4
+
+
+@pytest.mark.django_db
+def test_push_webpush_transient_failures_not_quarantined(
+    webpush_notification: Notification,
+    webpush_registration: Registration,
+    httpx_mock: HTTPXMock,
+) -> None:
+    Registration.objects.filter(id=webpush_registration.id).update(failure_count=100)
+    httpx_mock.add_response(url=webpush_registration.subscription["endpoint"], status_code=503)
+
+    push_sync([(webpush_notification, True)])
+
+    webpush_registration.refresh_from_db()
+    assert webpush_registration.failure_count == 101
+    assert webpush_registration.quarantined_at is None
+    assert webpush_registration.backoff_until is not None
+    assert webpush_registration.backoff_until <= now() + health.BACKOFF_MAX
+
+
+@pytest.mark.django_db
+def test_push_fcm_health(
+    notification: Notification,
+    mobile_registrations: list[Registration],
+    fcm_send: Mock,
+) -> None:
+    def send(message: messaging.Message) -> None:
+        if message.token == "unregistered-token":
+            raise messaging.UnregisteredError("Requested entity was not found.")
+        if message.token == "token-2":
+            raise exceptions.UnavailableError("The service is currently unavailable.")
+
+    fcm_send.side_effect = send
+
+    push_sync([(notification, True)])
+
+    healthy, unavailable, unregistered = mobile_registrations
+    for registration in mobile_registrations:
+        registration.refresh_from_db()
+    assert healthy.last_success_at is not None
+    assert healthy.failure_count == 0
+    assert unavailable.failure_count == 1
+    assert unavailable.backoff_until is not None
+    assert unavailable.quarantined_at is None
+    assert unregistered.quarantined_at is not None
+
+
+@pytest.mark.django_db
+def test_push_webpush_encryption_pool(
+    notification: Notification,
+    user: User,
+    webpushsubscription: dict[str, Any],
+    httpx_mock: HTTPXMock,
+    settings,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    settings.PUSH_ENCRYPTION_POOL_THRESHOLD = 3
+    settings.PUSH_ENCRYPTION_WORKERS = 2
+    for index in range(3):
+        endpoint = f"https://example.com/{index}"
+        Registration.objects.create(
+            user=user, subscription={**webpushsubscription, "endpoint": endpoint}
+        )
+        httpx_mock.add_response(url=endpoint, status_code=201)
+    encrypt_many = Mock(wraps=encryption.encrypt_many)
+    monkeypatch.setattr("ami.notification.push.encryption.encrypt_many", encrypt_many)
+
+    try:
+        push_sync([(notification, True)])
+    finally:
+        encryption.shutdown_executor()
+
+    encrypt_many.assert_called_once()
+    requests = httpx_mock.get_requests()
+    assert sorted(str(request.url) for request in requests) == [
+        f"https://example.com/{index}" for index in range(3)
+    ]
+    for request in requests:
+        assert request.headers["content-encoding"] == "aes128gcm"
+        assert request.headers["authorization"].startswith("vapid ")
+        assert request.content
+
+
+@pytest.mark.django_db
+def test_push_fake_server_gone_devices(
+    notification: Notification, user: User, webpushsubscription: dict[str, Any], settings
+) -> None:
+    server = FakePushServer(gone_rate=1)
+    server.start()
+    settings.FCM_URL = server.fcm_url
+    webpush_registration = Registration.objects.create(
+        user=user, subscription={**webpushsubscription, "endpoint": server.endpoint("device")}
+    )
+    mobile_registration = Registration.objects.create(
+        user=user,
+        subscription={
+            "app_version": "1.0",
+            "device_id": "device",
+            "fcm_token": "token",
+            "model": "model",
+            "platform": "android",
+        },
+    )
+
+    try:
+        push_sync([(notification, True)])
+    finally:
+        server.stop()
+
+    assert server.statuses == {404: 1, 410: 1}
+    for registration in [webpush_registration, mobile_registration]:
+        registration.refresh_from_db()
+        assert registration.quarantined_at is not None
+
+
+@pytest.mark.django_db(transaction=True)
+async def test_asgi_lifespan_closes_push_resources() -> None:
+    from ami.asgi import lifespan
+    from ami.utils.httpx import httpxSharedAsyncClient
+
+    messages = [{"type": "lifespan.shutdown"}, {"type": "lifespan.startup"}]
+    sent = []
+    client = None
+
+    async def receive():
+        nonlocal client
+        if messages[-1]["type"] == "lifespan.shutdown":
+            client = httpxSharedAsyncClient()
+            encryption.get_executor()
+        return messages.pop()
+
+    async def send(message):
+        sent.append(message["type"])
+
+    await lifespan({"type": "lifespan"}, receive, send)
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+    assert client is not None and client.is_closed
+    assert encryption._executor is None
@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.tasks import TaskResultStatus  # type: ignore[import-untyped]
+from django_tasks_db.models import DBTaskResult
+from pytest_httpx import HTTPXMock
+
+from ami.notification.lanes import Lane, in_lane
+from ami.notification.models import Broadcast, Notification
+from ami.notification.push_worker import PushWorker
+from ami.notification.tasks import broadcast_notification, push_notification, push_notifications
+from ami.user.models import Registration
+from ami.utils.httpx import close_httpx_shared_async_client
+
+
+def run_worker(worker: PushWorker) -> None:
+    async def run() -> None:
+        try:
+            await worker.run(batch=True)
+        finally:
+            await close_httpx_shared_async_client()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db
+def test_push_worker_runs_push_tasks(
+    webpush_notification: Notification,
+    webpush_registration: Registration,
+    httpx_mock: HTTPXMock,
+) -> None:
+    httpx_mock.add_response(url=webpush_registration.subscription["endpoint"], is_reusable=True)
+    broadcast = Broadcast.objects.create(
+        segment=Broadcast.Segment.FC_HASHES,
+        partner_id="dinum-ami",
+        content_title="Titre",
+        content_body="Message",
+    )
+    single = push_notification.enqueue(str(webpush_notification.id), True)
+    batch = push_notifications.enqueue([(str(webpush_notification.id), True)], str(broadcast.id))
+    not_pushed = push_notification.enqueue(str(webpush_notification.id), False)
+    # Other tasks are left to db_worker
+    other = broadcast_notification.enqueue(str(broadcast.id))
+
+    run_worker(PushWorker("push-worker-test", concurrency=2, interval=0))
+
+    statuses = dict(DBTaskResult.objects.values_list("id", "status"))
+    assert {str(task_id): status for task_id, status in statuses.items()} == {
+        single.id: TaskResultStatus.SUCCESSFUL,
+        batch.id: TaskResultStatus.SUCCESSFUL,
+        not_pushed.id: TaskResultStatus.SUCCESSFUL,
+        other.id: TaskResultStatus.READY,
+    }
+    assert DBTaskResult.objects.get(id=single.id).worker_ids == ["push-worker-test"]
+    assert len(httpx_mock.get_requests()) == 2
+    broadcast.refresh_from_db()
+    assert broadcast.pushed_count == 1
+
+
+@pytest.mark.django_db
+def test_push_worker_failed_task(
+    webpush_notification: Notification,
+    webpush_registration: Registration,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    async def push_batch(*args) -> None:
+        raise ValueError("Unexpected")
+
+    monkeypatch.setattr("ami.notification.push_worker.push_batch", push_batch)
+    result = push_notification.enqueue(str(webpush_notification.id), True)
+
+    run_worker(PushWorker("push-worker-test", interval=0))
+
+    db_task = DBTaskResult.objects.get(id=result.id)
+    assert db_task.status == TaskResultStatus.FAILED
+    assert db_task.exception_class_path == "builtins.ValueError"
+
+
+@pytest.mark.django_db
+def test_push_worker_requeues_unfinished_tasks(
+    webpush_notification: Notification, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    result = push_notification.enqueue(str(webpush_notification.id), True)
+
+    async def run() -> None:
+        started = asyncio.Event()
+
+        async def push_batch(*args) -> None:
+            started.set()
+            await asyncio.sleep(3600)
+
+        monkeypatch.setattr("ami.notification.push_worker.push_batch", push_batch)
+        worker = PushWorker("push-worker-test", interval=0, shutdown_timeout=0.01)
+        running = asyncio.create_task(worker.run())
+        await started.wait()
+        worker.stop()
+        await running
+
+    async_to_sync(run)()
+
+    db_task = DBTaskResult.objects.get(id=result.id)
+    assert db_task.status == TaskResultStatus.READY
+    assert db_task.started_at is None
+    assert db_task.worker_ids == ["push-worker-test"]
+
+
+@pytest.mark.django_db
+def test_push_worker_claims_lanes_by_weight(notification: Notification, settings) -> None:
+    settings.PUSH_LANE_WEIGHTS = {"interactive": 3, "scheduled": 0, "bulk": 1}
+    bulk = [
+        in_lane(push_notification, Lane.BULK).enqueue(str(notification.id), True).id
+        for _ in range(6)
+    ]
+    interactive = [
+        in_lane(push_notification, Lane.INTERACTIVE).enqueue(str(notification.id), True).id
+        for _ in range(4)
+    ]
+    # Push tasks without a lane go with the interactive ones
+    interactive.append(push_notification.enqueue(str(notification.id), True).id)
+    scheduled = in_lane(push_notification, Lane.SCHEDULED).enqueue(str(notification.id), True)
+    worker = PushWorker("push-worker-test")
+
+    def claim(limit: int) -> tuple[int, int]:
+        claimed = {str(db_task.id) for db_task in worker.claim(limit)}
+        return len(claimed & set(interactive)), len(claimed & set(bulk))
+
+    assert claim(4) == (3, 1)
+    # The share of the interactive lane, without enough ready tasks, goes to the bulk lane
+    assert claim(6) == (2, 4)
+    # A lane without weight isn't claimed
+    assert claim(6) == (0, 1)
+    assert DBTaskResult.objects.get(id=scheduled.id).status == TaskResultStatus.READY
@@ -0,0 +1,178 @@
+import datetime
+
+import pytest
+from django.utils.timezone import now
+from pytest_httpx import HTTPXMock
+
+from ami.notification.models import Notification, PushDeadLetter
+from ami.notification.push import push_sync
+from ami.notification.retries import RETRY_MAX, retry_delay
+from ami.notification.tasks import retry_push_delivery
+from ami.user.models import Registration
+from ami.utils.httpx import ConnectError
+
+
+def test_retry_delay() -> None:
+    assert datetime.timedelta(seconds=15) <= retry_delay(1) <= datetime.timedelta(seconds=30)
+    assert datetime.timedelta(seconds=60) <= retry_delay(3) <= datetime.timedelta(seconds=120)
+    assert RETRY_MAX / 2 <= retry_delay(20) <= RETRY_MAX
+    assert retry_delay(1, retry_after=600) == datetime.timedelta(seconds=600)
+
+
+@pytest.mark.django_db
+def test_push_transient_failure_retried(
+    webpush_notification: Notification,
+    webpush_registration: Registration,
+    httpx_mock: HTTPXMock,
+    deferred_tasks: list,
+) -> None:
+    httpx_mock.add_response(
+        url=webpush_registration.subscription["endpoint"],
+        status_code=503,
+        headers={"Retry-After": "600"},
+    )
+
+    push_sync([(webpush_notification, True)])
+
+    [result] = deferred_tasks
+    assert result.task.func == retry_push_delivery.func
+    assert result.args == [str(webpush_notification.id), str(webpush_registration.id), 2]
+    assert result.task.run_after >= now() + datetime.timedelta(seconds=590)
+
+
+@pytest.mark.django_db
+def test_push_network_error_retried(
+    webpush_notification: Notification,
+    webpush_registration: Registration,
+    httpx_mock: HTTPXMock,
+    deferred_tasks: list,
+) -> None:
+    httpx_mock.add_exception(
+        ConnectError("Connection refused"),
+        url=webpush_registration.subscription["endpoint"],
+    )
+
+    push_sync([(webpush_notification, True)])
+
+    [result] = deferred_tasks
+    assert result.args == [str(webpush_notification.id), str(webpush_registration.id), 2]
+
+
+@pytest.mark.django_db
+def test_push_backed_off_deferred(
+    webpush_notification: Notification,
+    webpush_registration: Registration,
+    httpx_mock: HTTPXMock,
+    deferred_tasks: list,
+) -> None:
+    backoff_until = now() + datetime.timedelta(minutes=10)
+    Registration.objects.filter(id=webpush_registration.id).update(backoff_until=backoff_until)
+
+    push_sync([(webpush_notification, True)])
+
+    assert httpx_mock.get_request() is None
+    [result] = deferred_tasks
+    assert result.args == [str(webpush_notification.id), str(webpush_registration.id), 1]
+    assert result.task.run_after == backoff_until
+
+
+@pytest.mark.django_db
+def test_push_retry_not_scheduled_after_valid_until(
+    webpush_notification: Notification,
+    webpush_registration: Registration,
+    httpx_mock: HTTPXMock,
+    deferred_tasks: list,
+) -> None:
+    webpush_notification.valid_until = now() + datetime.timedelta(seconds=60)
+    webpush_notification.save()
+    httpx_mock.add_response(
+        url=webpush_registration.subscription["endpoint"],
+        status_code=429,
+        headers={"Retry-After": "600"},
+    )
+
+    push_sync([(webpush_notification, True)])
+
+    assert deferred_tasks == []
+    assert not PushDeadLetter.objects.exists()
+
+
+@pytest.mark.django_db
+def test_retry_push_delivery(
+    webpush_notification: Notification,
+    webpush_registration: Registration,
+    httpx_mock: HTTPXMock,
+    deferred_tasks: list,
+) -> None:
+    httpx_mock.add_response(url=webpush_registration.subscription["endpoint"], status_code=201)
+
+    retry_push_delivery.call(str(webpush_notification.id), str(webpush_registration.id), 2)
+
+    assert len(httpx_mock.get_requests()) == 1
+    assert deferred_tasks == []
+    webpush_registration.refresh_from_db()
+    assert webpush_registration.last_success_at is not None
+
+
+@pytest.mark.django_db
+def test_retry_push_delivery_failing_again(
+    webpush_notification: Notification,
+    webpush_registration: Registration,
+    httpx_mock: HTTPXMock,
+    deferred_tasks: list,
+) -> None:
+    httpx_mock.add_response(url=webpush_registration.subscription["endpoint"], status_code=500)
+
+    retry_push_delivery.call(str(webpush_notification.id), str(webpush_registration.id), 2)
+
+    [result] = deferred_tasks
+    assert result.args == [str(webpush_notification.id), str(webpush_registration.id), 3]
+
+
+@pytest.mark.django_db
+def test_retry_push_delivery_dead_letter(
+    webpush_notification: Notification,
+    webpush_registration: Registration,
+    httpx_mock: HTTPXMock,
+    deferred_tasks: list,
+    settings,
+) -> None:
+    settings.PUSH_MAX_ATTEMPTS = 3
+    httpx_mock.add_response(url=webpush_registration.subscription["endpoint"], status_code=502)
+
+    retry_push_delivery.call(str(webpush_notification.id), str(webpush_registration.id), 3)
+
+    assert deferred_tasks == []
+    dead_letter = PushDeadLetter.objects.get()
+    assert dead_letter.notification_id == webpush_notification.id
+    assert dead_letter.registration_id == webpush_registration.id
+    assert dead_letter.attempts == 3
+    assert dead_letter.last_error == "HTTP 502"
+
+
+@pytest.mark.django_db
+def test_retry_push_delivery_quarantined_registration(
+    webpush_notification: Notification,
+    webpush_registration: Registration,
+    httpx_mock: HTTPXMock,
+) -> None:
+    webpush_registration.quarantined_at = now()
+    webpush_registration.save()
+
+    retry_push_delivery.call(str(webpush_notification.id), str(webpush_registration.id), 2)
+
+    assert httpx_mock.get_request() is None
+
+
+@pytest.mark.django_db
+def test_retry_push_delivery_expired_notification(
+    webpush_notification: Notification,
+    webpush_registration: Registration,
+    httpx_mock: HTTPXMock,
+) -> None:
+    webpush_notification.valid_until = now() - datetime.timedelta(seconds=1)
+    webpush_notification.save()
+
+    retry_push_delivery.call(str(webpush_notification.id), str(webpush_registration.id), 2)
+
+    assert httpx_mock.get_request() is None
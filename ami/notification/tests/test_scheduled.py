@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+from django.db import connection
+from django.tasks import TaskResult  # type: ignore[import-untyped]
+from django.utils.timezone import now
+
+from ami.notification import scheduled
+from ami.notification.models import Notification, ScheduledNotification
+from ami.notification.scheduled import publish_due
+from ami.user.models import User
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_publishers(
+    user: User, deferred_tasks: list[TaskResult], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    for index in range(6):
+        ScheduledNotification.objects.create(
+            user_id=user.id,
+            content_title=f"title {index}",
+            content_body="body",
+            content_icon="icon",
+            reference=f"reference {index}",
+            scheduled_at=now(),
+        )
+    claimed = threading.Event()
+    release = threading.Event()
+    publish_batch = scheduled.publish_batch
+
+    def slow_publish_batch(batch: list[ScheduledNotification]) -> list[Notification]:
+        if threading.current_thread().name == "slow":
+            claimed.set()
+            release.wait(timeout=5)
+        return publish_batch(batch)
+
+    monkeypatch.setattr("ami.notification.scheduled.publish_batch", slow_publish_batch)
+    published: dict[str, list[int]] = {}
+
+    def publish() -> None:
+        try:
+            name = threading.current_thread().name
+            published[name] = [batch.count for batch in publish_due(batch_size=2)]
+        finally:
+            connection.close()
+
+    slow = threading.Thread(target=publish, name="slow")
+    slow.start()
+    try:
+        assert claimed.wait(timeout=5)
+        # Another publisher skips the batch being published, and publishes the others
+        other = threading.Thread(target=publish, name="other")
+        other.start()
+        other.join(timeout=10)
+    finally:
+        release.set()
+        slow.join(timeout=10)
+
+    assert published == {"slow": [2], "other": [2, 2]}
+    titles = Notification.objects.values_list("content_title", flat=True)
+    assert sorted(titles) == [f"title {index}" for index in range(6)]
+    assert not ScheduledNotification.objects.filter(sent_at__isnull=True).exists()
+    assert len(deferred_tasks) == 3
@@ -0,0 +1,100 @@
+import datetime
+import threading
+import time
+
+import pytest
+from django.db import connection
+from django.tasks import TaskResult  # type: ignore[import-untyped]
+from django.utils.timezone import now
+
+from ami.notification.models import Notification, ScheduledNotification
+from ami.notification.scheduler import SCHEDULED_NOTIFICATIONS_CHANNEL, Scheduler
+from ami.user.models import User
+
+
+def schedule(user: User, reference: str, scheduled_at: datetime.datetime) -> ScheduledNotification:
+    return ScheduledNotification.objects.create(
+        user_id=user.id,
+        content_title=f"title {reference}",
+        content_body="body",
+        content_icon="icon",
+        reference=reference,
+        scheduled_at=scheduled_at,
+    )
+
+
+@pytest.mark.django_db
+def test_scheduler_loads_incrementally(user: User) -> None:
+    due = schedule(user, "due", now() - datetime.timedelta(minutes=1))
+    soon = schedule(user, "soon", now() + datetime.timedelta(minutes=10))
+    schedule(user, "later", now() + datetime.timedelta(hours=2))
+    sent = schedule(user, "sent", now())
+    ScheduledNotification.objects.filter(id=sent.id).update(sent_at=now())
+
+    scheduler = Scheduler(horizon=3600)
+    scheduler.load()
+    assert scheduler.heap == [due.scheduled_at, soon.scheduled_at]
+    # Beyond the horizon, loaded later
+    scheduler.add(now() + datetime.timedelta(hours=2))
+    assert len(scheduler.heap) == 2
+
+    scheduler = Scheduler(horizon=3600, max_loaded=1)
+    scheduler.load()
+    assert scheduler.heap == [due.scheduled_at]
+    assert scheduler.loaded_until == due.scheduled_at
+    assert scheduler.reload_at == due.scheduled_at
+
+
+@pytest.mark.django_db
+def test_scheduler_publishes_due(user: User, deferred_tasks: list[TaskResult]) -> None:
+    schedule(user, "due", now() - datetime.timedelta(seconds=1))
+    soon = schedule(user, "soon", now() + datetime.timedelta(minutes=10))
+    scheduler = Scheduler()
+    scheduler.load()
+
+    assert scheduler.publish() == 1
+    assert list(Notification.objects.values_list("content_title", flat=True)) == ["title due"]
+    assert scheduler.heap == [soon.scheduled_at]
+    # Until the next reload, before the next scheduled notification is due
+    assert 0 < scheduler.timeout() <= scheduler.poll_interval
+    # Nothing due anymore
+    assert scheduler.publish() == 0
+
+    # Restarted, it doesn't publish again
+    scheduler = Scheduler()
+    scheduler.load()
+    assert scheduler.heap == [soon.scheduled_at]
+    assert Notification.objects.count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_scheduler_is_woken_up(user: User, deferred_tasks: list[TaskResult]) -> None:
+    scheduler = Scheduler(poll_interval=30)
+
+    def run() -> None:
+        try:
+            scheduler.run()
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    try:
+        # Let the scheduler go idle first
+        time.sleep(0.5)
+        scheduled_notification = schedule(user, "soon", now() + datetime.timedelta(seconds=0.5))
+        deadline = time.monotonic() + 5
+        while scheduled_notification.sent_at is None:
+            assert time.monotonic() < deadline, "The scheduler didn't publish in time"
+            time.sleep(0.05)
+            scheduled_notification.refresh_from_db()
+    finally:
+        scheduler.running = False
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [SCHEDULED_NOTIFICATIONS_CHANNEL, "0"])
+        thread.join(timeout=10)
+    assert not thread.is_alive()
+
+    delay = scheduled_notification.sent_at - scheduled_notification.scheduled_at
+    assert datetime.timedelta(0) <= delay < datetime.timedelta(seconds=1)
+    assert len(deferred_tasks) == 1
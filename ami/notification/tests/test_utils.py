@@ -0,0 +1,30 @@
+import datetime
+import uuid
+
+from ami.notification.utils import build_event_idempotency_key
+
+
+def test_build_event_idempotency_key() -> None:
+    user_id = uuid.uuid4()
+    data = {
+        "content_title": "title",
+        "content_body": "body",
+        "event_date": datetime.datetime(2025, 11, 27, 10, 55, tzinfo=datetime.timezone.utc),
+        "try_push": True,
+    }
+    key = build_event_idempotency_key(user_id, "psl", data)
+    assert len(key) == 64
+
+    # Same instant in another timezone, explicit `None` values and string ids are canonicalised.
+    paris = datetime.timezone(datetime.timedelta(hours=1))
+    same_data = {
+        **data,
+        "event_date": datetime.datetime(2025, 11, 27, 11, 55, tzinfo=paris),
+        "content_icon": None,
+    }
+    assert build_event_idempotency_key(str(user_id), "psl", same_data) == key
+
+    assert build_event_idempotency_key(uuid.uuid4(), "psl", data) != key
+    assert build_event_idempotency_key(user_id, "dinum-dn", data) != key
+    assert build_event_idempotency_key(user_id, "psl", {**data, "try_push": False}) != key
+    assert build_event_idempotency_key(user_id, "psl", {**data, "content_icon": "foo"}) != key
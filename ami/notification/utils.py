@@ -0,0 +1,47 @@
+import datetime
+import hashlib
+import json
+import uuid
+
+# Notification fields that can be set by a partner event, and thus identify it.
+EVENT_FIELDS = [
+    "content_title",
+    "content_body",
+    "content_private_body",
+    "content_subheading",
+    "content_icon",
+    "content_link",
+    "item_type",
+    "item_id",
+    "item_parent_partner_id",
+    "item_parent_type",
+    "item_parent_id",
+    "item_status_label",
+    "item_generic_status",
+    "item_canal",
+    "item_milestone_start_date",
+    "item_milestone_end_date",
+    "event_date",
+    "valid_until",
+    "try_push",
+]
+
+
+def _canonical_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.astimezone(datetime.timezone.utc).isoformat()
+    return value
+
+
+def build_event_idempotency_key(user_id: uuid.UUID | str, partner_id: str, data: dict) -> str:
+    """Deterministic digest of an event: same recipient, partner and payload give the same key.
+
+    Missing fields are considered as `None`, which is the value they're stored with.
+    """
+    canonical = {
+        "user_id": str(user_id),
+        "partner_id": partner_id,
+        **{field: _canonical_value(data.get(field)) for field in EVENT_FIELDS},
+    }
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
@@ -10,6 +10,8 @@ class Partner:
     secret: str
     icon: str
     followup_from_notifications: bool = True
+    # accept events with a "202 Accepted" and ingest them later, see `ami.notification.inbox`
+    async_ingestion: bool = False
 
 
 partners: dict[str, Partner] = {
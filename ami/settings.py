@@ -82,7 +82,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "ami.utils.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -163,6 +163,35 @@ DATABASES = {
     "data_ware_house": {**data_ware_house, "TEST": {"NAME": "test_data_ware_house"}},
 }
 
+# asyncpg pool for the hot async queries, opened by the ASGI lifespan, see `ami.utils.async_db`
+ASYNCPG_POOL_MIN_SIZE = int(CONFIG.get("ASYNCPG_POOL_MIN_SIZE", 2))
+ASYNCPG_POOL_MAX_SIZE = int(CONFIG.get("ASYNCPG_POOL_MAX_SIZE", 10))
+
+# Per worker cache resolving FC hashes to users, see `ami.user.cache`
+USER_CACHE_MAX_SIZE = int(CONFIG.get("USER_CACHE_MAX_SIZE", 10_000))
+USER_CACHE_TTL = int(CONFIG.get("USER_CACHE_TTL", 60))
+
+# Push delivery health of the registrations, see `ami.notification.health`
+REGISTRATION_QUARANTINE_DAYS = int(CONFIG.get("REGISTRATION_QUARANTINE_DAYS", 30))
+
+# Push delivery retries, see `ami.notification.retries`
+PUSH_MAX_ATTEMPTS = int(CONFIG.get("PUSH_MAX_ATTEMPTS", 8))
+
+# Limits and circuit breaker for each push service host, see `ami.notification.hosts`
+PUSH_HOST_TIMEOUT = float(CONFIG.get("PUSH_HOST_TIMEOUT", 10))
+PUSH_HOST_MAX_IN_FLIGHT = int(CONFIG.get("PUSH_HOST_MAX_IN_FLIGHT", 50))
+PUSH_HOST_MAX_RATE = float(CONFIG.get("PUSH_HOST_MAX_RATE", 200))  # requests/s, 0: unlimited
+PUSH_CIRCUIT_FAILURE_THRESHOLD = int(CONFIG.get("PUSH_CIRCUIT_FAILURE_THRESHOLD", 5))
+PUSH_CIRCUIT_OPEN_SECONDS = float(CONFIG.get("PUSH_CIRCUIT_OPEN_SECONDS", 30))
+
+# Web push encryption in a process pool, see `ami.notification.encryption`
+PUSH_ENCRYPTION_POOL_THRESHOLD = int(CONFIG.get("PUSH_ENCRYPTION_POOL_THRESHOLD", 200))  # 0: never
+PUSH_ENCRYPTION_WORKERS = int(CONFIG.get("PUSH_ENCRYPTION_WORKERS", os.cpu_count() or 1))
+
+# Batched push tasks worker, see `ami.notification.push_worker`
+PUSH_WORKER_CONCURRENCY = int(CONFIG.get("PUSH_WORKER_CONCURRENCY", 20))  # push tasks run at once
+PUSH_WORKER_SHUTDOWN_TIMEOUT = float(CONFIG.get("PUSH_WORKER_SHUTDOWN_TIMEOUT", 20))  # seconds
+
 if (
     "staging-pr" not in CONFIG.get("PUBLIC_APP_URL", "")
     or CONFIG.get("FORCE_DATA_WAREHOUSE_ROUTER") == "true"
@@ -183,7 +212,20 @@ LOGOUT_REDIRECT_URL = "/agent-admin/"
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
 # Tasks
-TASKS = {"default": {"BACKEND": "django_tasks_db.DatabaseBackend"}}
+# The push tasks are enqueued in priority lanes, see `ami.notification.lanes`
+TASK_QUEUES = ["default", "interactive", "scheduled", "bulk"]
+TASKS = {"default": {"BACKEND": "django_tasks_db.DatabaseBackend", "QUEUES": TASK_QUEUES}}
+PUSH_LANE_WEIGHTS = {
+    "interactive": int(CONFIG.get("PUSH_LANE_WEIGHT_INTERACTIVE", 6)),
+    "scheduled": int(CONFIG.get("PUSH_LANE_WEIGHT_SCHEDULED", 3)),
+    "bulk": int(CONFIG.get("PUSH_LANE_WEIGHT_BULK", 1)),
+}
+# The workers are woken up by the new tasks, and only poll as a fallback, see
+# `ami.utils.task_wakeup`
+TASK_WORKER_POLL_INTERVAL = float(CONFIG.get("TASK_WORKER_POLL_INTERVAL", 30))  # seconds
+# Scheduled notifications loaded by the scheduler, see `ami.notification.scheduler`
+SCHEDULER_HORIZON = float(CONFIG.get("SCHEDULER_HORIZON", 3600))  # seconds ahead
+SCHEDULER_MAX_LOADED = int(CONFIG.get("SCHEDULER_MAX_LOADED", 10_000))
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -382,6 +424,8 @@ ANDROID_CERT_FINGERPRINTS = (
 
 # Credentials for firebase
 GOOGLE_APPLICATION_CREDENTIALS = CONFIG.get("GOOGLE_APPLICATION_CREDENTIALS", "")
+# Send URL of a local fake FCM server, to use instead of Google's one (tests and benchmarks)
+FCM_URL = CONFIG.get("FCM_URL", "")
 
 # Forms & DSFR
 FORM_RENDERER = "django.forms.renderers.TemplatesSetting"
@@ -394,7 +438,7 @@ if DEBUG:
     ]
 
 if sys.argv and sys.argv[0].endswith("pytest"):
-    MIDDLEWARE = [m for m in MIDDLEWARE if m != "whitenoise.middleware.WhiteNoiseMiddleware"]
+    MIDDLEWARE = [m for m in MIDDLEWARE if m != "ami.utils.middleware.WhiteNoiseMiddleware"]
 
     STORAGES["staticfiles"] = {
         "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
@@ -0,0 +1,156 @@
+"""Local stand-in for the push services, for tests and benchmarks.
+
+It answers the pushes to any `<url>/push/<name>` web push endpoint, and the FCM v1 send API at
+`fcm_url`, with a configurable latency, and records them. Answers are successes, unless:
+
+- the FCM token starts with "unregistered", which is answered as an unregistered device;
+- a random `gone_rate` of the pushes is answered as gone devices (410, or unregistered);
+- a random `error_rate` of the pushes is answered as an unavailable service (503).
+"""
+
+import base64
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+FCM_PATH = "/v1/projects/ami/messages:send"
+
+
+def webpush_subscription(endpoint: str) -> dict:
+    """A web push subscription to `endpoint`, with new valid keys."""
+    public_key = ec.generate_private_key(ec.SECP256R1()).public_key()
+    p256dh = public_key.public_bytes(Encoding.X962, PublicFormat.UncompressedPoint)
+    return {
+        "endpoint": endpoint,
+        "keys": {
+            "auth": base64.urlsafe_b64encode(os.urandom(16)).decode().rstrip("="),
+            "p256dh": base64.urlsafe_b64encode(p256dh).decode().rstrip("="),
+        },
+    }
+
+
+def fcm_error(status: int, code: str, fcm_error_code: str | None = None) -> dict:
+    error: dict = {"code": status, "message": code, "status": code}
+    if fcm_error_code is not None:
+        error["details"] = [
+            {
+                "@type": "type.googleapis.com/google.firebase.fcm.v1.FcmError",
+                "errorCode": fcm_error_code,
+            }
+        ]
+    return {"error": error}
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Many concurrent pushes connect at once
+    request_queue_size = 1024
+
+
+class FakePushServer:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        status: int = 201,
+        error_rate: float = 0.0,
+        gone_rate: float = 0.0,
+        seed: int | None = None,
+    ) -> None:
+        self.latency = latency
+        self.status = status
+        self.error_rate = error_rate
+        self.gone_rate = gone_rate
+        # Web push request paths, and FCM tokens, in the order received
+        self.requests: list[str] = []
+        self.fcm_tokens: list[str] = []
+        # `time.perf_counter()` of the web push requests received
+        self.received_at: list[float] = []
+        # Statuses answered
+        self.statuses: Counter[int] = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _HTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    @property
+    def fcm_url(self) -> str:
+        """The FCM send URL, see `FCM_URL` setting."""
+        return f"{self.url}{FCM_PATH}"
+
+    def endpoint(self, name: str) -> str:
+        return f"{self.url}/push/{name}"
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _draw(self) -> str | None:
+        """Draw whether the next push fails: "gone", "error", or None."""
+        with self._lock:
+            draw = self._random.random()
+        if draw < self.gone_rate:
+            return "gone"
+        if draw < self.gone_rate + self.error_rate:
+            return "error"
+        return None
+
+    def _answer_webpush(self, path: str) -> tuple[int, dict | None]:
+        self.received_at.append(time.perf_counter())
+        self.requests.append(path)
+        failure = self._draw()
+        if failure == "gone":
+            return 410, None
+        if failure == "error":
+            return 503, None
+        return self.status, None
+
+    def _answer_fcm(self, body: dict) -> tuple[int, dict | None]:
+        token = body["message"]["token"]
+        self.fcm_tokens.append(token)
+        failure = self._draw()
+        if token.startswith("unregistered") or failure == "gone":
+            return 404, fcm_error(404, "NOT_FOUND", "UNREGISTERED")
+        if failure == "error":
+            return 503, fcm_error(503, "UNAVAILABLE")
+        return 200, {"name": f"projects/ami/messages/{len(self.fcm_tokens)}"}
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                content = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path == FCM_PATH:
+                    status, response = server._answer_fcm(json.loads(content))
+                else:
+                    status, response = server._answer_webpush(self.path)
+                if server.latency:
+                    time.sleep(server.latency)
+                body = b"" if response is None else json.dumps(response).encode()
+                with server._lock:
+                    server.statuses[status] += 1
+                self.send_response(status)
+                if response is not None:
+                    self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+        return Handler
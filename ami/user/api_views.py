@@ -1,8 +1,6 @@
 import uuid
 from typing import cast
 
-from django.db import transaction
-from django.db.models import QuerySet
 from django.shortcuts import get_object_or_404
 from drf_spectacular.utils import PolymorphicProxySerializer, extend_schema, inline_serializer
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
@@ -13,6 +11,7 @@ from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED
 from ami.authentication.decorators import ami_login_required
 
 from ..partner.auth import IsPartnerAuthenticated, PartnerBasicAuthentication
+from .cache import resolve_user
 from .models import Consent, Registration
 from .serializers import (
     MobileAppSubscriptionSerializer,
@@ -51,35 +50,11 @@ def registrations(request: Request) -> Response:
     data: dict = cast(dict, serializer.validated_data)
     subscription: dict = data["subscription"]
 
-    if "device_id" in subscription:
-        with transaction.atomic():
-            # In case of a mobile app subscription, check if we already have registration(s) for this device.
-            existing_registrations: QuerySet[Registration] = Registration.objects.filter(
-                subscription__device_id=subscription["device_id"],
-                user=request.ami_user,
-            )
-            registrations_exists = existing_registrations.exists()
-            status = HTTP_200_OK if registrations_exists else HTTP_201_CREATED
-            if registrations_exists:
-                # and if so, delete them: we only want to keep the latest registration for a given device.
-                existing_registrations.delete()
-            registration: Registration = Registration.objects.create(
-                user=request.ami_user, subscription=subscription
-            )
-        return Response(RegistrationSerializer(registration).data, status=status)
-
-    try:
-        existing_registration: Registration = Registration.objects.get(
-            subscription=subscription, user=request.ami_user
-        )
-        return Response(RegistrationSerializer(existing_registration).data)
-    except Registration.DoesNotExist:
-        pass
-
-    registration: Registration = Registration.objects.create(
-        user=request.ami_user, subscription=subscription
+    registration, created = Registration.upsert(request.ami_user, subscription)
+    return Response(
+        RegistrationSerializer(registration).data,
+        status=HTTP_201_CREATED if created else HTTP_200_OK,
     )
-    return Response(RegistrationSerializer(registration).data, status=HTTP_201_CREATED)
 
 
 @api_view(["DELETE"])
@@ -101,7 +76,10 @@ def unregister(
 @permission_classes([IsPartnerAuthenticated])
 def get_consent(request: Request, fc_hash: str) -> Response:
     partner_id = request.ami_partner.id
-    consent = Consent.objects.filter(user__fc_hash=fc_hash, partner_id=partner_id).first()
+    user = resolve_user(fc_hash)
+    consent = None
+    if user is not None:
+        consent = Consent.objects.filter(user_id=user.id, partner_id=partner_id).first()
 
     if consent is None or consent.consent_datetime is None:
         return Response({"consent_datetime": "null"}, status=404)
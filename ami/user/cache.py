@@ -0,0 +1,118 @@
+"""In-process cache resolving FC hashes to users, for the partner APIs.
+
+Partners send many events for the same few users, each one needing the user id and whether
+the user ever logged in. The cache is local to each worker process: entries are invalidated
+by the worker updating or deleting the user, and expire after `USER_CACHE_TTL` seconds in
+the other ones. Meanwhile, the notifications of a deleted user fail with an `IntegrityError`:
+the ingestion then invalidates the entry and resolves the user again, see
+`ami.notification.services`.
+"""
+
+import datetime
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import NamedTuple
+
+from django.conf import settings
+
+from ami.user.models import User
+from ami.utils import async_db
+
+
+class CachedUser(NamedTuple):
+    id: uuid.UUID
+    last_logged_in: datetime.datetime | None
+
+
+class UserCache:
+    """Bounded LRU mapping FC hashes to `CachedUser`, with a TTL."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, CachedUser]] = OrderedDict()
+        # Sync views run in several threads of the same process
+        self._lock = threading.Lock()
+
+    def get(self, fc_hash: str) -> CachedUser | None:
+        with self._lock:
+            entry = self._entries.get(fc_hash)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[fc_hash]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(fc_hash)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, fc_hash: str, user: User | CachedUser) -> CachedUser:
+        cached = CachedUser(user.id, user.last_logged_in)
+        with self._lock:
+            self._entries[fc_hash] = (time.monotonic() + self.ttl, cached)
+            self._entries.move_to_end(fc_hash)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return cached
+
+    def invalidate(self, fc_hash: str) -> None:
+        with self._lock:
+            self._entries.pop(fc_hash, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+user_cache = UserCache(max_size=settings.USER_CACHE_MAX_SIZE, ttl=settings.USER_CACHE_TTL)
+
+
+def resolve_user(fc_hash: str) -> CachedUser | None:
+    cached = user_cache.get(fc_hash)
+    if cached is None:
+        user = User.objects.filter(fc_hash=fc_hash).only("id", "last_logged_in").first()
+        if user is not None:
+            cached = user_cache.set(fc_hash, user)
+    return cached
+
+
+def resolve_users(fc_hashes: set[str]) -> dict[str, CachedUser]:
+    """Resolve several FC hashes at once, querying the missing ones in a single query."""
+    users: dict[str, CachedUser] = {}
+    missing = set()
+    for fc_hash in fc_hashes:
+        cached = user_cache.get(fc_hash)
+        if cached is None:
+            missing.add(fc_hash)
+        else:
+            users[fc_hash] = cached
+    if missing:
+        for user in User.objects.filter(fc_hash__in=missing).only(
+            "id", "fc_hash", "last_logged_in"
+        ):
+            users[user.fc_hash] = user_cache.set(user.fc_hash, user)
+    return users
+
+
+async def aresolve_user(fc_hash: str) -> CachedUser | None:
+    cached = user_cache.get(fc_hash)
+    if cached is None:
+        user = await async_db.get_user_by_fc_hash(fc_hash)
+        if user is not None:
+            cached = user_cache.set(fc_hash, user)
+    return cached
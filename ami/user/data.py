@@ -11,6 +11,7 @@ from django.utils.timezone import now
 from ami.authentication.exception import FCError
 from ami.authentication.schemas import data_providers
 from ami.notification.models import ScheduledNotification
+from ami.user.cache import user_cache
 from ami.user.models import User
 from ami.user.utils import build_fc_hash
 from ami.utils.httpx import AsyncClient, Response
@@ -58,6 +59,7 @@ async def get_fc_userinfo(
     else:
         create_welcome = user.last_logged_in is None
         await User.objects.filter(pk=user.pk).aupdate(last_logged_in=now())
+        user_cache.invalidate(fc_hash)
 
     if create_welcome:
         await ScheduledNotification.acreate_welcome_scheduled_notification(user)
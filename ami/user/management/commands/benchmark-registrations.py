@@ -0,0 +1,109 @@
+import random
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from ami.user.models import Registration, User
+from ami.utils.benchmark import Timings
+
+# Half web push, half mobile app registrations, for each benchmark user
+REGISTRATIONS_PER_USER = 10
+
+sql_insert_users = """
+INSERT INTO ami_user (id, fc_hash, created_at, updated_at)
+SELECT gen_random_uuid(), %(prefix)s || n, now(), now() FROM generate_series(1, %(users)s) AS n
+"""
+
+sql_insert_registrations = """
+INSERT INTO registration (
+    id, user_id, subscription, kind, endpoint, endpoint_host, device_id, fcm_token,
+    failure_count, created_at, updated_at
+)
+SELECT
+    gen_random_uuid(),
+    u.id,
+    CASE WHEN n %% 2 = 0
+        THEN jsonb_build_object(
+            'endpoint', 'https://push.test/' || u.fc_hash || '/' || n,
+            'keys', jsonb_build_object('auth', 'auth', 'p256dh', 'p256dh')
+        )
+        ELSE jsonb_build_object(
+            'app_version', '1.0', 'device_id', u.fc_hash || '/' || n,
+            'fcm_token', 'token', 'model', 'model', 'platform', 'android'
+        )
+    END,
+    CASE WHEN n %% 2 = 0 THEN 'webpush' ELSE 'mobile' END,
+    CASE WHEN n %% 2 = 0 THEN 'https://push.test/' || u.fc_hash || '/' || n END,
+    CASE WHEN n %% 2 = 0 THEN 'push.test' END,
+    CASE WHEN n %% 2 = 1 THEN u.fc_hash || '/' || n END,
+    CASE WHEN n %% 2 = 1 THEN 'token' END,
+    0, now(), now()
+FROM ami_user AS u CROSS JOIN generate_series(1, %(per_user)s) AS n
+WHERE u.fc_hash LIKE %(prefix)s || '%%'
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the registration of a device which starts again, with many stored "
+        "registrations: the former JSON lookups against the upsert. The benchmark data is "
+        "deleted at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--registrations", type=int, default=1_000_000, help="Stored registrations"
+        )
+        parser.add_argument(
+            "--iterations", type=int, default=500, help="Devices of each kind registered again"
+        )
+
+    def handle(self, *args, registrations: int, iterations: int, **kwargs):
+        prefix = f"benchmark-{uuid.uuid4().hex}-"
+        users = max(registrations // REGISTRATIONS_PER_USER, 1)
+        registrations = users * REGISTRATIONS_PER_USER
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql_insert_users, {"prefix": prefix, "users": users})
+                cursor.execute(
+                    sql_insert_registrations,
+                    {"prefix": prefix, "per_user": REGISTRATIONS_PER_USER},
+                )
+                cursor.execute(f"ANALYZE {Registration._meta.db_table}")
+            sampled = random.sample(range(1, users + 1), min(iterations, users))
+            # A web push and a mobile app registration of each sampled user
+            samples: dict[tuple[uuid.UUID, str], Registration] = {}
+            for registration in Registration.objects.filter(
+                user__fc_hash__in=[f"{prefix}{n}" for n in sampled]
+            ).select_related("user"):
+                samples.setdefault((registration.user_id, registration.kind), registration)
+            self.stdout.write(f"{registrations} registrations stored")
+            for timings in self.run(list(samples.values())):
+                self.stdout.write(timings.summary())
+        finally:
+            Registration.objects.filter(user__fc_hash__startswith=prefix).delete()
+            User.objects.filter(fc_hash__startswith=prefix).delete()
+
+    def run(self, samples: list[Registration]) -> list[Timings]:
+        webpush = [sample for sample in samples if sample.kind == Registration.Kind.WEBPUSH]
+        mobile = [sample for sample in samples if sample.kind == Registration.Kind.MOBILE]
+        json_lookup = Timings("web push: JSON equality lookup")
+        endpoint_upsert = Timings("web push: upsert on endpoint")
+        for sample in webpush:
+            with json_lookup.measure():
+                Registration.objects.filter(
+                    subscription=sample.subscription, user=sample.user
+                ).first()
+            with endpoint_upsert.measure():
+                Registration.upsert(sample.user, sample.subscription)
+        json_path_lookup = Timings("mobile: JSON device_id lookup")
+        device_upsert = Timings("mobile: upsert on device_id")
+        for sample in mobile:
+            with json_path_lookup.measure():
+                Registration.objects.filter(
+                    subscription__device_id=sample.subscription["device_id"], user=sample.user
+                ).exists()
+            with device_upsert.measure():
+                Registration.upsert(sample.user, sample.subscription)
+        return [json_lookup, endpoint_upsert, json_path_lookup, device_upsert]
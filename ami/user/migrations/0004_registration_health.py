@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0003_consent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="registration",
+            name="backoff_until",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="registration",
+            name="failure_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="registration",
+            name="last_failure_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="registration",
+            name="last_success_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="registration",
+            name="quarantined_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,77 @@
+from urllib.parse import urlsplit
+
+from django.db import migrations, models, transaction
+
+CHUNK_SIZE = 2000
+
+
+# Frozen copy of `ami.user.models.subscription_fields` at the time of this migration
+def subscription_fields(subscription):
+    subscription = subscription or {}
+    if "device_id" in subscription:
+        kind = "mobile"
+    elif "endpoint" in subscription:
+        kind = "webpush"
+    else:
+        kind = None
+    endpoint = subscription.get("endpoint")
+    return {
+        "kind": kind,
+        "endpoint_host": urlsplit(endpoint).hostname if isinstance(endpoint, str) else None,
+        "device_id": subscription.get("device_id"),
+        "fcm_token": subscription.get("fcm_token"),
+    }
+
+
+def backfill_subscription_fields(apps, schema_editor):
+    Registration = apps.get_model("user", "Registration")
+    queryset = Registration.objects.filter(kind__isnull=True).order_by("pk")
+    last_pk = None
+    while True:
+        chunk_queryset = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        chunk = list(chunk_queryset.only("pk", "subscription")[:CHUNK_SIZE])
+        if not chunk:
+            break
+        for registration in chunk:
+            for field, value in subscription_fields(registration.subscription).items():
+                setattr(registration, field, value)
+        # Commit each chunk on its own, so that an interrupted backfill can be resumed.
+        with transaction.atomic():
+            Registration.objects.bulk_update(
+                chunk, ["kind", "endpoint_host", "device_id", "fcm_token"]
+            )
+        last_pk = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("user", "0004_registration_health"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="registration",
+            name="device_id",
+            field=models.CharField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="registration",
+            name="endpoint_host",
+            field=models.CharField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="registration",
+            name="fcm_token",
+            field=models.CharField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="registration",
+            name="kind",
+            field=models.CharField(
+                blank=True, choices=[("webpush", "Webpush"), ("mobile", "Mobile")], null=True
+            ),
+        ),
+        migrations.RunPython(backfill_subscription_fields, reverse_code=migrations.RunPython.noop),
+    ]
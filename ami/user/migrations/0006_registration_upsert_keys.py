@@ -0,0 +1,73 @@
+from django.db import migrations, models, transaction
+
+CHUNK_SIZE = 2000
+
+# Registrations of a same device, except its most recent one, that the upsert keys forbid.
+sql_duplicates = """
+SELECT id FROM (
+    SELECT id, row_number() OVER (
+        PARTITION BY user_id, {key} ORDER BY updated_at DESC, id
+    ) AS position
+    FROM registration
+    WHERE {key} IS NOT NULL
+) AS ranked
+WHERE position > 1
+"""
+
+
+def backfill_endpoint(apps, schema_editor):
+    Registration = apps.get_model("user", "Registration")
+    queryset = Registration.objects.filter(kind="webpush", endpoint__isnull=True).order_by("pk")
+    last_pk = None
+    while True:
+        chunk_queryset = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        chunk = list(chunk_queryset.only("pk", "subscription")[:CHUNK_SIZE])
+        if not chunk:
+            break
+        for registration in chunk:
+            registration.endpoint = registration.subscription["endpoint"]
+        # Commit each chunk on its own, so that an interrupted backfill can be resumed.
+        with transaction.atomic():
+            Registration.objects.bulk_update(chunk, ["endpoint"])
+        last_pk = chunk[-1].pk
+
+
+def delete_duplicates(apps, schema_editor):
+    Registration = apps.get_model("user", "Registration")
+    for key in ["endpoint", "device_id"]:
+        duplicates = Registration.objects.raw(sql_duplicates.format(key=key))
+        # Through the ORM, to delete the push dead letters of the duplicates as well
+        Registration.objects.filter(
+            id__in=[registration.id for registration in duplicates]
+        ).delete()
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("notification", "0022_push_dead_letter"),
+        ("user", "0005_registration_subscription_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="registration",
+            name="endpoint",
+            field=models.CharField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_endpoint, reverse_code=migrations.RunPython.noop),
+        migrations.RunPython(delete_duplicates, reverse_code=migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="registration",
+            constraint=models.UniqueConstraint(
+                fields=("user", "endpoint"), name="registration_user_endpoint_unique"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="registration",
+            constraint=models.UniqueConstraint(
+                fields=("user", "device_id"), name="registration_user_device_id_unique"
+            ),
+        ),
+    ]
@@ -1,6 +1,8 @@
 import uuid
+from urllib.parse import urlsplit
 
-from django.db import models
+from django.db import connection, models
+from django.utils.functional import cached_property
 from pydantic import BaseModel
 from webpush import WebPushSubscription
 
@@ -42,25 +44,128 @@ class MobileAppSubscription(BaseModel):
 
 
 class Registration(models.Model):
+    class Kind(models.TextChoices):
+        WEBPUSH = "webpush"
+        MOBILE = "mobile"
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
 
+    user_id: uuid.UUID  # For typing purposes: this is only a type annotation
     user = models.ForeignKey(User, on_delete=models.PROTECT)
 
     subscription = models.JSONField(blank=True, null=True)
 
+    # Extracted from the subscription on save, see `extract_subscription_fields`
+    kind = models.CharField(choices=Kind, blank=True, null=True)
+    endpoint = models.CharField(blank=True, null=True)
+    endpoint_host = models.CharField(blank=True, null=True, db_index=True)
+    device_id = models.CharField(blank=True, null=True, db_index=True)
+    fcm_token = models.CharField(blank=True, null=True, db_index=True)
+
+    # Push delivery health, see `ami.notification.health`
+    failure_count = models.PositiveIntegerField(default=0)
+    last_success_at = models.DateTimeField(blank=True, null=True)
+    last_failure_at = models.DateTimeField(blank=True, null=True)
+    backoff_until = models.DateTimeField(blank=True, null=True)
+    quarantined_at = models.DateTimeField(blank=True, null=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    @property
+    def save(self, *args, **kwargs):
+        self.extract_subscription_fields()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "subscription" in update_fields:
+            kwargs["update_fields"] = {*update_fields, *subscription_fields(None)}
+        super().save(*args, **kwargs)
+
+    def extract_subscription_fields(self) -> None:
+        """Set the columns extracted from the subscription, and forget its parsed value."""
+        for field, value in subscription_fields(self.subscription).items():
+            setattr(self, field, value)
+        self.__dict__.pop("typed_subscription", None)
+
+    @cached_property
     def typed_subscription(self) -> WebPushSubscription | MobileAppSubscription:
-        """Convert the stored dict to the proper subscription type."""
-        try:
-            return WebPushSubscription.model_validate(self.subscription)
-        except Exception:
+        """Convert the stored dict to the subscription type of its kind, once per instance."""
+        kind = self.kind or subscription_kind(self.subscription or {})
+        if kind == Registration.Kind.MOBILE:
             return MobileAppSubscription.model_validate(self.subscription)
+        return WebPushSubscription.model_validate(self.subscription)
+
+    @classmethod
+    def upsert(cls, user: User, subscription: dict) -> tuple["Registration", bool]:
+        """Store the subscription of a device, in a single statement.
+
+        A device is registered again when it starts: its registration is found by web push
+        endpoint or by mobile device id, updated, and its failures are forgotten. Returns the
+        stored registration, and whether it was created.
+        """
+        registration = cls(user=user, subscription=subscription)
+        registration.extract_subscription_fields()
+        conflict_field = "device_id" if registration.kind == cls.Kind.MOBILE else "endpoint"
+        fields = cls._meta.concrete_fields
+        columns = ", ".join(f'"{field.column}"' for field in fields)
+        values = [
+            field.get_db_prep_save(field.pre_save(registration, add=True), connection=connection)
+            for field in fields
+        ]
+        updated = [
+            "subscription",
+            *subscription_fields(None),
+            "failure_count",
+            "backoff_until",
+            "quarantined_at",
+            "updated_at",
+        ]
+        updates = ", ".join(f'"{field}" = EXCLUDED."{field}"' for field in updated)
+        stored = next(
+            iter(
+                cls.objects.raw(
+                    f"INSERT INTO {cls._meta.db_table} ({columns}) "
+                    f"VALUES ({', '.join(['%s'] * len(fields))}) "
+                    f'ON CONFLICT ("user_id", "{conflict_field}") DO UPDATE SET {updates} '
+                    "RETURNING *, (xmax = 0) AS created",
+                    values,
+                )
+            )
+        )
+        # The extra column of the query, unknown to the model
+        created: bool = stored.__dict__["created"]
+        return stored, created
 
     class Meta:
         db_table = "registration"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "endpoint"], name="registration_user_endpoint_unique"
+            ),
+            models.UniqueConstraint(
+                fields=["user", "device_id"], name="registration_user_device_id_unique"
+            ),
+        ]
+
+
+def subscription_kind(subscription: dict) -> Registration.Kind | None:
+    """Tell a mobile app subscription from a web push one, as the registration API does."""
+    if "device_id" in subscription:
+        return Registration.Kind.MOBILE
+    if "endpoint" in subscription:
+        return Registration.Kind.WEBPUSH
+    return None
+
+
+def subscription_fields(subscription: dict | None) -> dict[str, str | None]:
+    """The values of the `Registration` columns extracted from a subscription."""
+    subscription = subscription or {}
+    endpoint = subscription.get("endpoint")
+    return {
+        "kind": subscription_kind(subscription),
+        "endpoint": endpoint if isinstance(endpoint, str) else None,
+        "endpoint_host": urlsplit(endpoint).hostname if isinstance(endpoint, str) else None,
+        "device_id": subscription.get("device_id"),
+        "fcm_token": subscription.get("fcm_token"),
+    }
 
 
 class NotificationPush(BaseModel):
@@ -0,0 +1,18 @@
+import pytest
+from django.core.management import call_command
+
+from ami.user.models import Registration, User
+
+
+@pytest.mark.django_db(transaction=True)
+def test_command_benchmark_registrations(capsys) -> None:
+    call_command("benchmark-registrations", "--registrations", "100", "--iterations", "5")
+
+    output = capsys.readouterr().out
+    assert "100 registrations stored" in output
+    assert "web push: JSON equality lookup: 5 ops" in output
+    assert "web push: upsert on endpoint: 5 ops" in output
+    assert "mobile: JSON device_id lookup: 5 ops" in output
+    assert "mobile: upsert on device_id: 5 ops" in output
+    assert Registration.objects.count() == 0
+    assert User.objects.count() == 0
@@ -0,0 +1,106 @@
+import pytest
+
+from ami.notification.models import Notification
+from ami.notification.services import acreate_event, create_event, create_events, validate_event
+from ami.user.cache import CachedUser, UserCache, aresolve_user, resolve_user, user_cache
+from ami.user.models import User
+
+
+def test_user_cache_lru() -> None:
+    cache = UserCache(max_size=2, ttl=60)
+    users = [User(fc_hash=f"hash{i}") for i in range(3)]
+
+    assert cache.get("hash0") is None
+    cache.set("hash0", users[0])
+    cache.set("hash1", users[1])
+    assert cache.get("hash0") == CachedUser(users[0].id, None)
+    # "hash1" is now the least recently used entry
+    cache.set("hash2", users[2])
+    assert cache.get("hash1") is None
+    assert cache.get("hash2") == CachedUser(users[2].id, None)
+    assert cache.stats() == {"size": 2, "max_size": 2, "hits": 2, "misses": 2}
+
+    cache.invalidate("hash2")
+    assert cache.get("hash2") is None
+
+    cache.clear()
+    assert cache.stats() == {"size": 0, "max_size": 2, "hits": 0, "misses": 0}
+
+
+def test_user_cache_ttl(monkeypatch: pytest.MonkeyPatch) -> None:
+    cache = UserCache(max_size=2, ttl=60)
+    cache.set("hash", User(fc_hash="hash"))
+
+    monkeypatch.setattr("ami.user.cache.time.monotonic", lambda: float("inf"))
+    assert cache.get("hash") is None
+    assert cache.stats()["size"] == 0
+
+
+@pytest.mark.django_db
+def test_resolve_user(user: User, django_assert_num_queries) -> None:
+    with django_assert_num_queries(1):
+        assert resolve_user(user.fc_hash) == CachedUser(user.id, user.last_logged_in)
+    with django_assert_num_queries(0):
+        assert resolve_user(user.fc_hash) == CachedUser(user.id, user.last_logged_in)
+    assert resolve_user("unknown") is None
+    assert user_cache.stats()["hits"] == 1
+
+
+@pytest.mark.django_db(transaction=True)
+async def test_aresolve_user(user: User) -> None:
+    assert await aresolve_user(user.fc_hash) == CachedUser(user.id, user.last_logged_in)
+    assert await aresolve_user(user.fc_hash) == CachedUser(user.id, user.last_logged_in)
+    assert user_cache.stats()["hits"] == 1
+
+
+def build_event(fc_hash: str, **kwargs) -> dict:
+    return {
+        "recipient_fc_hash": fc_hash,
+        "content_title": "Brouillon de nouvelle demande de démarche d'OTV",
+        "content_body": "Merci d'avoir initié votre demande",
+        "item_type": "OTV",
+        "item_id": "A-5-JGBJ5VMOY",
+        "item_status_label": "Brouillon",
+        "item_generic_status": "new",
+        "event_date": "2025-11-27T10:55:00.000Z",
+        **kwargs,
+    }
+
+
+@pytest.mark.django_db
+def test_create_event_user_deleted_by_another_process(user: User) -> None:
+    resolve_user(user.fc_hash)
+    # Deleted without invalidating the cache of this process
+    User.objects.filter(id=user.id).delete()
+
+    result = create_event("psl", validate_event(build_event(user.fc_hash)))
+
+    recreated = User.objects.get(fc_hash=user.fc_hash)
+    assert Notification.objects.get(id=result.notification_id).user_id == recreated.id
+    assert user_cache.get(user.fc_hash) == CachedUser(recreated.id, None)
+
+
+@pytest.mark.django_db
+def test_create_events_user_deleted_by_another_process(user: User) -> None:
+    resolve_user(user.fc_hash)
+    User.objects.filter(id=user.id).delete()
+
+    results = create_events(
+        "psl", [build_event(user.fc_hash), build_event(user.fc_hash, item_id="2")]
+    )
+
+    recreated = User.objects.get(fc_hash=user.fc_hash)
+    assert [result["status"] for result in results] == ["created", "created"]
+    assert Notification.objects.filter(user=recreated).count() == 2
+
+
+@pytest.mark.django_db(transaction=True)
+async def test_acreate_event_user_deleted_by_another_process(user: User) -> None:
+    await aresolve_user(user.fc_hash)
+    await User.objects.filter(id=user.id).adelete()
+
+    result = await acreate_event("psl", validate_event(build_event(user.fc_hash)))
+
+    recreated = await User.objects.aget(fc_hash=user.fc_hash)
+    notification = await Notification.objects.aget(id=result.notification_id)
+    assert notification.user_id == recreated.id
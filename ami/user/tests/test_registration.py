@@ -3,9 +3,11 @@ import uuid
 from typing import Any
 
 import pytest
+from django.utils.timezone import now
+from webpush import WebPushSubscription
 
 from ami.tests.utils import assert_query_fails_without_auth, login
-from ami.user.models import Registration, User
+from ami.user.models import MobileAppSubscription, Registration, User
 
 
 @pytest.mark.django_db
@@ -35,6 +37,24 @@ def test_register_webpush(app, user: User, webpushsubscription: dict[str, Any])
     assert registration.id == registration_id
 
 
+@pytest.mark.django_db
+def test_register_webpush_again_after_failures(app, webpush_registration: Registration) -> None:
+    login(app, webpush_registration.user)
+    webpush_registration.failure_count = 3
+    webpush_registration.backoff_until = now() + datetime.timedelta(hours=1)
+    webpush_registration.quarantined_at = now()
+    webpush_registration.save()
+
+    register_data = {"subscription": webpush_registration.subscription}
+    app.post_json("/api/v1/users/registrations", register_data, status=200)
+
+    # The device says it's still valid: it's pushed to again
+    webpush_registration.refresh_from_db()
+    assert webpush_registration.failure_count == 0
+    assert webpush_registration.backoff_until is None
+    assert webpush_registration.quarantined_at is None
+
+
 @pytest.mark.django_db
 def test_register_mobile_app(app, user: User, mobileAppSubscription: dict[str, Any]) -> None:
     login(app, user)
@@ -182,3 +202,62 @@ def test_list_registrations(app, webpush_registration: Registration) -> None:
 @pytest.mark.django_db
 def test_list_registrations_without_auth(app) -> None:
     assert_query_fails_without_auth(app, "/api/v1/users/registrations")
+
+
+@pytest.mark.django_db
+def test_registration_subscription_fields(
+    webpush_registration: Registration, mobile_registration: Registration
+) -> None:
+    webpush_registration = Registration.objects.get(id=webpush_registration.id)
+    assert webpush_registration.kind == Registration.Kind.WEBPUSH
+    assert webpush_registration.endpoint_host == "example.com"
+    assert webpush_registration.device_id is None
+    assert isinstance(webpush_registration.typed_subscription, WebPushSubscription)
+    # Parsed once per instance
+    assert webpush_registration.typed_subscription is webpush_registration.typed_subscription
+
+    mobile_registration = Registration.objects.get(id=mobile_registration.id)
+    assert mobile_registration.kind == Registration.Kind.MOBILE
+    assert mobile_registration.endpoint_host is None
+    assert mobile_registration.device_id == mobile_registration.subscription["device_id"]
+    assert mobile_registration.fcm_token == mobile_registration.subscription["fcm_token"]
+    assert isinstance(mobile_registration.typed_subscription, MobileAppSubscription)
+
+    # Changing the subscription updates the columns, and the parsed value
+    mobile_registration.subscription = {**mobile_registration.subscription, "fcm_token": "new"}
+    mobile_registration.save(update_fields=["subscription"])
+    assert mobile_registration.typed_subscription.fcm_token == "new"
+    assert Registration.objects.get(id=mobile_registration.id).fcm_token == "new"
+
+
+@pytest.mark.django_db
+def test_register_webpush_new_keys(app, webpush_registration: Registration) -> None:
+    login(app, webpush_registration.user)
+    subscription = {
+        **webpush_registration.subscription,
+        "keys": {**webpush_registration.subscription["keys"], "auth": "bmV3LWF1dGgtc2VjcmV0"},
+    }
+
+    # Same endpoint: the registration is updated, not duplicated
+    response = app.post_json(
+        "/api/v1/users/registrations", {"subscription": subscription}, status=200
+    )
+
+    assert response.json["id"] == str(webpush_registration.id)
+    registration = Registration.objects.get()
+    assert registration.subscription == subscription
+    assert registration.created_at == webpush_registration.created_at
+
+
+@pytest.mark.django_db
+def test_registration_upsert_per_user(user: User, mobileAppSubscription: dict[str, Any]) -> None:
+    other_user = User.objects.create(fc_hash="other-user")
+    registration, created = Registration.upsert(user, mobileAppSubscription)
+    assert created
+    assert registration.kind == Registration.Kind.MOBILE
+    assert Registration.upsert(user, mobileAppSubscription) == (registration, False)
+
+    # The same device of another user is its own registration
+    other_registration, created = Registration.upsert(other_user, mobileAppSubscription)
+    assert created
+    assert other_registration.id != registration.id
@@ -0,0 +1,191 @@
+"""Async data access for the hottest queries, on an asyncpg connection pool.
+
+The pool is opened and closed by the ASGI lifespan (see `ami.asgi`), on the event loop of the
+server. Everywhere else (WSGI, tests, management commands, `async_to_sync` calls), there is no
+pool for the running event loop, and the same queries are done through the Django ORM.
+
+The rows are returned as model instances, so callers don't depend on which path was used.
+Beware that the asyncpg path doesn't share the Django connection: it doesn't see uncommitted
+changes, and doesn't take part in `transaction.atomic` blocks.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from collections.abc import Iterable
+from typing import TypeVar
+
+import asyncpg
+from django.conf import settings
+from django.db import IntegrityError, connection
+from django.db.models import Model
+
+from ami.authentication.models import RevokedAuthToken
+from ami.notification.models import Notification
+from ami.user.models import Registration, User
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=Model)
+
+_pool: asyncpg.Pool | None = None
+_pool_loop: asyncio.AbstractEventLoop | None = None
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    # Decode json columns like psycopg does, instead of returning strings
+    for type_name in ["json", "jsonb"]:
+        await conn.set_type_codec(
+            type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog"
+        )
+
+
+def connect_kwargs() -> dict:
+    """asyncpg connection arguments for the default database."""
+    database = settings.DATABASES["default"]
+    return {
+        "host": database["HOST"] or None,
+        "port": database["PORT"] or None,
+        "user": database["USER"] or None,
+        "password": database["PASSWORD"] or None,
+        "database": database["NAME"],
+    }
+
+
+async def open_pool() -> None:
+    global _pool, _pool_loop
+    _pool = await asyncpg.create_pool(
+        **connect_kwargs(),
+        min_size=settings.ASYNCPG_POOL_MIN_SIZE,
+        max_size=settings.ASYNCPG_POOL_MAX_SIZE,
+        init=_init_connection,
+    )
+    _pool_loop = asyncio.get_running_loop()
+
+
+async def close_pool() -> None:
+    global _pool, _pool_loop
+    if _pool is not None:
+        await _pool.close()
+    _pool, _pool_loop = None, None
+
+
+def get_pool() -> asyncpg.Pool | None:
+    """Return the pool opened on the running event loop, if any."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    return _pool if loop is _pool_loop else None
+
+
+async def lifespan(scope, receive, send) -> None:
+    """ASGI lifespan application, owning the asyncpg pool."""
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                await open_pool()
+            except Exception:
+                # Not fatal: the queries fall back to the Django ORM
+                logger.exception("Could not open the asyncpg pool")
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await close_pool()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+def _columns(model: type[Model]) -> str:
+    return ", ".join(f'"{field.column}"' for field in model._meta.concrete_fields)
+
+
+def _from_record(model: type[M], record: asyncpg.Record) -> M:
+    return model.from_db(
+        "default", [field.attname for field in model._meta.concrete_fields], tuple(record)
+    )
+
+
+async def get_user_by_fc_hash(fc_hash: str) -> User | None:
+    pool = get_pool()
+    if pool is None:
+        return await User.objects.filter(fc_hash=fc_hash).afirst()
+    record = await pool.fetchrow(
+        f"SELECT {_columns(User)} FROM {User._meta.db_table} WHERE fc_hash = $1", fc_hash
+    )
+    return _from_record(User, record) if record else None
+
+
+async def is_token_revoked(jti: str) -> bool:
+    pool = get_pool()
+    if pool is None:
+        return await RevokedAuthToken.objects.filter(jti=jti).aexists()
+    return await pool.fetchval(
+        f"SELECT EXISTS(SELECT 1 FROM {RevokedAuthToken._meta.db_table} WHERE jti = $1)", jti
+    )
+
+
+async def list_user_registrations(user_id: uuid.UUID) -> list[Registration]:
+    """The registrations to push to: not quarantined, but possibly backed off."""
+    registrations = await list_users_registrations([user_id])
+    return registrations.get(user_id, [])
+
+
+async def list_users_registrations(
+    user_ids: Iterable[uuid.UUID],
+) -> dict[uuid.UUID, list[Registration]]:
+    """`list_user_registrations` for several users at once, in a single query."""
+    user_ids = list(user_ids)
+    registrations: dict[uuid.UUID, list[Registration]] = {}
+    pool = get_pool()
+    if pool is None:
+        async for registration in Registration.objects.filter(
+            user_id__in=user_ids, quarantined_at__isnull=True
+        ):
+            registrations.setdefault(registration.user_id, []).append(registration)
+        return registrations
+    records = await pool.fetch(
+        f"SELECT {_columns(Registration)} FROM {Registration._meta.db_table} "
+        "WHERE user_id = ANY($1::uuid[]) AND quarantined_at IS NULL",
+        user_ids,
+    )
+    for record in records:
+        registration = _from_record(Registration, record)
+        registrations.setdefault(registration.user_id, []).append(registration)
+    return registrations
+
+
+async def create_notification_once(notification: Notification) -> uuid.UUID:
+    """Async `Notification.bulk_create_once` for a single notification.
+
+    Returns the id of the stored notification: it was created if and only if this is its own id.
+    """
+    pool = get_pool()
+    if pool is None:
+        stored_ids = await Notification.abulk_create_once([notification])
+        return stored_ids[notification.idempotency_key]
+
+    fields = Notification._meta.concrete_fields
+    values = [
+        field.get_db_prep_save(field.pre_save(notification, add=True), connection=connection)
+        for field in fields
+    ]
+    placeholders = ", ".join(f"${index}" for index in range(1, len(fields) + 1))
+    table = Notification._meta.db_table
+    async with pool.acquire() as conn:
+        try:
+            notification_id = await conn.fetchval(
+                f"INSERT INTO {table} ({_columns(Notification)}) VALUES ({placeholders}) "
+                "ON CONFLICT (idempotency_key) DO NOTHING RETURNING id",
+                *values,
+            )
+        except asyncpg.IntegrityConstraintViolationError as error:
+            # Raised as by the ORM path, for the callers
+            raise IntegrityError(str(error)) from error
+        if notification_id is None:
+            notification_id = await conn.fetchval(
+                f"SELECT id FROM {table} WHERE idempotency_key = $1",
+                notification.idempotency_key,
+            )
+    return notification_id
@@ -0,0 +1,82 @@
+import asyncio
+import statistics
+import time
+from contextlib import contextmanager
+
+
+class Timings:
+    """Collect durations (in seconds) and summarize them for benchmark reports."""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.durations: list[float] = []
+
+    @contextmanager
+    def measure(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations.append(time.perf_counter() - start)
+
+    def add(self, duration: float) -> None:
+        self.durations.append(duration)
+
+    def percentile(self, percent: int) -> float:
+        if len(self.durations) < 2:
+            return self.durations[0] if self.durations else 0.0
+        return statistics.quantiles(self.durations, n=100, method="inclusive")[percent - 1]
+
+    def summary(self, total: float | None = None) -> str:
+        """One line report; `total` is the wall clock duration when operations overlap."""
+        count = len(self.durations)
+        total = sum(self.durations) if total is None else total
+        rate = count / total if total else 0.0
+        return (
+            f"{self.label}: {count} ops in {total:.3f}s ({rate:.1f} ops/s), "
+            f"p50={self.percentile(50) * 1000:.2f}ms "
+            f"p95={self.percentile(95) * 1000:.2f}ms "
+            f"p99={self.percentile(99) * 1000:.2f}ms"
+        )
+
+
+async def asgi_request(
+    application, method: str, path: str, headers: dict[str, str], body: bytes = b""
+) -> tuple[int, bytes]:
+    """Send a single HTTP request straight to an ASGI application, without any server."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (key.lower().encode(), value.encode())
+            for key, value in {**headers, "content-length": str(len(body))}.items()
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("testserver", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = 0
+    chunks: list[bytes] = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # Wait forever, like a client which doesn't disconnect
+        return await asyncio.Future()
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await application(scope, receive, send)
+    return status, b"".join(chunks)
@@ -1,10 +1,24 @@
+import asyncio
+import datetime
 import hashlib
 from collections.abc import AsyncGenerator, Generator
 from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from weakref import WeakKeyDictionary
 
 from django.core.cache import cache
 from django.utils.encoding import smart_bytes
-from httpx import URL, AsyncClient, BasicAuth, Client, Response  # noqa
+from httpx import (  # noqa
+    URL,
+    AsyncClient,
+    BasicAuth,
+    Client,
+    ConnectError,
+    DecodingError,
+    Limits,
+    Response,
+    TransportError,
+)
 
 
 def get_cache_key(url: str):
@@ -50,13 +64,53 @@ def httpxClient() -> Generator[AMIClient]:
         yield client
 
 
-@contextmanager
-def httpxLaxClient() -> Generator[AMIClient]:
-    with AMIClient(timeout=60, verify=False) as client:
-        yield client
-
-
 @asynccontextmanager
 async def httpxAsyncClient() -> AsyncGenerator[AsyncClient]:
     async with AsyncClient(timeout=60) as client:
         yield client
+
+
+_shared_async_clients: WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncClient] = (
+    WeakKeyDictionary()
+)
+
+
+def httpxSharedAsyncClient() -> AsyncClient:
+    """HTTP/2 client shared by everything running on the current event loop.
+
+    Connections are kept alive in a pool per host, so that many requests to the same hosts (e.g.
+    push services) don't pay a TLS handshake each. Don't close it: whoever owns the event loop
+    calls `close_httpx_shared_async_client` before closing the loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _shared_async_clients.get(loop)
+    if client is None:
+        client = AsyncClient(
+            timeout=60,
+            http2=True,
+            limits=Limits(max_connections=200, max_keepalive_connections=50, keepalive_expiry=60),
+        )
+        _shared_async_clients[loop] = client
+    return client
+
+
+async def close_httpx_shared_async_client() -> None:
+    client = _shared_async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def retry_after_seconds(response: Response) -> float | None:
+    """Parse the `Retry-After` header of a response, given in seconds or as an HTTP date."""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((date - datetime.datetime.now(datetime.timezone.utc)).total_seconds(), 0.0)
@@ -0,0 +1,106 @@
+import asyncio
+import base64
+import json
+import uuid
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from ami.notification.models import Notification
+from ami.user.models import Registration, User
+from ami.utils import async_db
+from ami.utils.benchmark import Timings, asgi_request
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the hot async queries, and the partner event request, through the Django ORM "
+        "and through the asyncpg pool. The benchmark data is deleted at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=500, help="Runs of each query")
+        parser.add_argument("--notifications", type=int, default=50, help="Listed notifications")
+
+    def handle(self, *args, iterations: int, notifications: int, **kwargs):
+        user = User.objects.create(fc_hash=f"benchmark-{uuid.uuid4().hex}")
+        # Notifications are inserted for another user, so that the listing stays the same size
+        writer = User.objects.create(fc_hash=f"benchmark-{uuid.uuid4().hex}")
+        Registration.objects.create(user=user, subscription={"endpoint": "https://push.test"})
+        Notification.objects.bulk_create(
+            Notification(user=user, content_title="title", content_body="body", partner_id="psl")
+            for _ in range(notifications)
+        )
+        # Push tasks are not enqueued: only the request handling is measured
+        tasks = {
+            "default": {
+                "BACKEND": "django.tasks.backends.dummy.DummyBackend",
+                "QUEUES": settings.TASK_QUEUES,
+            }
+        }
+        try:
+            with override_settings(TASKS=tasks, ALLOWED_HOSTS=["testserver"]):
+                for use_pool in [False, True]:
+                    for timings in asyncio.run(self.run(user, writer, iterations, use_pool)):
+                        self.stdout.write(timings.summary())
+        finally:
+            Notification.objects.filter(user__in=[user, writer]).delete()
+            Registration.objects.filter(user=user).delete()
+            User.objects.filter(id__in=[user.id, writer.id]).delete()
+
+    async def run(self, user: User, writer: User, iterations: int, use_pool: bool) -> list[Timings]:
+        path = "asyncpg" if use_pool else "ORM"
+        if use_pool:
+            await async_db.open_pool()
+        try:
+            queries = {
+                "user by fc_hash": lambda index: async_db.get_user_by_fc_hash(user.fc_hash),
+                "revoked token": lambda index: async_db.is_token_revoked(uuid.uuid4().hex),
+                "registrations by user": lambda index: async_db.list_user_registrations(user.id),
+                "notification insert": lambda index: async_db.create_notification_once(
+                    Notification(
+                        user_id=writer.id,
+                        content_title="title",
+                        content_body="body",
+                        partner_id="psl",
+                        idempotency_key=f"{path}-{index}",
+                    )
+                ),
+            }
+            results = []
+            for label, query in queries.items():
+                timings = Timings(f"{path}: {label}")
+                for index in range(iterations):
+                    with timings.measure():
+                        await query(index)
+                results.append(timings)
+            results.append(await self.run_requests(writer, iterations, path))
+            return results
+        finally:
+            await async_db.close_pool()
+
+    async def run_requests(self, user: User, iterations: int, path: str) -> Timings:
+        application = get_asgi_application()
+        credentials = base64.b64encode(f"psl:{settings.PARTNERS_PSL_SECRET}".encode()).decode()
+        headers = {"authorization": f"Basic {credentials}", "content-type": "application/json"}
+        timings = Timings(f"{path}: PUT /api/v2/event")
+        for index in range(iterations):
+            body = {
+                "recipient_fc_hash": user.fc_hash,
+                "content_title": "Brouillon de nouvelle demande de démarche d'OTV",
+                "content_body": "Merci d'avoir initié votre demande",
+                "event_date": "2025-11-27T10:55:00.000Z",
+                "item_type": "OTV",
+                "item_id": f"{path}-{index}",
+                "item_status_label": "Brouillon",
+                "item_generic_status": "new",
+            }
+            with timings.measure():
+                status, content = await asgi_request(
+                    application, "PUT", "/api/v2/event", headers, json.dumps(body).encode()
+                )
+            if status != 201:
+                raise CommandError(f"PUT /api/v2/event answered {status}: {content[:200]!r}")
+        return timings
@@ -0,0 +1,51 @@
+import os
+
+from django.conf import settings
+from django.utils.autoreload import DJANGO_AUTORELOAD_ENV, run_with_reloader
+from django_tasks_db.management.commands.db_worker import Command as DBWorkerCommand
+
+from ami.utils.task_wakeup import ListeningWorker
+
+
+class Command(DBWorkerCommand):
+    help = (
+        "Run a database task worker, woken up by the new tasks instead of polling, see "
+        "`ami.utils.task_wakeup`"
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        # The polling is only a fallback
+        parser.set_defaults(interval=settings.TASK_WORKER_POLL_INTERVAL)
+
+    def handle(
+        self,
+        *,
+        verbosity: int,
+        queue_name: str,
+        interval: float,
+        batch: bool,
+        backend_name: str,
+        reload: bool,
+        max_tasks: int | None,
+        worker_id: str,
+        **options,
+    ) -> None:
+        self.configure_logging(verbosity)
+        worker = ListeningWorker(
+            queue_names=queue_name.split(","),
+            interval=interval,
+            batch=batch,
+            backend_name=backend_name,
+            startup_delay=False,
+            max_tasks=max_tasks,
+            worker_id=worker_id,
+        )
+        if reload and not batch:
+            if os.environ.get(DJANGO_AUTORELOAD_ENV) == "true":
+                # Only the child process should configure its signals
+                worker.configure_signals()
+            run_with_reloader(worker.run)
+        else:
+            worker.configure_signals()
+            worker.run()
@@ -1,16 +1,63 @@
 import zoneinfo
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.utils import timezone
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
 
 
 class TimezoneMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        tzname = request.session.get("django_timezone")
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.activate(request.session.get("django_timezone"))
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self.activate(await request.session.aget("django_timezone"))
+        return await self.get_response(request)
+
+    @staticmethod
+    def activate(tzname: str | None) -> None:
         if tzname:
             timezone.activate(zoneinfo.ZoneInfo(tzname))
         else:
             timezone.deactivate()
-        return self.get_response(request)
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    """WhiteNoise middleware which doesn't force the whole middleware chain to run synchronously.
+
+    A sync only middleware makes Django run every async view in a thread under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        # Only called when the next middleware is async, see `__call__`
+        assert self.get_response is not None
+        return await self.get_response(request)
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# Notify the task workers of the ready tasks, see `ami.utils.task_wakeup`. The notifications are
+# only delivered on commit, and Postgres merges the identical ones of a transaction: a bulk
+# insert notifies each queue once.
+sql_notify_ready_tasks = """
+CREATE FUNCTION notify_ready_task() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('ami_tasks', NEW.queue_name);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER notify_ready_task
+AFTER INSERT OR UPDATE OF status ON django_tasks_database_dbtaskresult
+FOR EACH ROW WHEN (NEW.status = 'READY')
+EXECUTE FUNCTION notify_ready_task();
+"""
+
+reverse_sql_notify_ready_tasks = """
+DROP TRIGGER notify_ready_task ON django_tasks_database_dbtaskresult;
+DROP FUNCTION notify_ready_task();
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        (
+            "django_tasks_database",
+            "0019_rename_django_task_new_ordering_idx_tasks_db_new_ordering_idx_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=sql_notify_ready_tasks, reverse_sql=reverse_sql_notify_ready_tasks),
+    ]
@@ -0,0 +1,178 @@
+"""Wake-up of the task workers on new tasks, with Postgres LISTEN/NOTIFY.
+
+A trigger (see the `ami.utils` migrations) notifies `TASKS_CHANNEL` whenever a task becomes
+ready: when it's enqueued, or put back in its queue. Postgres delivers the notifications once the
+transaction commits, so a woken worker always sees the task. Between two claims, the workers wait
+for a notification on a connection of their own, instead of sleeping for a polling interval: a
+new task starts within milliseconds, and idle workers don't query the database.
+
+The workers still poll every `TASK_WORKER_POLL_INTERVAL` seconds, as a fallback when the
+listening connection is lost. The tasks deferred with `run_after` are notified when enqueued, not
+when due: the workers wake up on time for the next one.
+"""
+
+import asyncio
+import logging
+import time
+
+import asyncpg
+import psycopg
+from django.db import close_old_connections, connection
+from django.db.models import Min, QuerySet
+from django.tasks import TaskResultStatus  # type: ignore[import-untyped]
+from django.utils.timezone import now
+from django_tasks_db.management.commands.db_worker import Worker
+from django_tasks_db.models import DBTaskResult, DBTaskResultQuerySet, get_date_max
+from django_tasks_db.utils import exclusive_transaction
+from psycopg import sql
+
+from ami.utils.async_db import connect_kwargs
+from ami.utils.tasks import db_task_results
+
+logger = logging.getLogger(__name__)
+
+# Keep in sync with the `notify_ready_task` trigger
+TASKS_CHANNEL = "ami_tasks"
+
+
+def notify_tasks(queue_name: str = "") -> None:
+    """Wake up the listening workers, on commit of the current transaction if any."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [TASKS_CHANNEL, queue_name])
+
+
+def wait_timeout(tasks: QuerySet[DBTaskResult], poll_interval: float) -> float:
+    """Seconds to wait for a notification: until the next deferred task of `tasks` is due, and
+    at most `poll_interval`."""
+    next_run_after = (
+        tasks.filter(status=TaskResultStatus.READY, run_after__gt=now())
+        .exclude(run_after=get_date_max())
+        .aggregate(next_run_after=Min("run_after"))["next_run_after"]
+    )
+    if next_run_after is None:
+        return poll_interval
+    return max(0.0, min(poll_interval, (next_run_after - now()).total_seconds()))
+
+
+class Listener:
+    """Listen to the notifications of a channel on a dedicated connection, for the sync workers."""
+
+    def __init__(self, channel: str = TASKS_CHANNEL) -> None:
+        self.channel = channel
+        self._connection: psycopg.Connection | None = None
+
+    def __enter__(self) -> "Listener":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+        self._connection = None
+
+    def listen(self) -> psycopg.Connection | None:
+        """Listen, if not listening already: called before each wait, to reconnect if lost."""
+        if self._connection is None or self._connection.closed:
+            try:
+                self._connection = psycopg.connect(
+                    **connection.get_connection_params(), autocommit=True
+                )
+                self._connection.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+            except psycopg.Error:
+                logger.exception("Could not listen to %s, polling", self.channel)
+                self.close()
+        return self._connection
+
+    def wait(self, timeout: float) -> list[str]:
+        """Wait up to `timeout` seconds for notifications, returning their payloads.
+
+        Without a listening connection, just sleep.
+        """
+        listening = self.listen()
+        if listening is None:
+            time.sleep(timeout)
+            return []
+        try:
+            payloads = [
+                notify.payload for notify in listening.notifies(timeout=timeout, stop_after=1)
+            ]
+            if payloads:
+                # And the ones received meanwhile
+                payloads += [notify.payload for notify in listening.notifies(timeout=0)]
+            return payloads
+        except psycopg.Error:
+            logger.exception("Lost the connection listening to %s", self.channel)
+            self.close()
+            return []
+
+
+class AsyncTaskListener:
+    """Listen to the task notifications on a dedicated connection, for the async workers.
+
+    `notified` is set on each notification, and cleared by the worker before claiming tasks.
+    """
+
+    def __init__(self) -> None:
+        self.notified = asyncio.Event()
+        self._connection: asyncpg.Connection | None = None
+
+    async def listen(self) -> None:
+        """Listen, if not listening already: called before each wait, to reconnect if lost."""
+        if self._connection is not None and not self._connection.is_closed():
+            return
+        try:
+            listening = self._connection = await asyncpg.connect(**connect_kwargs())
+            await listening.add_listener(TASKS_CHANNEL, self._notify)
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError):
+            logger.exception("Could not listen to the task notifications, polling")
+            await self.close()
+
+    def _notify(self, *args) -> None:
+        self.notified.set()
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            self._connection.terminate()
+        self._connection = None
+
+
+class ListeningWorker(Worker):
+    """`db_worker` worker waiting for the task notifications when idle, instead of sleeping."""
+
+    def tasks(self) -> DBTaskResultQuerySet:
+        tasks = db_task_results().filter(backend_name=self.backend_name)
+        if not self.process_all_queues:
+            tasks = tasks.filter(queue_name__in=self.queue_names)
+        return tasks
+
+    def run(self) -> None:
+        logger.info(
+            "Starting listening worker worker_id=%s queues=%s",
+            self.worker_id,
+            ",".join(self.queue_names),
+        )
+        with Listener() as listener:
+            while self.running:
+                tasks = self.tasks().ready()
+                with exclusive_transaction(tasks.db):
+                    task_result = tasks.get_locked()
+                    if task_result is not None:
+                        task_result.claim(self.worker_id)
+
+                if task_result is not None:
+                    self.run_task(task_result)
+                elif self.batch:
+                    logger.info("No more tasks to run for worker_id=%s", self.worker_id)
+                    return
+
+                if self.max_tasks is not None and self._run_tasks >= self.max_tasks:
+                    logger.info(
+                        "Run maximum tasks (%d) on worker=%s", self._run_tasks, self.worker_id
+                    )
+                    return
+
+                close_old_connections()
+                if self.running and task_result is None:
+                    listener.wait(wait_timeout(self.tasks(), self.interval))
@@ -0,0 +1,34 @@
+"""Typed access to `django.tasks`, which has no type stubs yet.
+
+Without them, the type checkers take the tasks for the functions they decorate: declare the tasks
+with `task` from here, to type them as `Task`.
+"""
+
+from collections.abc import Callable
+from typing import Any, Protocol
+
+from django.tasks import task as untyped_task  # type: ignore[import-untyped]
+from django_tasks_db.models import DBTaskResult, DBTaskResultQuerySet
+
+
+class Task(Protocol):
+    """The part of `django.tasks.Task` used here."""
+
+    func: Callable[..., Any]
+    module_path: str
+
+    def using(self, **kwargs: Any) -> "Task": ...
+
+    def enqueue(self, *args: Any, **kwargs: Any) -> Any: ...
+
+    async def aenqueue(self, *args: Any, **kwargs: Any) -> Any: ...
+
+    def call(self, *args: Any, **kwargs: Any) -> Any: ...
+
+
+task: Callable[[Callable[..., Any]], Task] = untyped_task
+
+
+def db_task_results() -> DBTaskResultQuerySet:
+    """`DBTaskResult.objects.all()`, typed with the methods of its queryset (`ready`...)."""
+    return DBTaskResultQuerySet(DBTaskResult)
@@ -0,0 +1,108 @@
+import datetime
+from collections.abc import AsyncGenerator
+
+import pytest
+from asgiref.sync import sync_to_async
+from django.utils.timezone import now
+
+from ami.authentication.models import RevokedAuthToken
+from ami.notification.models import Notification
+from ami.user.models import Registration, User
+from ami.utils import async_db
+
+
+@pytest.fixture
+async def pool() -> AsyncGenerator[None]:
+    await async_db.open_pool()
+    yield
+    await async_db.close_pool()
+
+
+@pytest.mark.parametrize("use_pool", [False, True])
+@pytest.mark.django_db(transaction=True)
+async def test_queries(user: User, webpush_registration: Registration, use_pool: bool) -> None:
+    if use_pool:
+        await async_db.open_pool()
+    assert (async_db.get_pool() is not None) is use_pool
+    try:
+        await check_queries(user, webpush_registration)
+    finally:
+        await async_db.close_pool()
+
+
+async def check_queries(user: User, webpush_registration: Registration) -> None:
+    found = await async_db.get_user_by_fc_hash(user.fc_hash)
+    assert isinstance(found, User)
+    assert (found.id, found.fc_hash, found.last_logged_in) == (
+        user.id,
+        user.fc_hash,
+        user.last_logged_in,
+    )
+    assert await async_db.get_user_by_fc_hash("unknown") is None
+
+    await RevokedAuthToken.objects.acreate(jti="revoked")
+    assert await async_db.is_token_revoked("revoked") is True
+    assert await async_db.is_token_revoked("other") is False
+
+    registrations = await async_db.list_user_registrations(user.id)
+    assert [(r.id, r.subscription) for r in registrations] == [
+        (webpush_registration.id, webpush_registration.subscription)
+    ]
+    # quarantined registrations are not pushed to, unlike the backed off ones
+    await Registration.objects.acreate(
+        user=user, subscription={"endpoint": "https://gone"}, quarantined_at=now()
+    )
+    backed_off = await Registration.objects.acreate(
+        user=user,
+        subscription={"endpoint": "https://failing"},
+        backoff_until=now() + datetime.timedelta(minutes=1),
+    )
+    registrations = await async_db.list_user_registrations(user.id)
+    assert {r.id for r in registrations} == {webpush_registration.id, backed_off.id}
+
+    notification = Notification(
+        user_id=user.id,
+        content_title="new",
+        content_body="body",
+        partner_id="psl",
+        idempotency_key="key",
+    )
+    assert await async_db.create_notification_once(notification) == notification.id
+    duplicate = Notification(
+        user_id=user.id,
+        content_title="new",
+        content_body="body",
+        partner_id="psl",
+        idempotency_key="key",
+    )
+    assert await async_db.create_notification_once(duplicate) == notification.id
+
+    stored = await Notification.objects.aget(id=notification.id)
+    assert stored.content_title == "new"
+    assert stored.read is False
+    assert stored.created_at is not None
+
+
+@pytest.mark.django_db(transaction=True)
+async def test_pool_is_bound_to_its_event_loop(pool) -> None:
+    assert async_db.get_pool() is not None
+    # e.g. under `async_to_sync`, which runs a new event loop
+    assert await sync_to_async(lambda: async_db.get_pool())() is None
+
+
+@pytest.mark.django_db(transaction=True)
+async def test_lifespan() -> None:
+    messages = [{"type": "lifespan.shutdown"}, {"type": "lifespan.startup"}]
+    sent = []
+
+    async def receive():
+        if messages[-1]["type"] == "lifespan.shutdown":
+            assert async_db.get_pool() is not None
+        return messages.pop()
+
+    async def send(message):
+        sent.append(message["type"])
+
+    await async_db.lifespan({"type": "lifespan"}, receive, send)
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+    assert async_db.get_pool() is None
@@ -0,0 +1,18 @@
+import pytest
+from django.core.management import call_command
+
+from ami.notification.models import Notification
+from ami.user.models import User
+
+
+@pytest.mark.django_db(transaction=True)
+def test_command_benchmark_async_db(capsys) -> None:
+    call_command("benchmark-async-db", "--iterations", "5", "--notifications", "3")
+
+    output = capsys.readouterr().out
+    for path in ["ORM", "asyncpg"]:
+        assert f"{path}: user by fc_hash: 5 ops" in output
+        assert f"{path}: notification insert: 5 ops" in output
+        assert f"{path}: PUT /api/v2/event: 5 ops" in output
+    assert Notification.objects.count() == 0
+    assert User.objects.count() == 0
@@ -0,0 +1,100 @@
+import asyncio
+import datetime
+import threading
+import time
+
+import pytest
+from django.db import connection
+from django.tasks import (  # type: ignore[import-untyped]
+    DEFAULT_TASK_BACKEND_ALIAS,
+    TaskResultStatus,
+)
+from django.utils.timezone import now
+from django_tasks_db.models import DBTaskResult
+
+from ami.notification.models import Notification
+from ami.notification.tasks import push_notification
+from ami.utils.task_wakeup import (
+    AsyncTaskListener,
+    Listener,
+    ListeningWorker,
+    notify_tasks,
+    wait_timeout,
+)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_ready_tasks_are_notified(notification: Notification) -> None:
+    with Listener() as listener:
+        assert not listener.wait(0)
+
+        # The queue of the task is notified
+        result = push_notification.enqueue(str(notification.id), False)
+        assert listener.wait(5) == ["default"]
+        assert not listener.wait(0)
+
+        # Only the tasks becoming ready are notified
+        DBTaskResult.objects.filter(id=result.id).update(status=TaskResultStatus.RUNNING)
+        assert not listener.wait(0)
+        DBTaskResult.objects.filter(id=result.id).update(status=TaskResultStatus.READY)
+        assert listener.wait(5) == ["default"]
+
+
+@pytest.mark.django_db(transaction=True)
+async def test_async_listener(notification: Notification) -> None:
+    listener = AsyncTaskListener()
+    await listener.listen()
+    try:
+        await push_notification.aenqueue(str(notification.id), False)
+        async with asyncio.timeout(5):
+            await listener.notified.wait()
+    finally:
+        await listener.close()
+
+
+@pytest.mark.django_db
+def test_wait_timeout(notification: Notification) -> None:
+    tasks = DBTaskResult.objects.all()
+    assert wait_timeout(tasks, 30) == 30
+
+    push_notification.using(run_after=now() + datetime.timedelta(seconds=10)).enqueue(
+        str(notification.id), False
+    )
+    assert 9 < wait_timeout(tasks, 30) <= 10
+    assert wait_timeout(tasks, 5) == 5
+    assert wait_timeout(tasks.filter(queue_name="bulk"), 30) == 30
+
+
+@pytest.mark.django_db(transaction=True)
+def test_listening_worker_is_woken_up(notification: Notification) -> None:
+    worker = ListeningWorker(
+        queue_names=["*"],
+        interval=30,
+        batch=False,
+        backend_name=DEFAULT_TASK_BACKEND_ALIAS,
+        startup_delay=False,
+        max_tasks=None,
+        worker_id="task-worker-test",
+    )
+
+    def run() -> None:
+        try:
+            worker.run()
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    try:
+        # Let the worker go idle first
+        time.sleep(0.5)
+        result = push_notification.enqueue(str(notification.id), False)
+        deadline = time.monotonic() + 5
+        while DBTaskResult.objects.get(id=result.id).status != TaskResultStatus.SUCCESSFUL:
+            assert time.monotonic() < deadline, "The worker wasn't woken up by the new task"
+            time.sleep(0.05)
+    finally:
+        worker.running = False
+        notify_tasks()
+        thread.join(timeout=10)
+    assert not thread.is_alive()
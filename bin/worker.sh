@@ -18,4 +18,5 @@ then
   RUN=""
 fi
 
-make db-worker
+# The make target of the process, `db-worker` by default
+make "${1:-db-worker}"